@@ -3,12 +3,38 @@ import json
 import pandas as pd
 import numpy as np
 from utils.api_tester import APITester
+from utils.capacity_search import CapacitySearch
+from utils.abort_monitor import AbortRule
+from utils.outcomes import error_mask, outcome_breakdown, outcome_column
 from utils.report_generator import ReportGenerator
+from utils.extractors import compile_extractors
+from utils.pacing import compile_think_time
+from utils.har_importer import import_har
+from utils.openapi_importer import import_openapi, load_spec
+from utils.postman_importer import import_postman, load_environment
+from utils.bottleneck import analyze_bottlenecks, per_second_series
+from utils.comparison import RunComparison, load_run
+from utils.compression import BODY_ENCODINGS
+from utils.dns_cache import build_dns_cache
+from utils.error_clustering import run_clusters, top_signatures
+from utils.http2_client import http2_available
+from utils.metrics_server import DEFAULT_PORT as DEFAULT_METRICS_PORT
+from utils.result_log import ResultLog, read_log
+from utils.result_io import load_report, pyarrow_available, write_results
+from utils.run_history import TREND_METRICS, RunHistory
+from utils.retry import RETRYABLE_OUTCOMES, RetryPolicy
+from utils.run_metrics import (api_metrics, bandwidth_summary, limiter_delay, retry_summary, scheduling_accuracy,
+                               sli_table, vu_summary)
+from utils.sli import DEFAULT_APDEX_T, DEFAULT_BUCKETS, overall_apdex, sli_settings
+from utils.thresholds import Threshold, collect_thresholds, evaluate_thresholds, thresholds_passed, to_junit_xml
+from utils.trace_export import write_trace
 import plotly.graph_objects as go
 import plotly.express as px
 import base64
 from datetime import datetime
+import os
 import re
+import tempfile
 from urllib.parse import urlparse
 import time  # Import time for simulating the test duration
 from faq import display_faq  # Import the FAQ display function
@@ -17,6 +43,9 @@ from streamlit import session_state as st_session  # Import session state for ma
 
 from streamlit_sortables import sort_items
 
+# Where load test results are streamed while a test runs
+RESULTS_DIR = "results"
+
 # Function to format dataframes with consistent decimal places
 def format_dataframe(df):
     """Format a dataframe to ensure all numeric values have consistent decimal places."""
@@ -416,7 +445,8 @@ def clear_form():
             "method": "GET",
             "url": "",
             "headers": "{}",
-            "body": "{}"
+            "body": "{}",
+            "extract": "[]"
         }
 
 
@@ -426,9 +456,14 @@ def reset_all_data():
         del st.session_state.test_results
     if 'test_config' in st.session_state:
         del st.session_state.test_config
+    if 'capacity_results' in st.session_state:
+        del st.session_state.capacity_results
+    if 'exports' in st.session_state:
+        del st.session_state.exports
 
-    # Reset APIs list
+    # Reset APIs list and the variables used for request chaining
     st.session_state.apis = []
+    st.session_state.variables = {}
 
     # Reset form
     st.session_state.form_key = 0
@@ -549,9 +584,38 @@ def parse_blazmeter_json(blazmeter_data):
     return apis
 
 
+def export_file(name, results, option, write, suffix):
+    """
+    Bytes of a results export, built by write(path) into a temporary file that is removed again.
+    The last export of each kind is kept in the session for the results it was built from, so
+    reruns of the page do not serialize the whole run again.
+    """
+    exports = st.session_state.setdefault('exports', {})
+    cached = exports.get(name)
+    if cached is not None and cached[0] is results and cached[1] == option:
+        return cached[2]
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        write(path)
+        with open(path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(path)
+    exports[name] = (results, option, data)
+    return data
+
+
+def exported(name, results, option=None):
+    """Whether an export of this kind is ready for these results"""
+    cached = st.session_state.get('exports', {}).get(name)
+    return cached is not None and cached[0] is results and cached[1] == option
+
+
 def get_successful_apis(df):
     """
     Filter a dataframe to include only APIs that were successful (status code < 400) for all requests.
+    Requests that never got a response, such as timeouts, count as failures.
     
     Args:
         df (pandas.DataFrame): DataFrame containing API test results
@@ -560,7 +624,7 @@ def get_successful_apis(df):
         pandas.DataFrame: Filtered DataFrame containing only successful API results
     """
     # Get URLs where all requests were successful (status code < 400)
-    successful_urls = df.groupby("url")["status_code"].apply(lambda x: all(x < 400))
+    successful_urls = error_mask(df).groupby(df["url"]).apply(lambda x: not x.any())
     successful_urls = successful_urls[successful_urls].index.tolist()
     
     # Return filtered dataframe with only successful APIs
@@ -591,11 +655,152 @@ def main():
         test_mode = st.radio("Test Input Mode",
                              ["Manual Entry", "File Upload"])
 
+        run_mode = st.radio("Run Mode", ["Load Test", "Capacity Search"],
+                            help="Capacity Search steps the load up until the SLOs are breached "
+                                 "and reports the maximum throughput that met them.")
+
         # Test configuration
         virtual_users = st.number_input("Virtual Users", min_value=1, value=10)
         ramp_up_time = st.number_input("Ramp-up Time (seconds)",
                                        min_value=1,
                                        value=5)
+        iterations = st.number_input("Iterations per User", min_value=1, value=1,
+                                     help="How many times each virtual user runs through the API list")
+        pacing = st.number_input("Pacing (seconds per iteration)", min_value=0.0, value=0.0, step=0.5,
+                                 help="Fixed cycle time between iteration starts. 0 disables pacing.")
+        warmup_iterations = st.number_input("Warm-up Iterations", min_value=0, value=0,
+                                            help="Extra iterations run before the measured ones. "
+                                                 "Their samples are excluded from the headline metrics.")
+        warmup_seconds = st.number_input("Warm-up Period (seconds)", min_value=0.0, value=0.0, step=1.0,
+                                         help="Samples started in the first seconds of the run are "
+                                              "treated as warm-up. 0 disables the period.")
+
+        traffic_mix = st.checkbox("Weighted Traffic Mix", value=False,
+                                  help="Each request picks an API at random by its weight instead of "
+                                       "running the list in order")
+        requests_per_iteration = None
+        if traffic_mix:
+            requests_per_iteration = st.number_input("Requests per Iteration", min_value=1,
+                                                     value=max(len(st.session_state.get('apis', [])), 1))
+
+        if run_mode == "Capacity Search":
+            st.header("Capacity Search")
+            search_by = st.selectbox("Search By", ["Concurrency", "Arrival Rate"],
+                                     help="Step the number of virtual users or the request rate (requests/s)")
+            slo_p95 = st.number_input("p95 SLO (ms)", min_value=1.0, value=500.0, step=50.0)
+            slo_error_rate = st.number_input("Error Rate SLO (%)", min_value=0.0, value=1.0, step=0.5)
+            max_level = st.number_input("Max Level", min_value=2, value=256,
+                                        help="Highest number of users or requests/s to try")
+            step_duration = st.number_input("Step Duration (seconds)", min_value=1, value=10)
+
+        st.header("Load Limits")
+        rate_limit = st.number_input("Global Rate Limit (requests/s)", min_value=0.0, value=0.0, step=1.0,
+                                     help="Token-bucket cap on total request rate. 0 disables the limit. "
+                                          "Per-API limits can be set with a \"rate_limit\" key on the API.")
+        max_connections_per_host = st.number_input("Max Connections per Host", min_value=0, value=0,
+                                                   help="Cap on in-flight requests per host. 0 disables the cap.")
+
+        st.header("Protocol")
+        protocol = st.radio("HTTP Version", ["HTTP/1.1", "HTTP/2"], horizontal=True,
+                            help="HTTP/2 multiplexes every virtual user's requests over a few connections")
+        http2_connections = 1
+        max_concurrent_streams = 100
+        if protocol == "HTTP/2":
+            if not http2_available():
+                st.error("HTTP/2 mode needs httpx with HTTP/2 support: pip install 'httpx[http2]'")
+            http2_connections = st.number_input("HTTP/2 Connections", min_value=1, value=1)
+            max_concurrent_streams = st.number_input("Max Concurrent Streams per Connection",
+                                                     min_value=1, value=100)
+
+        st.header("DNS")
+        dns_cache_enabled = st.checkbox("Cache DNS Lookups", value=False,
+                                        help="Resolve each host once per TTL instead of on every new connection")
+        dns_ttl = st.number_input("DNS Cache TTL (seconds)", min_value=1, value=60)
+        pinned_hosts_text = st.text_area(
+            "Pinned Hosts (one per line)", value="",
+            help="Bypass the resolver, e.g. \"api.example.com=10.0.0.5,10.0.0.6\". "
+                 "Several addresses are used round-robin.")
+        pinned_hosts = {}
+        for line in pinned_hosts_text.splitlines():
+            if line.strip():
+                host, _, addresses = line.partition("=")
+                pinned_hosts[host.strip()] = [a.strip() for a in addresses.split(",") if a.strip()]
+        dns_cache = None
+        if dns_cache_enabled or pinned_hosts:
+            dns_cache = {"ttl": dns_ttl if dns_cache_enabled else 0, "pinned": pinned_hosts}
+            try:
+                build_dns_cache(dns_cache)
+            except ValueError as e:
+                st.error(f"Invalid pinned host address: {e}")
+                dns_cache = None
+
+        st.header("Timeouts")
+        connect_timeout = st.number_input("Connect Timeout (seconds)", min_value=0.1, value=10.0, step=1.0)
+        read_timeout = st.number_input("Read Timeout (seconds)", min_value=0.1, value=60.0, step=5.0,
+                                       help="Default for every API; an API can override it in its settings")
+        iteration_deadline = st.number_input("Iteration Deadline (seconds)", min_value=0.0, value=0.0, step=5.0,
+                                             help="Total time budget for one pass over the API list. "
+                                                  "Remaining APIs are skipped once it runs out. 0 disables it.")
+
+        st.header("Monitoring")
+        metrics_enabled = st.checkbox("Expose Prometheus Metrics", value=False,
+                                      help="Serve live request counters, in-flight gauges and latency histograms "
+                                           "per API on /metrics while the test runs")
+        metrics_port = st.number_input("Metrics Port", min_value=1, max_value=65535, value=DEFAULT_METRICS_PORT)
+        metrics_host = st.text_input("Metrics Bind Address", value="127.0.0.1",
+                                     help="Use 0.0.0.0 to let a Prometheus server on another host scrape it")
+        metrics = {"port": int(metrics_port), "host": metrics_host} if metrics_enabled else None
+
+        st.header("Run History")
+        save_history = st.checkbox("Save Runs to History", value=True,
+                                   help="Keep each run's configuration and per-API aggregates in a local database")
+        run_tags = st.text_input("Run Tags", value="", help="Comma-separated tags, e.g. \"nightly, v2.3\"")
+        stream_results = st.checkbox("Stream Results to Disk", value=True,
+                                     help="Append results to a log under results/ while the test runs, "
+                                          "so an interrupted run can be recovered")
+        keep_samples = st.checkbox("Keep Raw Samples", value=False,
+                                   help="Also store every sample in a compressed columnar file next to the database")
+
+        st.header("Abort Thresholds")
+        abort_rules_text = st.text_area(
+            "Abort Rules (one per line)", value="",
+            help="Stop the run early when a rule is breached, e.g. \"error_rate > 50% over 10s\" or "
+                 "\"p95 > 2000 over 30s\". Metrics: error_rate, avg, p50, p90, p95, p99, max.")
+        drain_timeout = st.number_input("Drain Timeout (seconds)", min_value=0, value=10,
+                                        help="How long in-flight requests may finish after an abort")
+        abort_rules = []
+        for line in abort_rules_text.splitlines():
+            if line.strip():
+                try:
+                    abort_rules.append(AbortRule.parse(line))
+                except ValueError as e:
+                    st.error(str(e))
+
+        st.header("Thresholds")
+        thresholds_text = st.text_area(
+            "Pass/Fail Thresholds (one per line)", value="",
+            help="Objectives the run must meet to pass, e.g. \"p95 < 300ms\", \"error_rate < 1%\" or "
+                 "\"rps > 500\". Prefix with an API name to scope one, e.g. \"Login: p95 < 300ms\". "
+                 "Metrics: error_rate, avg, p50, p90, p95, p99, max, rps, requests.")
+        thresholds = []
+        for line in thresholds_text.splitlines():
+            if line.strip():
+                try:
+                    thresholds.append(Threshold.parse(line))
+                except ValueError as e:
+                    st.error(str(e))
+
+        st.header("Service Levels")
+        apdex_t = st.number_input("Apdex Target (ms)", min_value=1.0, value=float(DEFAULT_APDEX_T), step=50.0,
+                                  help="Requests within the target are satisfied, within four times it tolerated")
+        latency_buckets_text = st.text_input("Latency Buckets (ms)", value=", ".join(f"{b:g}" for b in DEFAULT_BUCKETS),
+                                             help="Comma-separated thresholds reported as the share of requests "
+                                                  "within each, e.g. \"200, 500\"")
+        try:
+            latency_buckets = [float(b) for b in latency_buckets_text.split(",") if b.strip()]
+        except ValueError:
+            st.error("Latency buckets must be numbers in milliseconds")
+            latency_buckets = list(DEFAULT_BUCKETS)
 
         # Authentication section in sidebar
         st.header("Authorization")
@@ -631,6 +836,48 @@ def main():
                 value=st.session_state.form_defaults["headers"])
             body = st.text_area("Request Body (JSON format)",
                                 value=st.session_state.form_defaults["body"])
+            extract = st.text_area(
+                "Extract Values (JSON format)",
+                value=st.session_state.form_defaults.get("extract", "[]"),
+                help='Values to store for later requests, e.g. [{"name": "token", "type": "jsonpath", '
+                     '"expression": "$.data.token"}]. Types: jsonpath, regex, header. '
+                     'Use {{token}} in the URL, headers or body of later APIs.')
+
+            # Think time applied after this API before the virtual user's next request
+            think_type = st.selectbox("Think Time", ["None", "Constant", "Uniform", "Exponential"],
+                                      help="Pause after this API. Constant uses the value, uniform picks "
+                                           "between the value and the max, exponential uses the value as mean.")
+            think_value = st.number_input("Think Time (seconds)", min_value=0.0, value=1.0, step=0.5)
+            think_max = st.number_input("Think Time Max (seconds, uniform only)", min_value=0.0,
+                                        value=2.0, step=0.5)
+            api_connect_timeout = st.number_input("Connect Timeout (seconds, 0 = test default)",
+                                                  min_value=0.0, value=0.0, step=1.0)
+            api_read_timeout = st.number_input("Read Timeout (seconds, 0 = test default)",
+                                               min_value=0.0, value=0.0, step=1.0)
+
+            accept_encoding = st.selectbox("Accept-Encoding", ["Default", "gzip", "br", "deflate", "identity"],
+                                           help="Response encodings offered to the server")
+            compress_body = st.selectbox("Compress Request Body", ["None"] + list(BODY_ENCODINGS))
+
+            weight = st.number_input("Traffic Mix Weight", min_value=0.0, value=1.0, step=1.0,
+                                     help="Relative share of requests when the weighted traffic mix is on")
+
+            # Retries are off unless more than one attempt is allowed
+            retry_attempts = st.number_input("Max Attempts (1 = no retries)", min_value=1, value=1, step=1)
+            retry_statuses = st.text_input("Retry on Status Codes", value="502, 503, 504",
+                                           help="Comma-separated status codes that are retried")
+            retry_on = st.multiselect("Retry on Errors", list(RETRYABLE_OUTCOMES),
+                                      default=["timeout", "connect_error", "reset"])
+            retry_backoff = st.number_input("Retry Backoff (seconds)", min_value=0.0, value=0.1, step=0.1,
+                                            help="Base delay, doubled after every attempt with full jitter")
+
+            api_apdex_t = st.number_input("Apdex Target (ms, 0 = test default)", min_value=0.0, value=0.0,
+                                          step=50.0)
+            api_latency_buckets = st.text_input("Latency Buckets (ms, empty = test default)", value="",
+                                                help="Comma-separated, e.g. \"100, 300\"")
+            api_thresholds = st.text_input("Thresholds", value="",
+                                           help="Comma-separated objectives for this API, e.g. "
+                                                "\"p95 < 300ms, error_rate < 1%\"")
 
             submitted = st.form_submit_button("Add API")
             if submitted:
@@ -642,6 +889,34 @@ def main():
                         headers_dict = json.loads(headers)
                         headers_dict.update(auth_details)
                         body_dict = json.loads(body)
+                        extract_list = json.loads(extract) if extract.strip() else []
+                        # Validate extractors up front so mistakes surface in the form
+                        compile_extractors(extract_list)
+
+                        think_time = None
+                        if think_type == "Constant":
+                            think_time = {"type": "constant", "value": think_value}
+                        elif think_type == "Uniform":
+                            think_time = {"type": "uniform", "min": think_value, "max": think_max}
+                        elif think_type == "Exponential":
+                            think_time = {"type": "exponential", "mean": think_value}
+                        compile_think_time(think_time)
+
+                        retry = None
+                        if retry_attempts > 1:
+                            retry = {
+                                "max_attempts": int(retry_attempts),
+                                "retry_on_status": [int(code) for code in retry_statuses.split(",")
+                                                    if code.strip()],
+                                "retry_on": retry_on,
+                                "backoff": retry_backoff
+                            }
+                            RetryPolicy.from_spec(retry)
+
+                        bucket_list = [float(b) for b in api_latency_buckets.split(",") if b.strip()]
+                        threshold_list = [t.strip() for t in api_thresholds.split(",") if t.strip()]
+                        for threshold in threshold_list:
+                            Threshold.parse(threshold)
 
                         # If API name is empty, generate one from URL or use a sequential name
                         if not api_name:
@@ -666,6 +941,28 @@ def main():
                             "headers": headers_dict,
                             "body": body_dict
                         }
+                        if extract_list:
+                            api["extract"] = extract_list
+                        if think_time:
+                            api["think_time"] = think_time
+                        if api_connect_timeout:
+                            api["connect_timeout"] = api_connect_timeout
+                        if api_read_timeout:
+                            api["read_timeout"] = api_read_timeout
+                        if weight != 1.0:
+                            api["weight"] = weight
+                        if accept_encoding != "Default":
+                            api["accept_encoding"] = accept_encoding
+                        if compress_body != "None":
+                            api["compress_body"] = compress_body
+                        if retry:
+                            api["retry"] = retry
+                        if threshold_list:
+                            api["thresholds"] = threshold_list
+                        if api_apdex_t:
+                            api["apdex_t"] = api_apdex_t
+                        if bucket_list:
+                            api["latency_buckets"] = bucket_list
                         st.session_state.apis.append(api)
 
                         # Reset form defaults
@@ -673,7 +970,8 @@ def main():
                             "method": "GET",
                             "url": "",
                             "headers": "{}",
-                            "body": "{}"
+                            "body": "{}",
+                            "extract": "[]"
                         }
 
                         # Increment form key to force complete reset
@@ -681,7 +979,9 @@ def main():
 
                         st.rerun()
                     except json.JSONDecodeError:
-                        st.error("Invalid JSON format in headers or body")
+                        st.error("Invalid JSON format in headers, body or extract values")
+                    except (KeyError, ValueError) as e:
+                        st.error(f"Invalid extract values, think time or retry settings: {str(e)}")
 
         # Display success message outside the form if an API was just added
         if 'apis' in st.session_state and len(st.session_state.apis) > 0:
@@ -694,15 +994,32 @@ def main():
         st.subheader("Upload API Collection")
         collection_format = st.radio(
             "Collection Format",
-            ["Postman Collection", "BlazMeter JSON"],
+            ["Postman Collection", "BlazMeter JSON", "HAR", "OpenAPI"],
             horizontal=True
         )
         
         uploaded_file = st.file_uploader(
-            f"Upload {'Postman Collection' if collection_format == 'Postman Collection' else 'BlazMeter JSON'}", 
-            type=["json"]
+            f"Upload {collection_format}",
+            type={"HAR": ["har", "json"], "OpenAPI": ["json", "yaml", "yml"]}.get(collection_format, ["json"])
         )
+
+        if collection_format == "HAR":
+            har_skip_static = st.checkbox("Skip static assets", value=True,
+                                          help="Leave out images, scripts, stylesheets and fonts loaded by the browser")
+            har_keep_mix = st.checkbox("Keep recorded traffic mix", value=False,
+                                       help="Identical requests are imported once; this keeps how often each "
+                                            "was recorded as its weight in the traffic mix")
         
+        environment_variables = {}
+        if collection_format == "Postman Collection":
+            environment_file = st.file_uploader("Postman Environment (optional)", type=["json"],
+                                                help="Environment values override collection variables")
+            if environment_file:
+                try:
+                    environment_variables = load_environment(environment_file)
+                except ValueError as e:
+                    st.error(f"Error reading environment file: {str(e)}")
+
         # Reset imported flag when a new file is uploaded
         if uploaded_file and 'last_uploaded_file' in st.session_state and st.session_state.last_uploaded_file != uploaded_file.name:
             st.session_state.has_imported_apis = False
@@ -712,46 +1029,36 @@ def main():
             st.session_state.last_uploaded_file = uploaded_file.name
             
             try:
-                collection = json.load(uploaded_file)
                 imported_apis = []
-                
-                if collection_format == "Postman Collection":
-                    # Existing Postman collection processing
-                    for i, item in enumerate(collection.get("item", [])):
-                        request = item.get("request", {})
-                        headers_dict = {
-                            h["key"]: h["value"]
-                            for h in request.get("header", [])
-                        }
-                        headers_dict.update(auth_details)  # Add auth headers
-                        body_raw = request.get("body", {}).get("raw", "{}")
-
-                        # Check if body_raw is a string with double quotes and parse it
-                        if isinstance(body_raw, str):
-                            # Remove outer quotes if they exist
-                            body_raw = body_raw.strip('"')
-                            try:
-                                body_dict = json.loads(body_raw)  # Parse the cleaned string
-                            except json.JSONDecodeError:
-                                body_dict = body_raw  # Keep as is if parsing fails
-                        else:
-                            body_dict = body_raw  # If not a string, use as is
-
-                        # Use the name from Postman collection if available
-                        api_name = item.get("name") if item.get("name") else f"API {i + 1}"
-                        url = request.get("url", {}).get("raw", "")
 
-                        api = {
-                            "name": api_name,
-                            "method": request.get("method", "GET"),
-                            "url": url,
-                            "headers": headers_dict,
-                            "body": body_dict
-                        }
-                        imported_apis.append(api)
+                if collection_format == "Postman Collection":
+                    # Streamed import: nested folders are walked and variables resolved
+                    imported = import_postman(uploaded_file, environment_variables)
+                    imported_apis = imported["apis"]
+                    for api in imported_apis:
+                        api["headers"].update(auth_details)  # Add auth headers
+                    # Collection variables seed every virtual user's context
+                    collection_variables = imported["variables"]
+                    folders = {api["folder"] for api in imported_apis if api.get("folder")}
+                    st.caption(f"Found {len(imported_apis)} requests in {len(folders)} folders")
+                elif collection_format == "HAR":
+                    imported = import_har(uploaded_file, skip_static=har_skip_static, keep_mix=har_keep_mix)
+                    imported_apis = imported["apis"]
+                    for api in imported_apis:
+                        api["headers"].update(auth_details)  # Add auth headers
+                    st.caption(f"Found {len(imported_apis)} unique requests in {imported['entries']} entries "
+                               f"({imported['skipped']} skipped)")
+                elif collection_format == "OpenAPI":
+                    imported = import_openapi(load_spec(uploaded_file))
+                    imported_apis = imported["apis"]
+                    for api in imported_apis:
+                        api["headers"].update(auth_details)  # Add auth headers
+                    # Example path parameter values seed every virtual user's context
+                    collection_variables = imported["variables"]
+                    st.caption(f"Found {len(imported_apis)} operations")
                 else:  # BlazMeter JSON
                     # Parse BlazMeter JSON format
-                    imported_apis = parse_blazmeter_json(collection)
+                    imported_apis = parse_blazmeter_json(json.load(uploaded_file))
                 
                 # Create a container for buttons
                 buttons_container = st.container()
@@ -787,6 +1094,9 @@ def main():
                                 
                                 st.session_state.apis.extend(imported_apis)
                                 st.session_state.has_imported_apis = True
+                                if collection_format in ("Postman Collection", "OpenAPI"):
+                                    st.session_state.variables = {
+                                        **st.session_state.get('variables', {}), **collection_variables}
                                 #st.success(f"Successfully imported {len(imported_apis)} APIs")
                             else:
                                 st.error("No valid APIs found to import.")
@@ -801,6 +1111,7 @@ def main():
                         
                         if clear_btn:
                             st.session_state.apis = []
+                            st.session_state.variables = {}
                             st.session_state.has_imported_apis = False
                             st.success("All imported APIs have been cleared")
                             st.rerun()
@@ -1121,18 +1432,170 @@ def main():
             # Simulate a long-running process (replace this with your actual test logic)
             time.sleep(5)  # Simulate a delay for the performance test
             
-            # Store test results in session state
-            tester = APITester(st.session_state.apis, virtual_users, ramp_up_time)
-            st.session_state.test_results = tester.run_test()
-            st.session_state.test_config = {
-                'virtual_users': virtual_users,
-                'ramp_up_time': ramp_up_time
-            }
-            st.success("Performance test completed!")
+            if run_mode == "Capacity Search":
+                search = CapacitySearch(
+                    st.session_state.apis,
+                    slo_p95=slo_p95,
+                    slo_error_rate=slo_error_rate,
+                    mode="concurrency" if search_by == "Concurrency" else "rate",
+                    max_level=max_level,
+                    step_duration=step_duration,
+                    ramp_up_time=ramp_up_time,
+                    variables=st.session_state.get('variables', {}),
+                    max_connections_per_host=max_connections_per_host or None,
+                    protocol=protocol.lower(),
+                    http2_connections=http2_connections,
+                    max_concurrent_streams=max_concurrent_streams,
+                    dns_cache=dns_cache,
+                    traffic_mix=traffic_mix,
+                    requests_per_iteration=requests_per_iteration,
+                    pacing=pacing or None,
+                    warmup_iterations=warmup_iterations,
+                    warmup_seconds=warmup_seconds,
+                    abort_rules=abort_rules,
+                    drain_timeout=drain_timeout,
+                    connect_timeout=connect_timeout,
+                    read_timeout=read_timeout,
+                    iteration_deadline=iteration_deadline or None)
+                progress_text = st.empty()
+                try:
+                    st.session_state.capacity_results = search.run(
+                        progress=lambda step: progress_text.text(
+                            f"Level {step['level']:g}: {step['throughput']} req/s, p95 {step['p95']}ms, "
+                            f"errors {step['error_rate']}% - "
+                            f"{'pass' if step['passed'] else 'aborted' if step['aborted'] else 'SLO breached'}"))
+                finally:
+                    search.close()
+                st.session_state.capacity_config = {
+                    'slo_p95': slo_p95,
+                    'slo_error_rate': slo_error_rate,
+                    'search_by': search_by
+                }
+                st.success("Capacity search completed!")
+            else:
+                result_log = None
+                if stream_results:
+                    result_log = ResultLog(
+                        os.path.join(RESULTS_DIR, f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"),
+                        metadata={'virtual_users': virtual_users, 'ramp_up_time': ramp_up_time,
+                                  'apis': len(st.session_state.apis)})
+                # Store test results in session state
+                tester = APITester(st.session_state.apis, virtual_users, ramp_up_time,
+                                   variables=st.session_state.get('variables', {}),
+                                   iterations=iterations,
+                                   pacing=pacing or None,
+                                   rate_limit=rate_limit or None,
+                                   max_connections_per_host=max_connections_per_host or None,
+                                   warmup_iterations=warmup_iterations,
+                                   warmup_seconds=warmup_seconds,
+                                   abort_rules=abort_rules,
+                                   drain_timeout=drain_timeout,
+                                   connect_timeout=connect_timeout,
+                                   read_timeout=read_timeout,
+                                   iteration_deadline=iteration_deadline or None,
+                                   protocol=protocol.lower(),
+                                   http2_connections=http2_connections,
+                                   max_concurrent_streams=max_concurrent_streams,
+                                   dns_cache=dns_cache,
+                                   traffic_mix=traffic_mix,
+                                   requests_per_iteration=requests_per_iteration,
+                                   observers=[result_log] if result_log else None,
+                                   # Results streamed to the log are not also held in memory while the run goes
+                                   keep_results=result_log is None,
+                                   metrics=metrics)
+                if metrics:
+                    st.caption(f"Live metrics at {tester.metrics.url}")
+                try:
+                    st.session_state.test_results = tester.run_test()
+                    if result_log:
+                        # The dashboard and report are rebuilt from the log once everything is written
+                        result_log.flush()
+                        st.session_state.test_results = read_log(result_log.path)["results"]
+                        if result_log.dropped:
+                            st.warning(f"{result_log.dropped} results were dropped because the disk fell behind.")
+                    tester.run_info["sli_settings"] = sli_settings(st.session_state.apis, apdex_t, latency_buckets)
+                    # Verdicts travel with the run, so reports, logs and history all carry them
+                    run_thresholds = collect_thresholds(thresholds, st.session_state.apis)
+                    if run_thresholds:
+                        tester.run_info["thresholds"] = evaluate_thresholds(st.session_state.test_results,
+                                                                            run_thresholds)
+                finally:
+                    if result_log:
+                        result_log.close(tester.run_info)
+                st.session_state.test_config = {
+                    'virtual_users': virtual_users,
+                    'ramp_up_time': ramp_up_time,
+                    'iterations': iterations,
+                    'pacing': pacing,
+                    'rate_limit': rate_limit,
+                    'max_connections_per_host': max_connections_per_host,
+                    'warmup_iterations': warmup_iterations,
+                    'warmup_seconds': warmup_seconds,
+                    'connect_timeout': connect_timeout,
+                    'read_timeout': read_timeout,
+                    'iteration_deadline': iteration_deadline,
+                    'protocol': protocol,
+                    'dns_cache': dns_cache,
+                    'traffic_mix': traffic_mix,
+                    'run_info': tester.run_info
+                }
+                if save_history and st.session_state.test_results:
+                    history = RunHistory()
+                    try:
+                        st.session_state.test_config['run_id'] = history.save_run(
+                            st.session_state.test_results, virtual_users, ramp_up_time, st.session_state.apis,
+                            config={k: v for k, v in st.session_state.test_config.items() if k != 'run_info'},
+                            run_info=tester.run_info,
+                            tags=[tag.strip() for tag in run_tags.split(",")],
+                            keep_samples=keep_samples)
+                    finally:
+                        history.close()
+                if tester.run_info["status"] == "aborted":
+                    st.warning("Performance test aborted: " + tester.run_info["abort_reason"])
+                elif not thresholds_passed(tester.run_info.get("thresholds", [])):
+                    st.error("Performance test completed but failed its thresholds")
+                else:
+                    st.success("Performance test completed!")
 
         # Hide loading animation
         st.markdown("<style>.loading-animation { display: none; }</style>", unsafe_allow_html=True)
 
+    # Display capacity search results if available
+    if 'capacity_results' in st.session_state:
+        capacity = st.session_state.capacity_results
+        capacity_config = st.session_state.capacity_config
+        level_label = "Virtual Users" if capacity["mode"] == "concurrency" else "Target Rate (req/s)"
+
+        st.header("Capacity Search Results")
+        cap_col1, cap_col2, cap_col3 = st.columns(3)
+        with cap_col1:
+            st.metric("Max RPS at SLO", f"{capacity['max_rps_at_slo']:.1f}")
+        with cap_col2:
+            knee = capacity["knee_level"]
+            st.metric(f"Knee ({level_label})", f"{knee:g}" if knee is not None else "-")
+        with cap_col3:
+            st.metric("SLO", f"p95 ≤ {capacity_config['slo_p95']:g}ms, errors ≤ {capacity_config['slo_error_rate']:g}%")
+        if capacity["limit_not_reached"]:
+            st.info("Every step met the SLOs. Increase Max Level to find the real limit.")
+        elif capacity["knee_level"] is None:
+            st.warning("The first step already breached the SLOs.")
+
+        # Throughput-vs-latency curve, one point per evaluated step
+        steps_df = pd.DataFrame(capacity["steps"])
+        fig_capacity = px.line(steps_df, x="throughput", y="p95", markers=True,
+                               hover_data=["level", "error_rate", "passed"],
+                               labels={"throughput": "Throughput (req/s)", "p95": "p95 Response Time (ms)"},
+                               title="Throughput vs Latency")
+        fig_capacity.add_hline(y=capacity_config["slo_p95"], line_dash="dash", line_color="#E74C3C",
+                               annotation_text="p95 SLO")
+        st.plotly_chart(fig_capacity, use_container_width=True)
+
+        steps_display = steps_df.rename(columns={
+            "level": level_label, "virtual_users": "Virtual Users", "requests": "Request Count",
+            "throughput": "Throughput", "p95": "p95%", "error_rate": "Error Rate", "passed": "Meets SLO"})
+        steps_display = steps_display.loc[:, ~steps_display.columns.duplicated()]
+        st.dataframe(format_dataframe(steps_display), use_container_width=True, hide_index=True)
+
     # Display results if available
     if 'test_results' in st.session_state:
         results = st.session_state.test_results
@@ -1142,13 +1605,22 @@ def main():
         # Convert status_code to integer if it's string
         df = pd.DataFrame(results)
         df['status_code'] = pd.to_numeric(df['status_code'], errors='coerce')
+        # Requests without a status code (e.g. timeouts) count as errors alongside HTTP errors
+        df['is_error'] = error_mask(df)
+        df['outcome'] = outcome_column(df)
+
+        # Keep warm-up samples out of the headline metrics; they are summarized separately below
+        warmup_df = df.iloc[0:0]
+        if 'warmup' in df.columns:
+            is_warmup = df['warmup'].fillna(False).astype(bool)
+            if not is_warmup.all():
+                warmup_df = df[is_warmup]
+                df = df[~is_warmup].reset_index(drop=True)
 
         # Calculate overall metrics and round to 1 decimal place
-        total_requests = len(results)
-        avg_response_time = round(sum(r["response_time"]
-                                for r in results) / total_requests, 1)
-        error_rate = round(sum(1 for r in results
-                         if r["status_code"] >= 400) / total_requests * 100, 1)
+        total_requests = len(df)
+        avg_response_time = round(df["response_time"].mean(), 1)
+        error_rate = round(df["is_error"].mean() * 100, 1)
 
         # Calculate percentiles and round to 1 decimal place
         p90 = round(df["response_time"].quantile(0.9), 1)
@@ -1157,6 +1629,35 @@ def main():
 
         st.header("Test Results")
 
+        run_info = st.session_state.test_config.get('run_info', {})
+        if run_info.get("status") == "aborted":
+            st.error(f"Run aborted after {run_info.get('aborted_after', 0)}s: {run_info['abort_reason']}. "
+                     "Results below cover the requests completed before the abort.")
+        if run_info.get("status") == "interrupted":
+            st.warning("This run was interrupted. Showing the results recovered from its log.")
+        if run_info.get("deadline_skipped"):
+            st.warning(f"{run_info['deadline_skipped']} requests were skipped because their iteration "
+                       "ran out of its deadline.")
+        if run_info.get("http1_fallbacks"):
+            st.warning(f"{run_info['http1_fallbacks']} requests in HTTP/2 mode were answered over HTTP/1.1 "
+                       "because the server did not negotiate HTTP/2; they were not multiplexed.")
+
+        # Pass/fail verdict against the thresholds set for the run
+        if run_info.get("thresholds"):
+            verdicts = run_info["thresholds"]
+            failed = [verdict for verdict in verdicts if not verdict["passed"]]
+            if failed:
+                st.error(f"FAIL: {len(failed)} of {len(verdicts)} thresholds not met")
+            else:
+                st.success(f"PASS: all {len(verdicts)} thresholds met")
+            verdicts_df = pd.DataFrame(verdicts)[["threshold", "api", "observed", "requests", "passed"]].rename(
+                columns={"threshold": "Threshold", "api": "Scope", "observed": "Observed",
+                         "requests": "Requests", "passed": "Passed"})
+            verdicts_df["Scope"] = verdicts_df["Scope"].fillna("All requests")
+            st.dataframe(verdicts_df.round(1), use_container_width=True, hide_index=True)
+            st.download_button("Download Verdicts (JUnit XML)", data=to_junit_xml(verdicts),
+                               file_name="thresholds.xml", mime="application/xml")
+
         # Add endpoint names for better display
         df['endpoint'] = df['url'].apply(get_endpoint_name)
 
@@ -1175,6 +1676,131 @@ def main():
         with col6:
             st.metric("Error Rate", f"{error_rate:.2f}%")
 
+        # Warm-up samples, shown apart from the measured run
+        if not warmup_df.empty:
+            with st.expander(f"Warm-up ({len(warmup_df)} requests excluded from the metrics)"):
+                warm_col1, warm_col2, warm_col3, warm_col4 = st.columns(4)
+                with warm_col1:
+                    st.metric("Avg Response Time", f"{warmup_df['response_time'].mean():.1f}ms")
+                with warm_col2:
+                    st.metric("p95 Response Time", f"{warmup_df['response_time'].quantile(0.95):.1f}ms")
+                with warm_col3:
+                    st.metric("Max Response Time", f"{warmup_df['response_time'].max():.1f}ms")
+                with warm_col4:
+                    st.metric("Error Rate", f"{warmup_df['is_error'].mean() * 100:.1f}%")
+
+        # Traffic mix - checks the sampled request mix against the requested weights
+        if run_info.get("traffic_mix"):
+            st.subheader("Traffic Mix")
+            mix_df = pd.DataFrame(run_info["traffic_mix"]).rename(columns={
+                "requested": "Requested %", "achieved": "Achieved %", "requests": "Requests",
+                "within_tolerance": "Within Tolerance"})
+            if not mix_df["Within Tolerance"].all():
+                st.warning("Some APIs received a share of requests more than three standard errors "
+                           "away from their weight.")
+            st.dataframe(mix_df, use_container_width=True, hide_index=True)
+
+        # DNS cache - lookups that would otherwise be hidden inside connection time
+        if run_info.get("dns"):
+            st.subheader("DNS Resolution")
+            dns = run_info["dns"]
+            dns_col1, dns_col2, dns_col3, dns_col4 = st.columns(4)
+            with dns_col1:
+                st.metric("Cached Lookups", dns["hits"])
+            with dns_col2:
+                st.metric("Resolver Lookups", dns["misses"])
+            with dns_col3:
+                st.metric("Pinned Lookups", dns["pinned"])
+            with dns_col4:
+                st.metric("Time in Resolver", f"{dns['resolver_time']:.1f}ms",
+                          help="Total time spent in the system resolver on cache misses")
+
+        # Virtual user fairness - whether every user got its share of the work
+        vu = vu_summary(df)
+        if vu:
+            st.subheader("Virtual User Fairness")
+            vu_col1, vu_col2, vu_col3, vu_col4 = st.columns(4)
+            with vu_col1:
+                st.metric("Active Users", vu["users"])
+            with vu_col2:
+                st.metric("Requests per User", f"{vu['min_requests']} – {vu['max_requests']}",
+                          help="Fewest and most requests made by a single virtual user")
+            with vu_col3:
+                st.metric("Iterations per User", f"{vu['min_iterations']} – {vu['max_iterations']}")
+            with vu_col4:
+                st.metric("Fairness Index", f"{vu['fairness']:.3f}",
+                          help="Jain's fairness index of requests per user; 1 means perfectly even")
+
+        # Scheduling accuracy - shows whether think time, pacing and ramp-up were honored
+        scheduling = scheduling_accuracy(df)
+        if scheduling:
+            st.subheader("Scheduling Accuracy")
+            lag_col1, lag_col2, lag_col3, lag_col4 = st.columns(4)
+            with lag_col1:
+                st.metric("Avg Schedule Lag", f"{scheduling['avg_lag']:.1f}ms")
+            with lag_col2:
+                st.metric("p95 Schedule Lag", f"{scheduling['p95_lag']:.1f}ms")
+            with lag_col3:
+                st.metric("Max Schedule Lag", f"{scheduling['max_lag']:.1f}ms")
+            with lag_col4:
+                st.metric(f"Late by > {scheduling['late_threshold']}ms", f"{scheduling['late_pct']:.1f}%",
+                          help="Share of requests dispatched more than 10ms after their scheduled time. "
+                               "High values mean pacing could not be honored.")
+
+        # Limiter delay - kept apart so it is never confused with server latency
+        delay = limiter_delay(df)
+        if delay:
+            st.subheader("Rate Limiter Delay")
+            queue_col1, queue_col2, queue_col3 = st.columns(3)
+            with queue_col1:
+                st.metric("Avg Queue Time", f"{delay['avg_queue_time']:.1f}ms",
+                          help="Time requests waited behind the rate and connection limiters. "
+                               "Not included in response times.")
+            with queue_col2:
+                st.metric("p95 Queue Time", f"{delay['p95_queue_time']:.1f}ms")
+            with queue_col3:
+                st.metric("Total Queue Time", f"{delay['total_queue_time']:.1f}s")
+
+        # Retries - user-perceived latency next to what the first attempt alone took
+        retries = retry_summary(df)
+        if retries:
+            st.subheader("Retries")
+            retry_col1, retry_col2, retry_col3, retry_col4 = st.columns(4)
+            with retry_col1:
+                st.metric("Retry Amplification", f"{retries['amplification']:.2f}x",
+                          help="Requests actually sent per logical request for APIs with a retry policy")
+            with retry_col2:
+                st.metric("Requests Retried", f"{retries['retried_pct']:.1f}%",
+                          help=f"{retries['recovered']} recovered, {retries['exhausted']} still failed")
+            with retry_col3:
+                st.metric("p95 First Attempt", f"{retries['p95_first_attempt_time']:.1f}ms")
+            with retry_col4:
+                st.metric("p95 User-Perceived", f"{retries['p95_response_time']:.1f}ms",
+                          help="From the first attempt's start to the last attempt's end, including backoff")
+
+        # Payload sizes - wire bytes against decoded bytes, and how size drives latency
+        bandwidth = bandwidth_summary(df)
+        if bandwidth:
+            st.subheader("Payload Size and Bandwidth")
+            size_col1, size_col2, size_col3, size_col4 = st.columns(4)
+            with size_col1:
+                st.metric("Received on the Wire", f"{bandwidth['received_mb']:.2f}MB")
+            with size_col2:
+                st.metric("Compression Ratio", f"{bandwidth['compression_ratio']:.2f}x",
+                          help="Decoded bytes over wire bytes; 1.0 means nothing was compressed")
+            with size_col3:
+                st.metric("Receive Rate", f"{bandwidth['receive_rate']:.2f}MB/s")
+            with size_col4:
+                st.metric("Sent", f"{bandwidth['sent_mb']:.2f}MB")
+            size_df = df[df["response_bytes"] > 0]
+            if len(size_df) > 5000:
+                size_df = size_df.sample(5000, random_state=0)
+            fig_size = px.scatter(size_df, x="response_bytes", y="response_time", color="endpoint", opacity=0.6,
+                                  labels={"response_bytes": "Response Size on the Wire (bytes)",
+                                          "response_time": "Response Time (ms)"},
+                                  title="Response Time vs Response Size")
+            st.plotly_chart(fig_size, use_container_width=True)
+
         # Response time distribution
         st.subheader("Response Time Distribution")
         fig_dist = px.histogram(df,
@@ -1189,17 +1815,17 @@ def main():
         st.plotly_chart(fig_dist, use_container_width=True)
 
         # Error rates analysis - only show if errors exist
-        has_errors = (df["status_code"] >= 400).any()
+        has_errors = df["is_error"].any()
         if has_errors:
             st.subheader("Error Rates Analysis")
             # Add 'name' to the groupby if it exists in the dataframe
             if 'name' in df.columns:
-                error_rates = df[df["status_code"] >= 400].groupby(["name", "endpoint"]).size() / df.groupby(["name", "endpoint"]).size()
+                error_rates = df[df["is_error"]].groupby(["name", "endpoint"]).size() / df.groupby(["name", "endpoint"]).size()
                 error_rates = error_rates.sort_values(ascending=False).head()
                 # For display, we'll use the API name with endpoint
                 error_labels = [f"{name} - {endpoint}" for (name, endpoint) in error_rates.index]
             else:
-                error_rates = df[df["status_code"] >= 400].groupby("endpoint").size() / df.groupby("endpoint").size()
+                error_rates = df[df["is_error"]].groupby("endpoint").size() / df.groupby("endpoint").size()
                 error_rates = error_rates.sort_values(ascending=False).head()
                 error_labels = error_rates.index
             
@@ -1218,6 +1844,20 @@ def main():
                                      xaxis_tickangle=0)
             st.plotly_chart(fig_errors, use_container_width=True)
 
+            # Failures by outcome - separates client-side failures from HTTP errors
+            st.subheader("Failures by Outcome")
+            outcomes_by_api = outcome_breakdown(df, by="name")
+            outcomes_plot_df = outcomes_by_api.reset_index().melt(
+                id_vars="name", var_name="Outcome", value_name="Count")
+            fig_outcomes = px.bar(outcomes_plot_df[outcomes_plot_df["Count"] > 0],
+                                  x="name", y="Count", color="Outcome",
+                                  labels={"name": "API Endpoint", "Count": "Failed Requests"},
+                                  title="Failures by Outcome")
+            fig_outcomes.update_layout(barmode="stack", xaxis_tickangle=0)
+            st.plotly_chart(fig_outcomes, use_container_width=True)
+            outcomes_by_api.columns.name = None
+            st.dataframe(outcomes_by_api.reset_index(), use_container_width=True, hide_index=True)
+
         # Slowest APIs analysis (excluding failed APIs)
         st.subheader("Slowest APIs Analysis")
         
@@ -1274,62 +1914,34 @@ def main():
                     unsafe_allow_html=True)
 
         # Comprehensive API metrics
+        # Bottlenecks - how each API's latency responds to load, ranked worst first
+        bottlenecks = analyze_bottlenecks(df)
+        if not bottlenecks.empty:
+            st.subheader("Bottleneck Analysis")
+            load_series = per_second_series(df)
+            if len(load_series) > 1:
+                load_series["elapsed"] = load_series["second"] - load_series["second"].iloc[0]
+                fig_load = go.Figure()
+                fig_load.add_trace(go.Scatter(x=load_series["elapsed"], y=load_series["in_flight"],
+                                              name="In-Flight Requests"))
+                fig_load.add_trace(go.Scatter(x=load_series["elapsed"], y=load_series["p95_latency"],
+                                              name="p95 Latency (ms)", yaxis="y2"))
+                fig_load.update_layout(title="Load vs Latency", xaxis_title="Elapsed Time (s)",
+                                       yaxis=dict(title="In-Flight Requests"),
+                                       yaxis2=dict(title="Latency (ms)", overlaying="y", side="right"))
+                st.plotly_chart(fig_load, use_container_width=True)
+            flagged = bottlenecks[bottlenecks["verdict"].isin(["saturated", "super-linear"])]
+            for _, row in flagged.iterrows():
+                st.warning(f"**{row['method']} {row['name'] or row['url']}** ({row['verdict']}): "
+                           f"{row['recommendation']}")
+            st.caption("Saturation concurrency is peak throughput × unloaded latency (Little's law); "
+                       "a growth exponent above 1 means latency grows faster than load")
+            st.dataframe(bottlenecks.drop(columns=["recommendation"]), use_container_width=True, hide_index=True)
+
         st.subheader("Comprehensive API Metrics")
-        # Get the method for each URL (taking the first method if multiple)
-        method_by_url = df.groupby("url")["method"].first()
-        
-        # Get the name for each URL if available
-        if 'name' in df.columns:
-            name_by_url = df.groupby("url")["name"].first()
-        
-        # Group metrics and round to 1 decimal place for all time-based metrics
-        # Round all numeric values to 1 decimal place consistently throughout the app
-        api_metrics = df.groupby("url").agg({
-            "response_time": ["mean", "min", "max", "count"],
-            "status_code":
-            lambda x: (x >= 400).mean() * 100
-        })
-        
-        # Apply rounding to all float columns manually
-        for col in api_metrics.select_dtypes(include=['float64']).columns:
-            api_metrics[col] = api_metrics[col].round(1)
-        api_metrics.columns = [
-            "Avg Response Time", "Min Time", "Max Time", "Request Count",
-            "Error Rate"
-        ]
-
-        # Add percentiles and round them to 1 decimal place
-        api_metrics["p90%"] = df.groupby("url")["response_time"].quantile(0.9).round(1)
-        api_metrics["p95%"] = df.groupby("url")["response_time"].quantile(0.95).round(1)
-        api_metrics["p99%"] = df.groupby("url")["response_time"].quantile(0.99).round(1)
-
-        # Add throughput (requests per second) and round to 1 decimal place
-        api_metrics["Throughput"] = (api_metrics["Request Count"] / (
-            virtual_users * ramp_up_time)).round(1)
-            
-        # Add method column and reorder
-        api_metrics_display = format_dataframe(api_metrics.reset_index())
-        api_metrics_display["method"] = api_metrics_display["url"].map(method_by_url)
-        
-        # Add name column if available
-        if 'name' in df.columns:
-            api_metrics_display["name"] = api_metrics_display["url"].map(name_by_url)
-            
-            # Reorder columns to put method first, then name, then URL
-            cols = list(api_metrics_display.columns)
-            cols.remove("method")
-            cols.remove("url")
-            cols.remove("name")
-            cols = ["method", "name", "url"] + cols
-        else:
-            # Reorder columns to put method before URL
-            cols = list(api_metrics_display.columns)
-            cols.remove("method")
-            cols.remove("url")
-            cols = ["method", "url"] + cols
-
-        # Apply final column ordering
-        api_metrics_display = api_metrics_display[cols]
+        # Same per-API metrics as the HTML report (see utils.run_metrics)
+        api_metrics_display = format_dataframe(api_metrics(df, virtual_users, ramp_up_time))
+        cols = list(api_metrics_display.columns)
         
         # Create a styling function to highlight response times > 10 seconds (10000ms) in red
         # and format all time values to 1 decimal place
@@ -1413,6 +2025,16 @@ def main():
         </style>
         """, unsafe_allow_html=True)
 
+        # Service level indicators - Apdex and share of requests within each latency bucket
+        run_sli_settings = run_info.get("sli_settings") or sli_settings(st.session_state.apis)
+        sli_df = sli_table(df, run_sli_settings)
+        if not sli_df.empty:
+            st.subheader("Service Level Indicators")
+            st.metric("Apdex", f"{overall_apdex(df, run_sli_settings):.3f}",
+                      help=f"Requests within the Apdex target (default {run_sli_settings['apdex_t']:g}ms) are "
+                           "satisfied and within four times the target tolerated; failures are frustrated")
+            st.dataframe(sli_df, use_container_width=True, hide_index=True)
+
         # Top 5 APIs with highest error rates - only show if errors exist
         if has_errors:
             st.subheader("Top 5 APIs with Highest Error Rates")
@@ -1423,17 +2045,24 @@ def main():
             if 'name' in df.columns:
                 name_by_url = df.groupby("url")["name"].first()
             
-            error_analysis = df[df["status_code"] >= 400].groupby("url").agg({
-                "status_code": "count",
-                "response_time": "mean",
-                "error_message": lambda x: x.iloc[0]  # Take first error message
-            }).sort_values("status_code", ascending=False).head()
+            error_analysis = df[df["is_error"]].groupby("url").agg({
+                "is_error": "count",
+                "response_time": "mean"
+            }).sort_values("is_error", ascending=False).head()
             
             # Round response times to 1 decimal place
             error_analysis["response_time"] = error_analysis["response_time"].round(1)
+
+            # Show each API's most frequent failure rather than whichever came first
+            has_warmup = "warmup" in df.columns and df["warmup"].fillna(False).astype(bool).any()
+            error_clusters = run_clusters(df, st.session_state.test_config.get('run_info'), include_warmup=has_warmup)
+            top_cluster = error_clusters.drop_duplicates("url").set_index("url")
+            error_analysis["error_message"] = error_analysis.index.map(top_cluster["example"]).fillna("")
+            error_analysis["signatures"] = error_analysis.index.map(
+                error_clusters.groupby("url").size()).fillna(0).astype(int)
             
             error_analysis.columns = [
-                "Total Requests", "Avg Response Time", "Error Message"
+                "Total Requests", "Avg Response Time", "Error Message", "Distinct Errors"
             ]
             
             # Add method column and reorder
@@ -1495,6 +2124,10 @@ def main():
                 hide_index=True
             )
 
+            st.subheader("Top Error Signatures")
+            st.caption("Failures grouped by their message with ids, timestamps and numbers masked")
+            st.dataframe(top_signatures(error_clusters), use_container_width=True, hide_index=True)
+
         # Top 5 slowest APIs with details (excluding failed APIs)
         st.subheader("Top 5 Slowest APIs (Excluding Failed APIs)")
         
@@ -1595,7 +2228,8 @@ def main():
         with report_col1:
             report_gen = ReportGenerator(results,
                                          virtual_users=virtual_users,
-                                         ramp_up_time=ramp_up_time)
+                                         ramp_up_time=ramp_up_time,
+                                         run_info=st.session_state.test_config.get('run_info'))
             report_html = report_gen.generate_html_report()
             st.download_button(
                 label="Generate Report",
@@ -1608,6 +2242,43 @@ def main():
                 use_container_width=True  # Make button full width of column
             )
 
+            # Raw samples for analysis elsewhere or re-reporting later
+            # Exports are only built once asked for, as serializing a large run takes a while
+            if pyarrow_available():
+                if exported("parquet", results) or st.button("Prepare Raw Results (Parquet)",
+                                                              use_container_width=True):
+                    results_bytes = export_file(
+                        "parquet", results, None,
+                        lambda path: write_results(results, path, virtual_users=virtual_users,
+                                                   ramp_up_time=ramp_up_time,
+                                                   run_info=st.session_state.test_config.get('run_info')),
+                        ".parquet")
+                    st.download_button(
+                        label="Download Raw Results (Parquet)",
+                        data=results_bytes,
+                        file_name=f"performance_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet",
+                        mime="application/octet-stream",
+                        use_container_width=True
+                    )
+
+            # Per-user timeline for chrome://tracing or Perfetto; large runs keep a sample of users
+            trace_sample = st.slider("Trace Sample (% of virtual users)", min_value=1, max_value=100, value=100,
+                                     help="Runs with more than 500,000 requests are sampled down automatically")
+            if exported("trace", results, trace_sample) or st.button("Prepare Trace (Chrome Trace Format)",
+                                                                     use_container_width=True):
+                trace_json = export_file(
+                    "trace", results, trace_sample,
+                    lambda path: write_trace(results, path,
+                                             sample=trace_sample / 100 if trace_sample < 100 else None),
+                    ".json")
+                st.download_button(
+                    label="Download Trace (Chrome Trace Format)",
+                    data=trace_json,
+                    file_name=f"performance_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                    mime="application/json",
+                    use_container_width=True
+                )
+
         # Clear All button in second column
         with report_col2:
             if st.button(
@@ -1619,6 +2290,120 @@ def main():
             ):  # Make button full width of column
                 reset_all_data()
 
+    # Runs streamed to disk can be reloaded, including ones cut short by a crash or rerun
+    if os.path.isdir(RESULTS_DIR):
+        logs = sorted((f for f in os.listdir(RESULTS_DIR) if f.endswith(".jsonl")), reverse=True)
+        if logs:
+            with st.expander("Recover Streamed Runs"):
+                log_name = st.selectbox("Result Log", logs, key="result_log")
+                if st.button("Load Run", key="load_result_log"):
+                    recovered = read_log(os.path.join(RESULTS_DIR, log_name))
+                    if recovered["results"]:
+                        st.session_state.test_results = recovered["results"]
+                        st.session_state.test_config = {
+                            'virtual_users': recovered["metadata"].get('virtual_users', 1),
+                            'ramp_up_time': recovered["metadata"].get('ramp_up_time', 1),
+                            'run_info': recovered["run_info"]
+                        }
+                        st.rerun()
+                    else:
+                        st.warning("The log holds no results.")
+
+    # Reports can be rebuilt from a saved results file without re-running the test
+    if pyarrow_available():
+        with st.expander("Re-report Saved Results"):
+            saved_results = st.file_uploader("Results File (Parquet or Arrow)",
+                                             type=["parquet", "arrow", "feather"], key="saved_results")
+            if saved_results:
+                suffix = os.path.splitext(saved_results.name)[1]
+                with tempfile.NamedTemporaryFile(suffix=suffix) as results_file:
+                    results_file.write(saved_results.getbuffer())
+                    results_file.flush()
+                    saved_report = load_report(results_file.name).generate_html_report()
+                st.download_button(
+                    label="Generate Report",
+                    data=saved_report,
+                    file_name=f"performance_report_{os.path.splitext(saved_results.name)[0]}.html",
+                    mime="text/html",
+                    key="saved_results_report"
+                )
+
+    # Past runs survive reruns, refreshes and Clear All
+    if os.path.exists("run_history.db"):
+        history = RunHistory()
+        try:
+            history_tag = None
+            all_tags = history.tags()
+            runs = history.list_runs(limit=200)
+            if runs:
+                st.markdown("---")
+                st.header("Run History")
+                if all_tags:
+                    history_tag = st.selectbox("Tag", ["All"] + all_tags, key="history_tag")
+                    history_tag = None if history_tag == "All" else history_tag
+                    runs = history.list_runs(limit=200, tag=history_tag)
+                runs_df = pd.DataFrame(runs)
+                if not runs_df.empty:
+                    runs_df["started_at"] = pd.to_datetime(runs_df["started_at"], unit="s")
+                    runs_df["tags"] = runs_df["tags"].map(", ".join)
+                    st.dataframe(
+                        runs_df[["id", "started_at", "status", "virtual_users", "total_requests",
+                                 "error_rate", "mean", "p95", "tags"]].round(1),
+                        use_container_width=True, hide_index=True)
+
+                trend_col1, trend_col2 = st.columns(2)
+                with trend_col1:
+                    trend_api = st.selectbox("API", history.apis(), key="history_api")
+                with trend_col2:
+                    trend_metric = st.selectbox("Metric", TREND_METRICS, index=TREND_METRICS.index("p95"),
+                                                key="history_metric")
+                trend_df = pd.DataFrame(history.trend(trend_api, trend_metric, limit=200, tag=history_tag))
+                if not trend_df.empty:
+                    trend_df["started_at"] = pd.to_datetime(trend_df["started_at"], unit="s")
+                    fig_trend = px.line(trend_df, x="started_at", y="value", markers=True,
+                                        hover_data=["run_id"],
+                                        labels={"started_at": "Run Started", "value": trend_metric},
+                                        title=f"{trend_metric} trend for {trend_api}")
+                    st.plotly_chart(fig_trend, use_container_width=True)
+
+                # Statistical comparison of a run against one or more earlier runs
+                if len(runs) > 1:
+                    st.subheader("Compare Runs")
+                    run_ids = [run["id"] for run in runs]
+                    compare_col1, compare_col2 = st.columns(2)
+                    with compare_col1:
+                        baseline_ids = st.multiselect("Baseline Run(s)", run_ids, default=run_ids[1:2],
+                                                      key="compare_baseline",
+                                                      help="Several baseline runs are pooled into one")
+                    with compare_col2:
+                        candidate_id = st.selectbox("Candidate Run", run_ids, index=0, key="compare_candidate")
+                    min_change = st.number_input("Minimum Change (%)", min_value=0.0, value=5.0, step=1.0,
+                                                 key="compare_min_change",
+                                                 help="Significant changes smaller than this are not flagged")
+                    if baseline_ids and st.button("Compare", key="compare_runs"):
+                        comparison = RunComparison(
+                            [load_run(run_id, history) for run_id in baseline_ids],
+                            load_run(candidate_id, history), min_change=min_change)
+                        if comparison.passed:
+                            st.success("No statistically significant regressions")
+                        else:
+                            st.error(f"{len(comparison.regressions)} statistically significant regression(s)")
+                        comparison_df = comparison.to_dataframe()
+                        if not comparison_df.empty:
+                            st.dataframe(
+                                comparison_df[["name", "method", "metric", "baseline", "candidate_value",
+                                               "delta_pct", "ci_low", "ci_high", "p_value", "verdict"]].round(3),
+                                use_container_width=True, hide_index=True)
+                        st.download_button(
+                            label="Download Comparison Report",
+                            data=comparison.generate_html_report(),
+                            file_name=f"comparison_{candidate_id}_vs_{'_'.join(map(str, baseline_ids))}.html",
+                            mime="text/html",
+                            key="comparison_report"
+                        )
+        finally:
+            history.close()
+
     # Display the footer
 #display_footer()
 
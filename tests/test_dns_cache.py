@@ -0,0 +1,40 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from utils.api_tester import APITester
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_pinned_hosts_only_apply_to_the_testers_session(server):
+    original = socket.getaddrinfo
+    apis = [{"name": "pinned", "method": "GET", "url": f"http://pinned.invalid:{server.server_port}/",
+             "headers": {}}]
+    tester = APITester(apis, 2, 0, iterations=2, dns_cache={"pinned": {"pinned.invalid": "127.0.0.1"}})
+    results = tester.run_test()
+
+    assert [result["status_code"] for result in results] == [200] * 4
+    assert tester.run_info["dns"]["pinned"] >= 1
+    # Nothing outside the tester's session resolves through the cache
+    assert socket.getaddrinfo is original
+    with pytest.raises(socket.gaierror):
+        socket.getaddrinfo("pinned.invalid", server.server_port)
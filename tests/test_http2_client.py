@@ -0,0 +1,93 @@
+import select
+import socket
+import threading
+import time
+import pytest
+
+pytest.importorskip("httpx")
+h2 = pytest.importorskip("h2")
+import h2.config  # noqa: E402
+import h2.connection  # noqa: E402
+import h2.events  # noqa: E402
+from utils.api_tester import APITester  # noqa: E402
+from utils.http2_client import Http2Client  # noqa: E402
+
+DELAY = 0.5
+
+
+class H2Stub:
+    """Cleartext HTTP/2 (h2c) server answering every stream after DELAY, counting connections"""
+
+    def __init__(self):
+        self.connections = 0
+        self._listener = socket.socket()
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen()
+        self.port = self._listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return
+            self.connections += 1
+            threading.Thread(target=self._serve, args=(sock,), daemon=True).start()
+
+    def _serve(self, sock):
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        sock.sendall(conn.data_to_send())
+        due = []  # (time, stream id)
+        with sock:
+            while True:
+                timeout = max(min(t for t, _ in due) - time.monotonic(), 0) if due else None
+                if select.select([sock], [], [], timeout)[0]:
+                    data = sock.recv(65535)
+                    if not data:
+                        return
+                    for event in conn.receive_data(data):
+                        if isinstance(event, h2.events.RequestReceived):
+                            due.append((time.monotonic() + DELAY, event.stream_id))
+                now = time.monotonic()
+                for entry in [entry for entry in due if entry[0] <= now]:
+                    due.remove(entry)
+                    conn.send_headers(entry[1], [(":status", "200"), ("content-length", "2")])
+                    conn.send_data(entry[1], b"ok", end_stream=True)
+                sock.sendall(conn.data_to_send())
+
+    def close(self):
+        self._listener.close()
+
+
+@pytest.fixture
+def stub():
+    server = H2Stub()
+    yield server
+    server.close()
+
+
+def test_cleartext_requests_use_http2(stub):
+    client = Http2Client()
+    try:
+        response = client.request("GET", f"http://127.0.0.1:{stub.port}/", timeout=(5, 5))
+    finally:
+        client.close()
+    assert response.status_code == 200
+    assert response.http_version == "HTTP/2"
+
+
+def test_engine_multiplexes_users_over_one_connection(stub):
+    apis = [{"name": "slow", "method": "GET", "url": f"http://127.0.0.1:{stub.port}/", "headers": {}}]
+    tester = APITester(apis, 10, 0, protocol="http/2", http2_connections=1)
+    started = time.monotonic()
+    results = tester.run_test()
+    elapsed = time.monotonic() - started
+
+    assert len(results) == 10
+    assert {result["protocol"] for result in results} == {"HTTP/2"}
+    assert tester.run_info["http1_fallbacks"] == 0
+    assert stub.connections == 1
+    # All ten streams were open at once rather than queued behind each other
+    assert elapsed < DELAY * 3
@@ -0,0 +1,50 @@
+import urllib.request
+from utils.metrics_server import MetricsServer
+from utils.outcomes import HTTP_ERROR, OK
+
+
+def test_scrape_exposes_counters_and_histograms():
+    api = {"name": "Users", "method": "GET", "url": "http://localhost/users"}
+    server = MetricsServer(port=0, buckets=(0.1, 0.5), interval=60)
+    server.start()
+    try:
+        server.request_started(api)
+        for response_time, outcome in ((50, OK), (200, OK), (800, HTTP_ERROR)):
+            server.observe(api, {"response_time": response_time, "outcome": outcome,
+                                 "request_bytes": 10, "response_bytes": 100})
+        server.active_users = 3
+        server.publish()
+        with urllib.request.urlopen(server.url) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            body = response.read().decode()
+    finally:
+        server.stop()
+
+    labels = 'name="Users",method="GET",url="http://localhost/users"'
+    lines = body.splitlines()
+    assert "loadtest_active_users 3" in lines
+    assert f'loadtest_requests_total{{{labels},outcome="OK"}} 2' in lines
+    assert f'loadtest_requests_total{{{labels},outcome="HTTP Error"}} 1' in lines
+    assert f"loadtest_requests_in_flight{{{labels}}} 1" in lines
+    assert f'loadtest_request_duration_seconds_bucket{{{labels},le="0.1"}} 1' in lines
+    assert f'loadtest_request_duration_seconds_bucket{{{labels},le="0.5"}} 2' in lines
+    assert f'loadtest_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3' in lines
+    assert f"loadtest_request_duration_seconds_count{{{labels}}} 3" in lines
+    assert f"loadtest_request_duration_seconds_sum{{{labels}}} 1.050000" in lines
+    assert f"loadtest_sent_bytes_total{{{labels}}} 30" in lines
+
+
+def test_scrapes_serve_the_published_snapshot():
+    api = {"name": "", "method": "GET", "url": "http://localhost/"}
+    server = MetricsServer(port=0, interval=60)
+    server.start()
+    try:
+        server.observe(api, {"response_time": 5, "outcome": OK})
+        # Not yet published, so the scrape still shows the snapshot taken at start
+        with urllib.request.urlopen(server.url) as response:
+            assert "loadtest_requests_total{" not in response.read().decode()
+        server.publish()
+        with urllib.request.urlopen(server.url) as response:
+            assert 'outcome="OK"} 1' in response.read().decode()
+    finally:
+        server.stop()
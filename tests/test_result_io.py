@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("pyarrow")
+from utils.result_io import iter_results, read_results, write_results  # noqa: E402
+
+
+def _results(count):
+    return [{"name": f"api{i % 3}", "url": f"http://localhost/{i % 3}", "method": "GET", "status_code": 200,
+             "response_time": float(i), "timestamp": 1000.0 + i, "outcome": 0, "warmup": i < 10}
+            for i in range(count)]
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_read_results_materializes_only_selected_columns_and_rows(tmp_path, suffix):
+    path = str(tmp_path / f"run{suffix}")
+    write_results(_results(100), path, virtual_users=2)
+
+    df, metadata = read_results(path, columns=["url", "response_time", "not_a_column"],
+                                filters=[("warmup", "==", False)])
+    assert list(df.columns) == ["url", "response_time"]
+    assert len(df) == 90
+    assert metadata["virtual_users"] == 2
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow"])
+def test_iter_results_yields_bounded_batches(tmp_path, suffix):
+    path = str(tmp_path / f"run{suffix}")
+    write_results(_results(100), path)
+
+    batches = list(iter_results(path, columns=["response_time"], filters=[("warmup", "==", False)],
+                                batch_size=32))
+    assert all(len(batch) <= 32 for batch in batches)
+    assert sum(len(batch) for batch in batches) == 90
+    assert sum(batch["response_time"].sum() for batch in batches) == sum(range(10, 100))
@@ -0,0 +1,45 @@
+import threading
+import time
+from utils.result_log import ResultLog, read_log
+
+
+def test_queue_is_bounded_when_the_disk_falls_behind(tmp_path):
+    log = ResultLog(str(tmp_path / "run.jsonl"), batch_size=10, max_pending=50)
+    write_lines = log._write_lines
+
+    def slow_write(records):
+        time.sleep(0.005)
+        write_lines(records)
+
+    log._write_lines = slow_write
+    peak = []
+
+    def worker():
+        for i in range(500):
+            log.append({"i": i})
+            peak.append(len(log._pending))
+
+    workers = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    log.flush()
+    assert log.written == 2000
+    assert max(peak) <= 50
+    log.close({"status": "completed"})
+
+    recovered = read_log(log.path)
+    assert len(recovered["results"]) == 2000
+    assert recovered["complete"] and recovered["dropped"] == 0
+
+
+def test_full_queue_drops_and_counts_without_blocking(tmp_path):
+    log = ResultLog(str(tmp_path / "run.jsonl"), batch_size=1000, flush_interval=60, max_pending=5, block=False)
+    for i in range(20):
+        log.append({"i": i})
+    log.close()
+
+    recovered = read_log(log.path)
+    assert len(recovered["results"]) == 5
+    assert recovered["dropped"] == 15
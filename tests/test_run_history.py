@@ -0,0 +1,45 @@
+import sqlite3
+import time
+from utils.run_history import RunHistory
+
+
+def test_credentials_never_reach_the_database(tmp_path):
+    token = "s3cr3t-bearer-token"
+    apis = [{
+        "name": "Users",
+        "method": "GET",
+        "url": f"http://localhost/users?page=2&access_token={token}&api_key={token}",
+        "headers": {"Authorization": f"Bearer {token}", "Cookie": f"session={token}", "X-API-Key": token,
+                    "Accept": "application/json"},
+        "body": {"user": {"name": "alice", "password": token}, "client_secret": token},
+    }, {
+        "name": "Login",
+        "method": "POST",
+        "url": "http://localhost/login",
+        "headers": {},
+        "body": f'{{"username": "alice", "pwd": "{token}"}}',
+    }]
+    results = [{"name": "Users", "url": apis[0]["url"], "method": "GET", "status_code": 200,
+                "response_time": 12.0, "timestamp": time.time(), "outcome": 0, "error_message": None}]
+    path = str(tmp_path / "history.db")
+    history = RunHistory(path)
+    try:
+        run_id = history.save_run(results, 1, 0, apis, keep_samples=True)
+        # Samples are compressed on disk, so they are checked once loaded
+        assert not history.load_samples(run_id)["url"].astype(str).str.contains(token).any()
+    finally:
+        history.close()
+
+    with open(path, "rb") as f:
+        assert token.encode() not in f.read()
+    connection = sqlite3.connect(path)
+    try:
+        stored = connection.execute("SELECT apis FROM runs").fetchone()[0]
+    finally:
+        connection.close()
+    assert token not in stored
+    assert "application/json" in stored
+    assert "page=2" in stored and "alice" in stored
+    # The caller's API dicts are left untouched
+    assert apis[0]["headers"]["Authorization"] == f"Bearer {token}"
+    assert apis[0]["body"]["user"]["password"] == token
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("plotly")
+pytest.importorskip("jinja2")
+from utils.report_generator import ReportGenerator  # noqa: E402
+from utils.run_metrics import api_metrics, bandwidth_summary, retry_summary, vu_summary  # noqa: E402
+
+
+@pytest.fixture
+def results():
+    return [{
+        "url": f"http://example.test/{i % 2}", "name": f"api {i % 2}", "method": "GET",
+        "status_code": 200 if i % 5 else 503, "response_time": 10.0 + i, "timestamp": 1000 + i / 10,
+        "vu": i % 4, "iteration": i // 4, "attempts": 2 if i % 3 == 0 else 1, "first_attempt_time": 5.0 + i,
+        "request_bytes": 10, "response_bytes": 100, "decoded_bytes": 300
+    } for i in range(40)]
+
+
+def test_report_and_dashboard_share_metrics(results):
+    report = ReportGenerator(results, virtual_users=4, ramp_up_time=2)
+    df = report.df
+
+    metrics = api_metrics(df, 4, 2)
+    pd.testing.assert_frame_equal(report._calculate_api_metrics(), metrics)
+    assert list(metrics.columns[:4]) == ["method", "name", "url", "Request Count"]
+    assert metrics["Retry Amplification"].tolist() == [1.35, 1.35]
+    assert report._calculate_retry_summary() == retry_summary(df)
+    assert report._calculate_bandwidth() == bandwidth_summary(df)
+    assert report._calculate_vu_summary() == vu_summary(df)
+    assert vu_summary(df)["fairness"] == 1.0
+    assert bandwidth_summary(df)["compression_ratio"] == 3.0
+
+
+def test_summaries_are_none_without_their_columns(results):
+    df = ReportGenerator([{key: row[key] for key in ("url", "name", "method", "status_code", "response_time",
+                                                     "timestamp")} for row in results]).df
+    assert retry_summary(df) is None
+    assert bandwidth_summary(df) is None
+    assert vu_summary(df) is None
+    assert "Retry Amplification" not in api_metrics(df).columns
@@ -0,0 +1,112 @@
+import operator
+import re
+import threading
+import time
+from collections import deque
+from utils.outcomes import is_error
+from utils.sketch import LatencySketch
+
+# Comparison operators shared by abort rules and thresholds
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+# e.g. "error_rate > 50% over 10s", "p95 > 2000ms over 30s", "avg >= 800"
+_RULE_PATTERN = re.compile(
+    r"^\s*(error_rate|avg|p50|p90|p95|p99|max)\s*(>=|<=|>|<)\s*([\d.]+)\s*(?:%|ms)?"
+    r"(?:\s+over\s+([\d.]+)\s*s)?\s*$"
+)
+
+
+class AbortRule:
+    """A condition on a sliding window of recent samples that stops the run when true"""
+
+    def __init__(self, metric, op, value, window=10):
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}, expected one of {', '.join(OPERATORS)}")
+        self.metric = metric
+        self.op = op
+        self.value = float(value)
+        self.window = float(window)
+
+    @classmethod
+    def parse(cls, rule):
+        """Builds a rule from a string like "p95 > 2000 over 30s" or a dict with the same fields"""
+        if isinstance(rule, cls):
+            return rule
+        if isinstance(rule, dict):
+            return cls(rule["metric"], rule.get("op", ">"), rule["value"], rule.get("window", 10))
+        match = _RULE_PATTERN.match(rule)
+        if not match:
+            raise ValueError(f"Invalid abort rule {rule!r}, expected e.g. 'error_rate > 50% over 10s'")
+        metric, op, value, window = match.groups()
+        return cls(metric, op, value, window or 10)
+
+    def __str__(self):
+        unit = "%" if self.metric == "error_rate" else "ms"
+        return f"{self.metric} {self.op} {self.value:g}{unit} over {self.window:g}s"
+
+
+class AbortMonitor:
+    """
+    Evaluates abort rules against streaming per-second aggregates.
+
+    Samples are folded into one bucket per second (count, errors and a latency sketch),
+    so memory is bounded by the longest rule window no matter how long the run is.
+    """
+
+    def __init__(self, rules, min_samples=20, check_interval=0.5):
+        self.rules = [AbortRule.parse(rule) for rule in rules]
+        # Rules are not evaluated on fewer samples than this, to avoid aborting on noise
+        self.min_samples = min_samples
+        self.check_interval = check_interval
+        self._window = max((rule.window for rule in self.rules), default=0)
+        self._buckets = deque()  # [second, count, errors, sketch]
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, result, now=None):
+        """Adds a sample and returns a breach description if a rule is now violated"""
+        now = time.monotonic() if now is None else now
+        second = int(now)
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != second:
+                self._buckets.append([second, 0, 0, LatencySketch()])
+                # Drop seconds that fell out of the longest window
+                while self._buckets and self._buckets[0][0] <= second - self._window:
+                    self._buckets.popleft()
+            bucket = self._buckets[-1]
+            bucket[1] += 1
+            bucket[2] += is_error(result)
+            bucket[3].add(result["response_time"])
+
+            if now - self._last_check < self.check_interval:
+                return None
+            self._last_check = now
+            return self._evaluate(second)
+
+    def _evaluate(self, second):
+        for rule in self.rules:
+            buckets = [b for b in self._buckets if b[0] > second - rule.window]
+            count = sum(b[1] for b in buckets)
+            if count < self.min_samples:
+                continue
+            if rule.metric == "error_rate":
+                observed = sum(b[2] for b in buckets) / count * 100
+            else:
+                sketch = LatencySketch()
+                for bucket in buckets:
+                    sketch.merge(bucket[3])
+                if rule.metric == "avg":
+                    observed = sketch.mean
+                elif rule.metric == "max":
+                    observed = sketch.max
+                else:
+                    observed = sketch.quantile(int(rule.metric[1:]) / 100)
+            if OPERATORS[rule.op](observed, rule.value):
+                unit = "%" if rule.metric == "error_rate" else "ms"
+                return f"{rule} (observed {observed:.1f}{unit} across {count} requests)"
+        return None
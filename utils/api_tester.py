@@ -1,63 +1,489 @@
 import requests
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
 import time
+from urllib.parse import urlparse
 import multiprocessing
 from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from utils.abort_monitor import AbortMonitor
+from utils.outcomes import HTTP_ERROR, OK, classify_exception
+from utils.compression import BODY_ENCODINGS, encode_body, wire_bytes
+from utils.dns_cache import build_dns_cache, use_dns_cache
+from utils.error_clustering import MAX_NORMALIZED_LENGTH, ErrorClusters, error_signature
+from utils.http2_client import Http2Client
+from utils.metrics_server import build_metrics_server
+from utils.extractors import compile_extractors, run_extractors, substitute
+from utils.pacing import compile_think_time
+from utils.rate_limiter import HostConnectionLimiter, build_bucket
+from utils.retry import RetryPolicy
+from utils.scenario import AliasSampler, api_weights, mix_summary
+from utils.scheduler import TimerScheduler
+
+
+class _VirtualUser:
+    """Progress of one virtual user through its iterations"""
+
+    def __init__(self, user_id, variables):
+        self.user_id = user_id
+        self.variables = variables
+        self.context = dict(variables)
+        self.iteration = 0
+        self.step = 0
+        # Position of the next recorded request in this user's whole journey
+        self.seq = 0
+        # Index into the API list of the current step; differs from step when a traffic mix is sampled
+        self.api_index = 0
+        self.mix_counts = None
+        self.iteration_start = None
+        # Bookkeeping for the current step while it waits behind the rate and connection limiters
+        self.step_dispatched = None
+        self.schedule_lag = 0
+        self.admitted = False
+        self.host_slot = None
+        self.iteration_deadline = None
+        # Retry state of the current step: attempt number and what earlier attempts took
+        self.attempt = 1
+        self.first_attempt = None
+        self.backoff_time = 0
+        self.queue_time = 0
+
+
+def create_session(pool_size, protocol="http/1.1", http2_connections=1, max_concurrent_streams=100):
+    """
+    Creates a requests session with a connection pool sized for the given concurrency.
+    Cookies are never stored so virtual users sharing the pool stay independent.
+    With protocol "http/2" an Http2Client multiplexing streams over http2_connections is returned instead.
+    """
+    if protocol == "http/2":
+        return Http2Client(http2_connections, max_concurrent_streams)
+    session = requests.Session()
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=max(pool_size, 10), pool_maxsize=max(pool_size, 10))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _protocol(response):
+    """Returns the HTTP version a response was received over, e.g. HTTP/1.1 or HTTP/2"""
+    version = getattr(response, "http_version", None)  # httpx
+    if version:
+        return version
+    return {10: "HTTP/1.0", 11: "HTTP/1.1"}.get(getattr(response.raw, "version", None))
+
 
 class APITester:
-    def __init__(self, apis, virtual_users, ramp_up_time):
+    def __init__(self, apis, virtual_users, ramp_up_time, variables=None,
+                 iterations=1, pacing=None, rate_limit=None, max_connections_per_host=None,
+                 duration=None, session=None, warmup_iterations=0, warmup_seconds=0,
+                 abort_rules=None, drain_timeout=10, connect_timeout=10, read_timeout=60,
+                 iteration_deadline=None, protocol="http/1.1", http2_connections=1,
+                 max_concurrent_streams=100, dns_cache=None, traffic_mix=False, requests_per_iteration=None,
+                 observers=None, keep_results=True, metrics=None):
         self.apis = apis
         self.virtual_users = virtual_users
         self.ramp_up_time = ramp_up_time
-        
-    def make_request(self, api):
+        # Initial values for every virtual user's context (e.g. Postman collection variables)
+        self.variables = variables or {}
+        # Number of passes each virtual user makes over the API list
+        self.iterations = iterations
+        # With traffic_mix each step samples an API by its "weight" or "probability" instead of walking
+        # the list in order; an iteration is then requests_per_iteration samples (default: one per API)
+        self.traffic_mix = traffic_mix
+        self._mix_sampler = AliasSampler(api_weights(apis)) if traffic_mix and apis else None
+        self._steps_per_iteration = (requests_per_iteration or len(apis)) if traffic_mix else len(apis)
+        # Fixed cycle time in seconds between iteration starts (None or 0 disables pacing)
+        self.pacing = pacing
+        # Optional time limit in seconds; no new iteration starts once it has passed
+        self.duration = duration
+        # Warm-up iterations run before the measured ones; samples from them, or from the first
+        # warmup_seconds of the run, are tagged so reports can keep them out of the headline metrics
+        self.warmup_iterations = warmup_iterations
+        self.warmup_seconds = warmup_seconds
+        # Shared connection pool so repeated runs (e.g. capacity search steps) reuse warm connections
+        # "http/2" multiplexes every virtual user over http2_connections connections
+        self.protocol = protocol
+        self.session = session or create_session(virtual_users, protocol, http2_connections,
+                                                 max_concurrent_streams)
+        # In-process DNS cache with TTL and pinned hosts, given as True, a TTL or {"ttl": ..., "pinned": {...}};
+        # it only applies to this tester's session, never to the rest of the process
+        self.dns_cache = build_dns_cache(dns_cache)
+        if self.dns_cache:
+            use_dns_cache(self.session, self.dns_cache)
+        self._request_errors = (requests.exceptions.RequestException,) + getattr(self.session, "errors", ())
+        # Compile extractors once so the request loop only has to run them
+        self._extractors = {id(api): compile_extractors(api.get("extract")) for api in apis}
+        for api in apis:
+            if api.get("compress_body") and api["compress_body"] not in BODY_ENCODINGS:
+                raise ValueError(f"Unsupported body compression {api['compress_body']!r} for "
+                                 f"{api['url']}, expected one of {', '.join(BODY_ENCODINGS)}")
+        self._think_times = [compile_think_time(api.get("think_time")) for api in apis]
+        # Optional per-API retry policies, given as {"max_attempts": ..., "retry_on_status": [...], ...}
+        self._retry_policies = [RetryPolicy.from_spec(api.get("retry")) for api in apis]
+        # Global and per-API token buckets, given as requests/s or {"rate": ..., "burst": ...}
+        self.rate_limit = rate_limit
+        self.max_connections_per_host = max_connections_per_host
+        self._global_bucket = build_bucket(rate_limit)
+        self._api_buckets = [build_bucket(api.get("rate_limit")) for api in apis]
+        self._deadline = None
+        # Default timeouts in seconds; APIs can override them with "connect_timeout" and "read_timeout"
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        # Total time budget in seconds for one iteration; steps left when it runs out are skipped
+        self.iteration_deadline = iteration_deadline
+        # Callables given every accepted result as it arrives, e.g. a ResultLog streaming them to disk
+        self.observers = observers or []
+        # With keep_results=False results only go to the observers and run_test returns an empty list,
+        # so memory stays bounded however long the run is
+        self.keep_results = keep_results
+        # Live Prometheus endpoint for the run, given as True, a port or {"port": ..., "host": ...}
+        self.metrics = build_metrics_server(metrics)
+        # Rules such as "error_rate > 50% over 10s" that stop the run early when breached
+        self.abort_rules = abort_rules or []
+        self.drain_timeout = drain_timeout
+        self.run_info = {"status": "not started"}
+        self._stop = threading.Event()
+        self._condition = threading.Condition()
+        self._started = None
+
+    def _timeouts(self, api, deadline=None):
+        """Returns the (connect, read) timeout for an API, clipped to the iteration deadline"""
+        connect_timeout = api.get("connect_timeout") or self.connect_timeout
+        read_timeout = api.get("read_timeout") or self.read_timeout
+        if deadline is not None:
+            remaining = max(deadline - time.monotonic(), 0.001)
+            connect_timeout = min(connect_timeout, remaining)
+            read_timeout = min(read_timeout, remaining)
+        return connect_timeout, read_timeout
+
+    def make_request(self, api, context=None, deadline=None):
+        extractors = self._extractors.get(id(api))
+        if extractors is None:
+            extractors = compile_extractors(api.get("extract"))
+
+        # Resolve {{variable}} placeholders from values extracted earlier in the iteration
+        url = substitute(api["url"], context)
+        headers = substitute(api["headers"], context)
+        body = substitute(api.get("body", None), context)
+        # "accept_encoding" controls which response encodings are offered, e.g. "gzip", "br" or "identity"
+        if api.get("accept_encoding"):
+            headers = {**(headers or {}), "Accept-Encoding": api["accept_encoding"]}
+        # "compress_body" sends the JSON body gzip, deflate or br encoded
+        data, headers = encode_body(body, headers, api.get("compress_body"))
+
         start_time = time.time()
         try:
-            response = requests.request(
+            response = self.session.request(
                 method=api["method"],
-                url=api["url"],
-                headers=api["headers"],
-                json=api.get("body", None),
-                timeout=60
+                url=url,
+                headers=headers,
+                data=data,
+                timeout=self._timeouts(api, deadline)
             )
-            
-            return {
+            response_time = (time.time() - start_time) * 1000  # Convert to ms
+
+            result = {
                 "name": api.get("name", ""),  # Include the API name in results
                 "url": api["url"],
                 "method": api["method"],
                 "status_code": response.status_code,
-                "response_time": (time.time() - start_time) * 1000,  # Convert to ms
-                "error_message": response.text if response.status_code >= 400 else None
+                "response_time": response_time,
+                "timestamp": start_time,
+                "protocol": _protocol(response),
+                "outcome": HTTP_ERROR if response.status_code >= 400 else OK,
+                # Only the start of an error body is kept; it is all the clustering looks at
+                "error_message": response.text[:MAX_NORMALIZED_LENGTH] if response.status_code >= 400 else None,
+                # Hash of the message with ids, timestamps and numbers masked, for clustering failures
+                "error_signature": error_signature(response.text) if response.status_code >= 400 else None,
+                # Sizes only, bodies are never kept: body bytes sent, and received before and after decoding
+                "request_bytes": len(data) if data else 0,
+                "response_bytes": wire_bytes(response),
+                "decoded_bytes": len(response.content)
             }
-            
-        except requests.exceptions.RequestException as e:
+
+            # Extraction is timed separately so it never inflates the request latency
+            if extractors:
+                result["extraction_time"] = run_extractors(
+                    extractors, response, context if context is not None else {})
+
+            return result
+
+        except self._request_errors as e:
+            # Client-side failures never got a status code, so they are not reported as server errors;
+            # the outcome code says what went wrong (timeout, DNS, TLS, refused, reset, ...)
             return {
                 "name": api.get("name", ""),  # Include the API name in results
                 "url": api["url"],
                 "method": api["method"],
-                "status_code": 500,
+                "status_code": None,
                 "response_time": (time.time() - start_time) * 1000,
-                "error_message": str(e)
+                "timestamp": start_time,
+                "protocol": None,
+                "outcome": classify_exception(e),
+                "error_message": str(e)[:MAX_NORMALIZED_LENGTH],
+                "error_signature": error_signature(str(e)),
+                "request_bytes": len(data) if data else 0,
+                "response_bytes": 0,
+                "decoded_bytes": 0
             }
-    
+
+    def _next_due(self, user, now, end_iteration=False):
+        """Advances a virtual user past its current step and returns when its next step is due"""
+        think_time = self._think_times[user.api_index]
+        user.step += 1
+        if user.step < self._steps_per_iteration and not end_iteration:
+            return now + (think_time() if think_time else 0)
+
+        user.iteration += 1
+        if user.iteration >= self.iterations + self.warmup_iterations:
+            return None
+        if self._deadline is not None and now >= self._deadline:
+            return None
+
+        # Each iteration starts with a fresh context so chained values never cross iterations
+        user.step = 0
+        user.context = dict(user.variables)
+        if self.pacing:
+            # The ideal start is one cycle after the previous start; when the iteration overran
+            # its cycle the step is dispatched immediately and the overrun shows up as lag
+            return user.iteration_start + self.pacing
+        return now + (think_time() if think_time else 0)
+
+    def abort(self, reason):
+        """Stops scheduling new requests; in-flight ones get drain_timeout seconds to finish"""
+        with self._condition:
+            if self._stop.is_set():
+                return
+            self.run_info["status"] = "aborted"
+            self.run_info["abort_reason"] = reason
+            if self._started is not None:
+                self.run_info["aborted_after"] = round(time.monotonic() - self._started, 1)
+            self._stop.set()
+            self._condition.notify_all()
+
     def run_test(self):
         results = []
+        self.run_info = {"status": "completed", "deadline_skipped": 0, "http1_fallbacks": 0}
+        if not self.apis:
+            return results
+
         delay_between_users = self.ramp_up_time / self.virtual_users
-        
-        def user_session(user_id):
-            time.sleep(delay_between_users * user_id)
-            user_results = []
-            for api in self.apis:
-                result = self.make_request(api)
-                user_results.append(result)
-            return user_results
-        
-        # Use ThreadPoolExecutor for concurrent requests
-        with ThreadPoolExecutor(max_workers=self.virtual_users) as executor:
-            all_results = executor.map(user_session, range(self.virtual_users))
-            
-        # Flatten results
-        for user_results in all_results:
-            results.extend(user_results)
-            
-        return results
+        self._stop = threading.Event()
+        self._condition = threading.Condition()
+        state = {"active_users": self.virtual_users, "in_flight": 0, "closed": False}
+        failures = []
+        monitor = AbortMonitor(self.abort_rules) if self.abort_rules else None
+        # Failures are grouped by signature as they arrive, so the clusters are ready when the run ends
+        error_clusters = ErrorClusters()
+
+        def user_finished():
+            with self._condition:
+                state["active_users"] -= 1
+                if self.metrics:
+                    self.metrics.active_users = state["active_users"]
+                self._condition.notify_all()
+
+        def resume_with_slot(user, host):
+            # Called by the connection limiter when a slot is handed over to this user
+            user.host_slot = host
+            scheduler.call_later(0, run_step, user)
+
+        def run_step(due, user):
+            if self._stop.is_set():
+                if user.host_slot is not None:
+                    connection_limiter.release(user.host_slot)
+                user_finished()
+                return
+
+            now = time.monotonic()
+            if user.step_dispatched is None:
+                # First dispatch of this step; later dispatches are wake-ups from the limiters
+                user.step_dispatched = now
+                user.schedule_lag = max(now - due, 0)
+                if user.step == 0:
+                    user.iteration_start = now
+                    if self.iteration_deadline:
+                        user.iteration_deadline = now + self.iteration_deadline
+                user.api_index = self._mix_sampler.sample() if self._mix_sampler else user.step
+            api = self.apis[user.api_index]
+
+            if (not user.admitted and user.attempt == 1
+                    and user.iteration_deadline is not None and now >= user.iteration_deadline):
+                # The iteration's time budget is spent; skip its remaining steps
+                with self._condition:
+                    self.run_info["deadline_skipped"] += self._steps_per_iteration - user.step
+                user.step_dispatched = None
+                next_due = self._next_due(user, now, end_iteration=True)
+                if next_due is None or self._stop.is_set():
+                    user_finished()
+                else:
+                    scheduler.call_at(next_due, run_step, user)
+                return
+
+            if not user.admitted:
+                user.admitted = True
+                ready = now
+                if self._global_bucket:
+                    ready = self._global_bucket.reserve(ready)
+                if self._api_buckets[user.api_index]:
+                    ready = self._api_buckets[user.api_index].reserve(ready)
+                if ready > now:
+                    scheduler.call_at(ready, run_step, user)
+                    return
+
+            if connection_limiter and user.host_slot is None:
+                host = urlparse(substitute(api["url"], user.context)).netloc
+                if not connection_limiter.acquire(host, lambda: resume_with_slot(user, host)):
+                    return
+                user.host_slot = host
+
+            with self._condition:
+                state["in_flight"] += 1
+            if self.metrics:
+                self.metrics.request_started(api)
+            try:
+                try:
+                    queue_time = time.monotonic() - user.step_dispatched
+                    result = self.make_request(api, user.context, user.iteration_deadline)
+                finally:
+                    if self.metrics:
+                        self.metrics.request_finished(api)
+                    if user.host_slot is not None:
+                        connection_limiter.release(user.host_slot)
+                    with self._condition:
+                        state["in_flight"] -= 1
+                        self._condition.notify_all()
+                user.queue_time += queue_time
+                retry_policy = self._retry_policies[user.api_index]
+                if retry_policy:
+                    if user.first_attempt is None:
+                        user.first_attempt = result
+                    delay = retry_policy.backoff_delay(user.attempt)
+                    if (retry_policy.should_retry(result, user.attempt) and not self._stop.is_set()
+                            and (user.iteration_deadline is None
+                                 or time.monotonic() + delay < user.iteration_deadline)):
+                        # Back off through the scheduler so the worker is free while the user waits;
+                        # the retry goes through the limiters again like any other request
+                        user.attempt += 1
+                        user.backoff_time += delay
+                        user.step_dispatched = time.monotonic() + delay
+                        user.admitted = False
+                        user.host_slot = None
+                        scheduler.call_later(delay, run_step, user)
+                        return
+                    # response_time becomes the user-perceived time from the first attempt's start
+                    # to the last attempt's end; each attempt's own latency is kept alongside it
+                    first_attempt = user.first_attempt
+                    result["attempts"] = user.attempt
+                    result["first_attempt_time"] = first_attempt["response_time"]
+                    result["attempt_time"] = result["response_time"]
+                    result["backoff_time"] = user.backoff_time * 1000
+                    result["response_time"] = (result["timestamp"] - first_attempt["timestamp"]) * 1000 \
+                        + result["response_time"]
+                    result["timestamp"] = first_attempt["timestamp"]
+                    user.attempt = 1
+                    user.first_attempt = None
+                    user.backoff_time = 0
+                # How late the step ran compared to its ramp-up, think time or pacing schedule
+                result["schedule_lag"] = user.schedule_lag * 1000
+                # Time spent waiting for the rate and connection limiters, summed over all attempts
+                result["queue_time"] = user.queue_time * 1000
+                user.queue_time = 0
+                result["warmup"] = (user.iteration < self.warmup_iterations
+                                    or user.step_dispatched < warmup_end)
+                # Which virtual user and iteration made the request, for per-user journeys and traces
+                result["vu"] = user.user_id
+                result["iteration"] = user.iteration
+                result["seq"] = user.seq
+                user.seq += 1
+                with self._condition:
+                    # Requests still running after an abort's drain deadline are dropped
+                    accepted = not state["closed"]
+                    if accepted:
+                        if self.keep_results:
+                            results.append(result)
+                        if user.mix_counts is not None:
+                            user.mix_counts[user.api_index] += 1
+                        # HTTP/2 mode answered over HTTP/1.1, i.e. a server that did not negotiate h2
+                        if self.protocol == "http/2" and result["protocol"] not in (None, "HTTP/2"):
+                            self.run_info["http1_fallbacks"] += 1
+                if accepted:
+                    error_clusters(result)
+                    if self.metrics:
+                        self.metrics.observe(api, result)
+                    for observer in self.observers:
+                        observer(result)
+                if monitor and not result["warmup"]:
+                    breach = monitor.observe(result)
+                    if breach:
+                        self.abort(breach)
+                user.step_dispatched = None
+                user.admitted = False
+                user.host_slot = None
+                next_due = self._next_due(user, time.monotonic())
+            except Exception as e:
+                failures.append(e)
+                next_due = None
+
+            if next_due is None or self._stop.is_set():
+                user_finished()
+            else:
+                scheduler.call_at(next_due, run_step, user)
+
+        connection_limiter = None
+        if self.max_connections_per_host:
+            connection_limiter = HostConnectionLimiter(self.max_connections_per_host)
+
+        # The endpoint is stopped at the end of the run only if this run started it
+        metrics_started = False
+        if self.metrics:
+            self.metrics.active_users = self.virtual_users
+            metrics_started = self.metrics.start()
+        if self.dns_cache:
+            self.dns_cache.reset_stats()
+        # Worker threads are only busy while a request is in flight; sleeping users wait in the scheduler
+        executor = ThreadPoolExecutor(max_workers=self.virtual_users)
+        scheduler = TimerScheduler(executor)
+        try:
+            start = self._started = time.monotonic()
+            self._deadline = start + self.duration if self.duration else None
+            warmup_end = start + (self.warmup_seconds or 0)
+            users = []
+            for user_id in range(self.virtual_users):
+                user = _VirtualUser(user_id, self.variables)
+                if self._mix_sampler:
+                    users.append(user)
+                    user.mix_counts = [0] * len(self.apis)
+                scheduler.call_at(start + delay_between_users * user_id, run_step, user)
+
+            with self._condition:
+                self._condition.wait_for(lambda: state["active_users"] == 0 or self._stop.is_set())
+                if self._stop.is_set():
+                    # Stop scheduling and give in-flight requests until the drain deadline to finish
+                    drained = self._condition.wait_for(lambda: state["in_flight"] == 0,
+                                                       timeout=self.drain_timeout)
+                    self.run_info["drained"] = drained
+                state["closed"] = True
+                collected = list(results)
+        finally:
+            scheduler.close()
+            # After an abort, requests that missed the drain deadline are abandoned rather than awaited
+            executor.shutdown(wait=not self._stop.is_set(), cancel_futures=True)
+            if self.metrics:
+                self.metrics.publish()
+                if metrics_started:
+                    self.metrics.stop()
+        if self._mix_sampler:
+            # Requested against achieved share of each API, so the report can check the mix held
+            counts = [sum(user.mix_counts[i] for user in users) for i in range(len(self.apis))]
+            self.run_info["traffic_mix"] = mix_summary(self.apis, self._mix_sampler.probabilities, counts)
+        if self.dns_cache:
+            self.run_info["dns"] = self.dns_cache.stats()
+        self.run_info["error_clusters"] = error_clusters.rows()
+
+        if failures:
+            raise failures[0]
+
+        return collected
@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from utils.outcomes import error_mask
+
+# Latency growing faster than this power of the load counts as super-linear
+SUPERLINEAR_EXPONENT = 1.0
+# Load levels (quantiles of the load series) the latency curve is summarized at for knee detection
+KNEE_BINS = 10
+
+
+def _in_flight(starts, ends, edges):
+    """
+    Time-averaged number of requests in flight in each interval between edges.
+
+    The integral of the in-flight count up to t is the sum over requests of how long each
+    had been running by t, which sorted start and end times with prefix sums give for
+    every edge at once, so this is exact and O(n log n) however long the requests are.
+    """
+    starts = np.sort(starts)
+    ends = np.sort(ends)
+    start_sums = np.concatenate(([0.0], np.cumsum(starts)))
+    end_sums = np.concatenate(([0.0], np.cumsum(ends)))
+    started = np.searchsorted(starts, edges)
+    ended = np.searchsorted(ends, edges)
+    occupancy = (edges * started - start_sums[started]) - (edges * ended - end_sums[ended])
+    return np.diff(occupancy) / np.diff(edges)
+
+
+def per_second_series(df, interval=1.0, by_api=False):
+    """
+    Joins the time series of load and performance per interval: in-flight requests (time
+    averaged), throughput and mean/p95 latency of requests completing in the interval.
+    With by_api, the series is computed for each API as well, with a "url" column.
+    """
+    start = df["timestamp"].to_numpy(dtype=float)
+    origin = start.min()
+    start = start - origin  # Relative times keep the prefix sums precise
+    end = start + df["response_time"].to_numpy(dtype=float) / 1000
+    edges = np.arange(0, end.max() + interval, interval)
+    bins = np.minimum((end // interval).astype(int), len(edges) - 2)
+    base = pd.DataFrame({"second": edges[:-1] + origin})
+
+    def series(mask):
+        frame = base.copy()
+        frame["in_flight"] = _in_flight(start[mask], end[mask], edges)
+        latency = pd.Series(df["response_time"].to_numpy(dtype=float)[mask]).groupby(bins[mask])
+        frame["throughput"] = np.bincount(bins[mask], minlength=len(frame)) / interval
+        frame["mean_latency"] = latency.mean().reindex(frame.index)
+        frame["p95_latency"] = latency.quantile(0.95).reindex(frame.index)
+        return frame
+
+    overall = series(np.ones(len(df), dtype=bool))
+    if not by_api:
+        return overall
+    urls = df["url"].astype(str).to_numpy()
+    apis = []
+    for url in pd.unique(urls):
+        frame = series(urls == url)
+        frame["url"] = url
+        # Load on the whole system at the same time, to relate each API's latency to it
+        frame["load"] = overall["in_flight"].to_numpy()
+        apis.append(frame)
+    return overall, pd.concat(apis, ignore_index=True)
+
+
+def _knee(load, latency):
+    """
+    Load at which latency starts to climb: the breakpoint of the best "flat, then rising"
+    fit through the median latency at evenly populated load levels, or None.
+    """
+    levels = pd.qcut(load, min(KNEE_BINS, len(np.unique(load))), duplicates="drop")
+    curve = pd.DataFrame({"load": load, "latency": latency}).groupby(levels, observed=True).median()
+    x, y = curve["load"].to_numpy(), curve["latency"].to_numpy()
+    if len(x) < 4:
+        return None
+    best = None
+    for breakpoint in x[1:-1]:
+        design = np.column_stack((np.ones_like(x), np.maximum(x - breakpoint, 0)))
+        (flat, slope), residual, _, _ = np.linalg.lstsq(design, y, rcond=None)
+        error = residual[0] if len(residual) else 0.0
+        if slope > 0 and (best is None or error < best[0]):
+            best = (error, breakpoint, flat, slope)
+    # Only a knee if latency at the highest load is clearly above the flat part
+    if best is None or best[2] <= 0 or best[2] + best[3] * (x[-1] - best[1]) < 1.5 * best[2]:
+        return None
+    return float(best[1])
+
+
+def analyze_bottlenecks(df, interval=1.0, min_seconds=10):
+    """
+    Ranks APIs by how badly their latency degrades under load.
+
+    For every API:
+    - saturation concurrency, from Little's law: the peak throughput it sustained times
+      its unloaded latency (10th percentile) is the number of requests it can have in
+      flight before requests start to queue;
+    - the knee: the system load at which its latency starts to climb;
+    - the latency growth exponent, the slope of log latency against log system load;
+      above 1, latency grows super-linearly with load.
+    Failed requests are left out, so fast failures do not read as good latency. Only
+    intervals with completed requests count, and the exponent needs the load to have
+    varied, e.g. during ramp-up.
+    """
+    df = df[~error_mask(df)] if len(df) else df
+    if df.empty:
+        return pd.DataFrame()
+    if "name" not in df.columns:
+        df = df.assign(name="")
+    _, series = per_second_series(df, interval, by_api=True)
+    name_by_url = df.groupby(df["url"].astype(str), observed=True)["name"].first()
+    method_by_url = df.groupby(df["url"].astype(str), observed=True)["method"].first()
+    latency_by_url = df.groupby(df["url"].astype(str), observed=True)["response_time"]
+    unloaded = latency_by_url.quantile(0.1)
+
+    rows = []
+    for url, frame in series.groupby("url", sort=False):
+        frame = frame[frame["throughput"] > 0]
+        row = {
+            "method": method_by_url.get(url, ""),
+            "name": name_by_url.get(url, ""),
+            "url": url,
+            "requests": int(latency_by_url.size()[url]),
+            "peak_in_flight": round(float(frame["in_flight"].max()), 1) if len(frame) else None,
+            "saturation_concurrency": None,
+            "knee_load": None,
+            "growth_exponent": None,
+            "low_load_latency": None,
+            "high_load_latency": None,
+        }
+        if len(frame) >= min_seconds:
+            peak_throughput = frame["throughput"].quantile(0.95)
+            row["saturation_concurrency"] = round(float(peak_throughput * unloaded[url] / 1000), 1)
+            load = frame["load"].to_numpy()
+            latency = frame["mean_latency"].to_numpy()
+            low, high = np.quantile(load, [0.25, 0.75])
+            row["low_load_latency"] = round(float(np.median(latency[load <= low])), 1)
+            row["high_load_latency"] = round(float(np.median(latency[load >= high])), 1)
+            usable = (load > 0) & (latency > 0)
+            if usable.sum() >= min_seconds and np.std(np.log(load[usable])) > 0.1:
+                row["growth_exponent"] = round(float(np.polyfit(np.log(load[usable]),
+                                                                np.log(latency[usable]), 1)[0]), 2)
+                row["knee_load"] = _knee(load[usable], latency[usable])
+                if row["knee_load"] is not None:
+                    row["knee_load"] = round(row["knee_load"], 1)
+        row["verdict"], row["recommendation"] = _verdict(row)
+        rows.append(row)
+
+    result = pd.DataFrame(rows)
+    severity = result["verdict"].map({"saturated": 0, "super-linear": 1, "load sensitive": 2, "stable": 3})
+    result = result.assign(_severity=severity.fillna(4), _exponent=result["growth_exponent"].fillna(-np.inf))
+    result = result.sort_values(["_severity", "_exponent"], ascending=[True, False])
+    return result.drop(columns=["_severity", "_exponent"]).reset_index(drop=True)
+
+
+def _verdict(row):
+    exponent = row["growth_exponent"]
+    if exponent is None:
+        return "insufficient data", "Run longer or ramp load up gradually to measure how latency responds to load"
+    saturation = row["saturation_concurrency"]
+    if saturation is not None and row["peak_in_flight"] > saturation * 1.2 and exponent > 0.5:
+        return "saturated", (f"Held about {row['peak_in_flight']:g} requests in flight against an estimated "
+                             f"capacity of {saturation:g}; requests are queueing. Add capacity, raise worker or "
+                             f"connection pool limits, or look for a shared lock or downstream dependency")
+    if exponent > SUPERLINEAR_EXPONENT:
+        return "super-linear", ("Latency grows faster than load, typical of contention (locks, connection "
+                                "pools, GC) or a resource near exhaustion. Profile this endpoint under load")
+    if exponent > 0.3:
+        return "load sensitive", "Latency rises with load; check it stays within target at the expected peak"
+    return "stable", "Latency is largely independent of load at the levels tested"
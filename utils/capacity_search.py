@@ -0,0 +1,149 @@
+import math
+import time
+import numpy as np
+from utils.api_tester import APITester, create_session
+from utils.dns_cache import build_dns_cache
+from utils.outcomes import is_error
+
+
+class CapacitySearch:
+    """
+    Finds the highest load that still meets the SLOs.
+
+    The load level (virtual users in "concurrency" mode, requests/s in "rate" mode)
+    is doubled until a step breaches the p95 or error-rate SLO, then the knee is
+    located by bisection between the last passing and the first failing level.
+    All steps share one connection pool so later steps start with warm connections.
+    """
+
+    MODES = ("concurrency", "rate")
+
+    def __init__(self, apis, slo_p95, slo_error_rate=1.0, mode="concurrency", start_level=1,
+                 max_level=256, step_duration=10, ramp_up_time=1, variables=None, **tester_options):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown capacity search mode {mode!r}, expected one of {', '.join(self.MODES)}")
+        self.apis = apis
+        self.slo_p95 = slo_p95
+        self.slo_error_rate = slo_error_rate
+        self.mode = mode
+        self.start_level = max(start_level, 1)
+        self.max_level = max_level
+        self.step_duration = step_duration
+        self.ramp_up_time = ramp_up_time
+        self.variables = variables
+        # One DNS cache for every step, like the connection pool
+        if tester_options.get("dns_cache"):
+            tester_options["dns_cache"] = build_dns_cache(tester_options["dns_cache"])
+        self.tester_options = tester_options
+        self.session = create_session(
+            max_level if mode == "concurrency" else self._users_for_rate(max_level),
+            tester_options.get("protocol", "http/1.1"),
+            tester_options.get("http2_connections", 1),
+            tester_options.get("max_concurrent_streams", 100),
+        )
+        self.steps = []
+
+    def _resolution(self, level):
+        """Bisection stops once the bracket is this narrow: one user, or 5% of the request rate"""
+        return 1 if self.mode == "concurrency" else max(1, level * 0.05)
+
+    def _users_for_rate(self, rate):
+        """Enough users to sustain an arrival rate with every request taking twice the p95 SLO (Little's law)"""
+        return max(1, math.ceil(rate * self.slo_p95 / 1000 * 2))
+
+    def _run_step(self, level):
+        if self.mode == "concurrency":
+            virtual_users = int(level)
+            rate_limit = None
+        else:
+            virtual_users = self._users_for_rate(level)
+            rate_limit = {"rate": level, "burst": max(1, int(level / 10))}
+
+        tester = APITester(
+            self.apis, virtual_users, self.ramp_up_time,
+            variables=self.variables,
+            iterations=10 ** 9,  # Bounded by duration instead
+            duration=self.step_duration,
+            rate_limit=rate_limit,
+            session=self.session,
+            **self.tester_options
+        )
+        started = time.monotonic()
+        results = tester.run_test()
+        elapsed = max(time.monotonic() - started, 1e-9)
+
+        # Everything is judged on measured samples only, so cold-start latency does not lower the
+        # capacity and warm-up requests do not inflate the throughput it is reported at
+        measured = [r for r in results if not r.get("warmup")] or results
+        if len(measured) < len(results):
+            elapsed = max(max(r["timestamp"] + r["response_time"] / 1000 for r in measured)
+                          - min(r["timestamp"] for r in measured), 1e-9)
+        response_times = np.array([r["response_time"] for r in measured])
+        errors = sum(1 for r in measured if is_error(r))
+        p95 = float(np.percentile(response_times, 95)) if len(measured) else 0.0
+        error_rate = errors / len(measured) * 100 if measured else 100.0
+        aborted = tester.run_info.get("status") == "aborted"
+        step = {
+            "level": level,
+            "virtual_users": virtual_users,
+            "requests": len(measured),
+            "throughput": round(len(measured) / elapsed, 1),
+            "p95": round(p95, 1),
+            "error_rate": round(error_rate, 1),
+            "aborted": aborted,
+            # A step stopped by an abort rule breached it, whatever its partial results show
+            "passed": (bool(measured) and not aborted and p95 <= self.slo_p95
+                       and error_rate <= self.slo_error_rate)
+        }
+        self.steps.append(step)
+        return step
+
+    def run(self, progress=None):
+        """
+        Runs the search and returns a summary dict with the evaluated steps (sorted by level),
+        the knee level and the max throughput observed while meeting the SLOs.
+        `progress` is called with each step as it completes.
+        """
+        self.steps = []
+        last_pass, first_fail = None, None
+
+        # Step up geometrically until the SLO is breached
+        level = self.start_level
+        while level <= self.max_level:
+            step = self._run_step(level)
+            if progress:
+                progress(step)
+            if not step["passed"]:
+                first_fail = level
+                break
+            last_pass = level
+            level *= 2
+
+        # Bisect between the last passing and first failing levels to find the knee
+        if last_pass is not None and first_fail is not None:
+            low, high = last_pass, first_fail
+            while high - low > self._resolution(high):
+                middle = (low + high) / 2
+                if self.mode == "concurrency":
+                    middle = int(middle)
+                step = self._run_step(middle)
+                if progress:
+                    progress(step)
+                if step["passed"]:
+                    low = middle
+                else:
+                    high = middle
+            last_pass = low
+
+        passing = [step for step in self.steps if step["passed"]]
+        return {
+            "mode": self.mode,
+            "steps": sorted(self.steps, key=lambda step: step["level"]),
+            "knee_level": last_pass,
+            "max_rps_at_slo": max((step["throughput"] for step in passing), default=0.0),
+            # True when even the maximum level met the SLO, so the real limit is higher
+            "limit_not_reached": first_fail is None and last_pass is not None
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,413 @@
+import argparse
+import json
+import math
+import os
+import sys
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+from jinja2 import Template
+from utils.outcomes import error_mask
+from utils.sketch import LatencySketch
+
+# Per-API metrics a comparison can report; error_rate and distribution are tested differently
+METRICS = ("mean", "p50", "p90", "p95", "p99", "error_rate", "distribution")
+DEFAULT_METRICS = ("mean", "p50", "p95", "p99", "error_rate", "distribution")
+
+# Above this many distinct latencies an API's samples are folded into sketch buckets (1% accuracy)
+MAX_DISTINCT = 2000
+# The only columns a comparison reads from a results file
+COMPARISON_COLUMNS = ["url", "name", "method", "status_code", "response_time", "warmup"]
+
+_QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
+
+def _distribution(values=None, sketch=None):
+    """Latencies as sorted distinct values with counts, from raw samples or a LatencySketch"""
+    if values is not None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        distinct, counts = np.unique(values, return_counts=True)
+        if len(distinct) <= MAX_DISTINCT:
+            return distinct, counts
+        sketch = LatencySketch.from_values(values)
+    indexes = sorted(sketch.bins)
+    distinct = [0.0] * bool(sketch.zero_count) + [sketch._bucket_value(index) for index in indexes]
+    counts = [sketch.zero_count] * bool(sketch.zero_count) + [sketch.bins[index] for index in indexes]
+    return np.asarray(distinct, dtype=float), np.asarray(counts, dtype=np.int64)
+
+
+def _merge_distributions(distributions):
+    values = np.concatenate([values for values, _ in distributions])
+    counts = np.concatenate([counts for _, counts in distributions])
+    distinct, inverse = np.unique(values, return_inverse=True)
+    return distinct, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+def run_from_results(results, label="run"):
+    """Builds a comparable run from engine results (a list of dicts or a DataFrame); warm-up is left out"""
+    df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    if df.empty:
+        raise ValueError(f"Run {label!r} has no results to compare")
+    if "warmup" in df.columns:
+        is_warmup = df["warmup"].fillna(False).astype(bool)
+        if not is_warmup.all():
+            df = df[~is_warmup]
+    df = df.assign(is_error=error_mask(df))
+    apis = {}
+    for api, group in df.groupby("url", sort=False, observed=True):
+        apis[str(api)] = {
+            "name": str(group["name"].iloc[0]) if "name" in group else "",
+            "method": str(group["method"].iloc[0]) if "method" in group else "",
+            "requests": len(group),
+            "errors": int(group["is_error"].sum()),
+            "latency": _distribution(values=group["response_time"].to_numpy()),
+        }
+    return {"label": label, "apis": apis}
+
+
+def run_from_history(history, run_id, label=None):
+    """Builds a comparable run from RunHistory, using raw samples when kept and the stored sketches otherwise"""
+    aggregates = history.api_aggregates(run_id)
+    if not aggregates:
+        raise ValueError(f"Run {run_id} is not in the history")
+    label = label or f"run {run_id}"
+    samples = history.load_samples(run_id)
+    apis = {}
+    for row in aggregates:
+        if samples is not None:
+            latency = _distribution(values=samples.loc[samples["url"] == row["api"], "response_time"].to_numpy())
+        else:
+            latency = _distribution(sketch=LatencySketch.from_dict(json.loads(row["sketch"])))
+        apis[row["api"]] = {
+            "name": row["name"] or "",
+            "method": row["method"] or "",
+            "requests": row["requests"],
+            "errors": row["errors"],
+            "latency": latency,
+        }
+    return {"label": label, "apis": apis}
+
+
+def load_run(source, history=None, label=None):
+    """
+    Loads a run to compare from a results file (.parquet/.arrow from utils.result_io or a .jsonl
+    result log), a RunHistory run id, or engine results already in memory.
+    """
+    if isinstance(source, (list, pd.DataFrame)):
+        return run_from_results(source, label or "run")
+    if isinstance(source, int) or (isinstance(source, str) and source.isdigit() and not os.path.exists(source)):
+        if history is None:
+            raise ValueError(f"Run id {source} needs a run history to load from")
+        return run_from_history(history, int(source), label)
+    label = label or os.path.basename(str(source))
+    if str(source).endswith(".jsonl"):
+        from utils.result_log import read_log
+        return run_from_results(read_log(source)["results"], label)
+    from utils.result_io import read_results
+    df, _ = read_results(source, columns=COMPARISON_COLUMNS)
+    return run_from_results(df, label)
+
+
+def pool_runs(runs, label=None):
+    """Pools several runs into one, e.g. the last few builds as a steadier baseline"""
+    if len(runs) == 1:
+        return runs[0]
+    apis = {}
+    for run in runs:
+        for api, data in run["apis"].items():
+            pooled = apis.setdefault(api, {"name": data["name"], "method": data["method"], "requests": 0,
+                                           "errors": 0, "latencies": []})
+            pooled["requests"] += data["requests"]
+            pooled["errors"] += data["errors"]
+            pooled["latencies"].append(data["latency"])
+    for pooled in apis.values():
+        pooled["latency"] = _merge_distributions(pooled.pop("latencies"))
+    return {"label": label or " + ".join(run["label"] for run in runs), "apis": apis}
+
+
+def _statistic(metric, values, counts):
+    """A metric over one or many count vectors (rows); quantiles use the same ranks as LatencySketch"""
+    counts = np.atleast_2d(counts)
+    total = counts.sum(axis=1)
+    if metric == "mean":
+        return counts @ values / total
+    rank = _QUANTILES[metric] * (total - 1)
+    cumulative = np.cumsum(counts, axis=1)
+    return values[(cumulative > rank[:, None]).argmax(axis=1)]
+
+
+def bootstrap(metrics, values, counts, replicates=1000, rng=None, chunk_cells=2000000):
+    """
+    Bootstrap replicates of each metric, all computed from the same resamples. Resampling n
+    latencies with replacement is the same as drawing the counts of each distinct value from
+    a multinomial, which keeps the cost proportional to the number of distinct values rather
+    than the number of samples.
+    """
+    rng = rng or np.random.default_rng()
+    total = int(counts.sum())
+    probabilities = counts / total
+    chunk = max(1, chunk_cells // len(values))
+    estimates = {metric: [] for metric in metrics}
+    for start in range(0, replicates, chunk):
+        draws = rng.multinomial(total, probabilities, size=min(chunk, replicates - start))
+        for metric in metrics:
+            estimates[metric].append(_statistic(metric, values, draws))
+    return {metric: np.concatenate(chunks) for metric, chunks in estimates.items()}
+
+
+def mann_whitney(baseline, candidate):
+    """
+    Two-sided Mann-Whitney U test on two (values, counts) distributions, using the normal
+    approximation with tie correction. Returns (p_value, probability that a candidate
+    request is slower than a baseline one).
+    """
+    values_a, counts_a = baseline
+    values_b, counts_b = candidate
+    n_a, n_b = float(counts_a.sum()), float(counts_b.sum())
+    distinct, inverse = np.unique(np.concatenate([values_a, values_b]), return_inverse=True)
+    tied_a = np.bincount(inverse[:len(values_a)], weights=counts_a, minlength=len(distinct))
+    tied_b = np.bincount(inverse[len(values_a):], weights=counts_b, minlength=len(distinct))
+    ties = tied_a + tied_b
+    midranks = np.cumsum(ties) - (ties - 1) / 2
+    u_b = (tied_b * midranks).sum() - n_b * (n_b + 1) / 2
+    total = n_a + n_b
+    variance = n_a * n_b / 12 * ((total + 1) - (ties ** 3 - ties).sum() / (total * (total - 1)))
+    slower = u_b / (n_a * n_b)
+    if variance <= 0:
+        return 1.0, slower
+    z = (abs(u_b - n_a * n_b / 2) - 0.5) / math.sqrt(variance)
+    return math.erfc(max(z, 0) / math.sqrt(2)), slower
+
+
+def _proportion_test(errors_a, n_a, errors_b, n_b):
+    """Two-sided two-proportion z-test p-value"""
+    pooled = (errors_a + errors_b) / (n_a + n_b)
+    variance = pooled * (1 - pooled) * (1 / n_a + 1 / n_b)
+    if variance <= 0:
+        return 1.0
+    z = abs(errors_b / n_b - errors_a / n_a) / math.sqrt(variance)
+    return math.erfc(z / math.sqrt(2))
+
+
+class RunComparison:
+    """
+    Per-API comparison of one or more candidate runs against a baseline.
+
+    Latency metrics get a bootstrap confidence interval on the candidate minus baseline
+    difference; the whole distribution is compared with a Mann-Whitney test and the error
+    rate with a two-proportion test. A change is only flagged when it is both statistically
+    significant and at least `min_change` percent (percentage points for the error rate),
+    so run-to-run noise and trivial shifts in very large runs do not fail a build.
+    """
+
+    def __init__(self, baseline, candidates, metrics=DEFAULT_METRICS, confidence=0.95, min_change=5.0,
+                 min_error_change=1.0, min_requests=30, replicates=1000, seed=None):
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError(f"Unknown comparison metric {metric!r}, expected one of {', '.join(METRICS)}")
+        # Several baseline runs are pooled into one
+        self.baseline = pool_runs(baseline) if isinstance(baseline, (list, tuple)) else baseline
+        self.candidates = candidates if isinstance(candidates, (list, tuple)) else [candidates]
+        self.metrics = metrics
+        self.confidence = confidence
+        self.min_change = min_change
+        self.min_error_change = min_error_change
+        self.min_requests = min_requests
+        self.replicates = replicates
+        self._rng = np.random.default_rng(seed)
+        # Bootstrap replicates per (run, API), so a baseline is resampled once for every candidate
+        self._replicates = {}
+        self.rows = [row for candidate in self.candidates for row in self._compare(candidate)]
+
+    def _compare(self, candidate):
+        alpha = 1 - self.confidence
+        rows = []
+        for api, base in self.baseline["apis"].items():
+            cand = candidate["apis"].get(api)
+            if cand is None:
+                continue
+            common = {"candidate": candidate["label"], "api": api, "name": base["name"], "method": base["method"],
+                      "baseline_requests": base["requests"], "candidate_requests": cand["requests"]}
+            enough = min(base["requests"], cand["requests"]) >= self.min_requests
+            for metric in self.metrics:
+                row = dict(common, metric=metric, ci_low=None, ci_high=None, p_value=None)
+                if metric == "error_rate":
+                    row["baseline"] = base["errors"] / base["requests"] * 100
+                    row["candidate_value"] = cand["errors"] / cand["requests"] * 100
+                    row["delta"] = row["candidate_value"] - row["baseline"]
+                    row["delta_pct"] = row["delta"]
+                    row["p_value"] = _proportion_test(base["errors"], base["requests"],
+                                                      cand["errors"], cand["requests"])
+                    significant = row["p_value"] < alpha and abs(row["delta"]) >= self.min_error_change
+                else:
+                    base_values, base_counts = base["latency"]
+                    cand_values, cand_counts = cand["latency"]
+                    if not len(base_values) or not len(cand_values):
+                        continue
+                    point = "p50" if metric == "distribution" else metric
+                    row["baseline"] = float(_statistic(point, base_values, base_counts)[0])
+                    row["candidate_value"] = float(_statistic(point, cand_values, cand_counts)[0])
+                    row["delta"] = row["candidate_value"] - row["baseline"]
+                    row["delta_pct"] = row["delta"] / row["baseline"] * 100 if row["baseline"] else None
+                    large = row["delta_pct"] is None or abs(row["delta_pct"]) >= self.min_change
+                    if metric == "distribution":
+                        row["p_value"], row["prob_slower"] = mann_whitney(base["latency"], cand["latency"])
+                        significant = row["p_value"] < alpha and large
+                    elif enough:
+                        differences = (self._bootstrap(candidate, api)[metric]
+                                       - self._bootstrap(self.baseline, api)[metric])
+                        row["ci_low"], row["ci_high"] = (float(x) for x in
+                                                         np.quantile(differences, [alpha / 2, 1 - alpha / 2]))
+                        significant = (row["ci_low"] > 0 or row["ci_high"] < 0) and large
+                    else:
+                        significant = False
+                if not enough:
+                    row["verdict"] = "insufficient data"
+                elif significant:
+                    row["verdict"] = "regression" if row["delta"] > 0 else "improvement"
+                else:
+                    row["verdict"] = "unchanged"
+                rows.append(row)
+        return rows
+
+    def _bootstrap(self, run, api):
+        key = (id(run), api)
+        if key not in self._replicates:
+            values, counts = run["apis"][api]["latency"]
+            metrics = [metric for metric in self.metrics if metric in _QUANTILES or metric == "mean"]
+            self._replicates[key] = bootstrap(metrics, values, counts, self.replicates, self._rng)
+        return self._replicates[key]
+
+    @property
+    def regressions(self):
+        return [row for row in self.rows if row["verdict"] == "regression"]
+
+    @property
+    def passed(self):
+        return not self.regressions
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.rows)
+
+    def to_dict(self):
+        return {
+            "baseline": self.baseline["label"],
+            "candidates": [candidate["label"] for candidate in self.candidates],
+            "confidence": self.confidence,
+            "min_change": self.min_change,
+            "passed": self.passed,
+            "regressions": len(self.regressions),
+            "rows": self.rows,
+        }
+
+    def _create_delta_plot(self, candidate, metric):
+        rows = [row for row in self.rows if row["candidate"] == candidate and row["metric"] == metric
+                and row["delta_pct"] is not None]
+        if not rows:
+            return ""
+        colors = {"regression": "#E74C3C", "improvement": "#27AE60"}
+        # CI bounds are absolute differences; shown relative to the baseline like the bars
+        error_plus = [(row["ci_high"] - row["delta"]) / row["baseline"] * 100 if row["ci_high"] is not None
+                      and row["baseline"] else 0 for row in rows]
+        error_minus = [(row["delta"] - row["ci_low"]) / row["baseline"] * 100 if row["ci_low"] is not None
+                       and row["baseline"] else 0 for row in rows]
+        fig = go.Figure(go.Bar(
+            x=[f"{row['method']} {row['name'] or row['api']}" for row in rows],
+            y=[row["delta_pct"] for row in rows],
+            marker_color=[colors.get(row["verdict"], "#95A5A6") for row in rows],
+            error_y=dict(type="data", symmetric=False, array=error_plus, arrayminus=error_minus),
+            hovertext=[row["verdict"] for row in rows],
+        ))
+        fig.update_layout(title=f"{metric} change vs baseline (%)", yaxis_title="Change (%)",
+                          xaxis_title="API", height=400, showlegend=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def generate_html_report(self):
+        df = self.to_dataframe()
+        sections = []
+        for candidate in self.candidates:
+            label = candidate["label"]
+            table = df[df["candidate"] == label] if not df.empty else df
+            if not table.empty:
+                table = table[["name", "method", "api", "metric", "baseline", "candidate_value", "delta",
+                               "delta_pct", "ci_low", "ci_high", "p_value", "verdict"]].rename(columns={
+                    "name": "Name", "method": "Method", "api": "URL", "metric": "Metric",
+                    "baseline": "Baseline", "candidate_value": "Candidate", "delta": "Change",
+                    "delta_pct": "Change %", "ci_low": "CI Low", "ci_high": "CI High",
+                    "p_value": "p-value", "verdict": "Verdict"})
+                table = table.copy()
+                for column in ("Baseline", "Candidate", "Change", "Change %", "CI Low", "CI High"):
+                    table[column] = table[column].map(lambda x: f"{x:.1f}" if pd.notnull(x) else "")
+                table["p-value"] = table["p-value"].map(lambda x: f"{x:.4f}" if pd.notnull(x) else "")
+                table["Verdict"] = table["Verdict"].map(
+                    lambda v: f'<span style="color:#E74C3C; font-weight:bold;">{v}</span>' if v == "regression"
+                    else f'<span style="color:#27AE60; font-weight:bold;">{v}</span>' if v == "improvement" else v)
+            regressions = [row for row in self.regressions if row["candidate"] == label]
+            sections.append({
+                "label": label,
+                "regressions": len(regressions),
+                "table": table.to_html(classes="dataframe", escape=False, index=False) if not table.empty else "",
+                "plot": self._create_delta_plot(label, "p95" if "p95" in self.metrics else self.metrics[0]),
+            })
+
+        with open("templates/comparison_template.html", "r") as f:
+            template = Template(f.read())
+        return template.render(
+            plotly_js=get_plotlyjs(),  # Embedded once; every chart is rendered without its own copy
+            baseline=self.baseline["label"],
+            confidence=round(self.confidence * 100),
+            min_change=self.min_change,
+            min_error_change=self.min_error_change,
+            passed=self.passed,
+            regressions=len(self.regressions),
+            sections=sections,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.comparison",
+        description="Compare load test runs and exit non-zero when a candidate regresses.")
+    parser.add_argument("baseline", nargs="+", help="Baseline run(s): results files or history run ids; "
+                                                     "several are pooled")
+    parser.add_argument("--candidate", action="append", required=True, help="Candidate run, may be repeated")
+    parser.add_argument("--history", default="run_history.db", help="Run history database for run ids")
+    parser.add_argument("--metrics", default=",".join(DEFAULT_METRICS), help="Comma-separated metrics")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--min-change", type=float, default=5.0, help="Smallest change in percent to flag")
+    parser.add_argument("--min-error-change", type=float, default=1.0,
+                        help="Smallest error rate change in percentage points to flag")
+    parser.add_argument("--html", help="Write the diff report to this file")
+    parser.add_argument("--json", help="Write the comparison as JSON to this file")
+    args = parser.parse_args(argv)
+
+    history = None
+    if os.path.exists(args.history):
+        from utils.run_history import RunHistory
+        history = RunHistory(args.history)
+    try:
+        baseline = [load_run(source, history) for source in args.baseline]
+        candidates = [load_run(source, history) for source in args.candidate]
+    finally:
+        if history is not None:
+            history.close()
+    comparison = RunComparison(baseline, candidates, metrics=tuple(args.metrics.split(",")),
+                               confidence=args.confidence, min_change=args.min_change,
+                               min_error_change=args.min_error_change)
+    if args.html:
+        with open(args.html, "w") as f:
+            f.write(comparison.generate_html_report())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(comparison.to_dict(), f, indent=2, default=float)
+    for row in comparison.regressions:
+        print(f"REGRESSION {row['candidate']}: {row['method']} {row['api']} {row['metric']} "
+              f"{row['baseline']:.1f} -> {row['candidate_value']:.1f}")
+    print("PASS" if comparison.passed else f"FAIL: {len(comparison.regressions)} regression(s)")
+    return 0 if comparison.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
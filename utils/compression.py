@@ -0,0 +1,56 @@
+import gzip
+import json
+import zlib
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional
+    brotli = None
+
+
+def _compressors():
+    compressors = {"gzip": gzip.compress, "deflate": zlib.compress}
+    if brotli is not None:
+        compressors["br"] = brotli.compress
+    return compressors
+
+
+# Content-Encoding values request bodies can be compressed with
+BODY_ENCODINGS = tuple(_compressors())
+
+
+def encode_body(body, headers, compress=None):
+    """
+    Serializes a JSON request body to bytes, optionally compressing it.
+    Returns (data, headers) with Content-Type and Content-Encoding set as needed.
+    """
+    if body is None:
+        return None, headers
+    headers = dict(headers or {})
+    if not any(name.lower() == "content-type" for name in headers):
+        headers["Content-Type"] = "application/json"
+    # Same serialization requests uses for json=, so uncompressed bodies are unchanged on the wire
+    data = json.dumps(body, allow_nan=False).encode("utf-8")
+    if compress:
+        compressors = _compressors()
+        if compress not in compressors:
+            raise ValueError(f"Unsupported body compression {compress!r}, expected one of "
+                             f"{', '.join(compressors)}")
+        data = compressors[compress](data)
+        headers["Content-Encoding"] = compress
+    return data, headers
+
+
+def wire_bytes(response):
+    """Bytes of the response body as received on the wire, before any content decoding"""
+    downloaded = getattr(response, "num_bytes_downloaded", None)  # httpx
+    if downloaded is not None:
+        return downloaded
+    raw = getattr(response, "raw", None)
+    if raw is not None and hasattr(raw, "tell"):
+        try:
+            return raw.tell()  # urllib3 counts bytes read from the socket
+        except (OSError, ValueError):
+            pass
+    length = response.headers.get("Content-Length")
+    return int(length) if length and length.isdigit() else len(response.content)
@@ -0,0 +1,163 @@
+import ipaddress
+import itertools
+import socket
+import threading
+import time
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError
+
+
+class DNSCache:
+    """
+    In-process DNS cache used while a test runs.
+
+    Lookups are cached for `ttl` seconds, hosts in `pinned` resolve to the given
+    addresses without asking the resolver, and when a host has several addresses
+    successive lookups rotate through them (round-robin) so new connections spread
+    across them. use_dns_cache() attaches it to one session, so only that session's
+    new connections resolve through it; the rest of the process is left alone.
+    """
+
+    def __init__(self, ttl=60, pinned=None):
+        self.ttl = ttl
+        # {"api.example.com": "10.0.0.5"} or {"api.example.com": ["10.0.0.5", "10.0.0.6"]}
+        self.pinned = {
+            host.lower(): [addresses] if isinstance(addresses, str) else list(addresses)
+            for host, addresses in (pinned or {}).items()
+        }
+        for host, addresses in self.pinned.items():
+            if not addresses:
+                raise ValueError(f"No addresses given for pinned host {host!r}")
+            for address in addresses:
+                ipaddress.ip_address(address)  # Raises ValueError for anything but an IP
+        self._entries = {}  # key -> (expires, addrinfo list)
+        self._rotation = itertools.count()
+        self._lock = threading.Lock()
+        self._resolver = socket.getaddrinfo
+        self._pool_classes = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.pinned_lookups = 0
+        self.lookup_time = 0.0  # Seconds spent in the system resolver
+
+    def stats(self):
+        """Lookup counts since the last reset, for run_info and the report"""
+        lookups = self.hits + self.misses + self.pinned_lookups
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "pinned": self.pinned_lookups,
+            "hit_rate": round((self.hits + self.pinned_lookups) / lookups * 100, 1) if lookups else 0.0,
+            "resolver_time": round(self.lookup_time * 1000, 1),  # ms
+        }
+
+    def _pinned_infos(self, addresses, port, type, proto):
+        infos = []
+        for address in addresses:
+            family = socket.AF_INET6 if ipaddress.ip_address(address).version == 6 else socket.AF_INET
+            sockaddr = (address, port, 0, 0) if family == socket.AF_INET6 else (address, port)
+            infos.append((family, type or socket.SOCK_STREAM, proto or socket.IPPROTO_TCP, "", sockaddr))
+        return infos
+
+    def _rotate(self, infos):
+        if len(infos) < 2:
+            return infos
+        offset = next(self._rotation) % len(infos)
+        return infos[offset:] + infos[:offset]
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Cached equivalent of socket.getaddrinfo"""
+        name = host.decode() if isinstance(host, bytes) else host
+        if name is None:
+            return self._resolver(host, port, family, type, proto, flags)
+        name = name.lower()
+        pinned = self.pinned.get(name)
+        if pinned is not None:
+            with self._lock:
+                self.pinned_lookups += 1
+                infos = self._pinned_infos(pinned, port, type, proto)
+                return self._rotate([info for info in infos if family in (0, info[0])])
+        try:
+            ipaddress.ip_address(name)
+            # IP literals never reach a resolver, so they are neither cached nor counted
+            return self._resolver(host, port, family, type, proto, flags)
+        except ValueError:
+            pass
+
+        key = (name, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return self._rotate(entry[1])
+
+        started = time.perf_counter()
+        infos = self._resolver(host, port, family, type, proto, flags)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.misses += 1
+            self.lookup_time += elapsed
+            self._entries[key] = (time.monotonic() + self.ttl, infos)
+            return self._rotate(infos)
+
+    def resolve(self, host, port):
+        """Address to open a TCP connection to; raises socket.gaierror like the resolver"""
+        return self.getaddrinfo(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+
+    def pool_classes(self):
+        """urllib3 connection pool classes whose connections resolve through this cache"""
+        if self._pool_classes is None:
+            cache = self
+
+            def new_conn(connection):
+                # Connect to the cached address; TLS still verifies and sends SNI for the host name
+                host = connection._dns_host
+                try:
+                    connection._dns_host = cache.resolve(host, connection.port)
+                except socket.gaierror as e:
+                    raise NameResolutionError(connection.host, connection, e) from e
+                try:
+                    return HTTPConnection._new_conn(connection)
+                finally:
+                    connection._dns_host = host
+
+            http = type("CachedDNSConnection", (HTTPConnection,), {"_new_conn": new_conn})
+            https = type("CachedDNSHTTPSConnection", (HTTPSConnection,), {"_new_conn": new_conn})
+            self._pool_classes = {
+                "http": type("CachedDNSConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": http}),
+                "https": type("CachedDNSHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": https}),
+            }
+        return self._pool_classes
+
+
+def use_dns_cache(session, cache):
+    """
+    Resolves a session's new connections through the cache: a requests session's pools, or
+    an Http2Client's connections. Other sessions, e.g. other users' runs in the same process,
+    keep resolving normally.
+    """
+    if hasattr(session, "use_dns_cache"):
+        session.use_dns_cache(cache)
+        return
+    for adapter in session.adapters.values():
+        if adapter.poolmanager.pool_classes_by_scheme is not cache.pool_classes():
+            adapter.poolmanager.pool_classes_by_scheme = cache.pool_classes()
+            adapter.poolmanager.clear()  # Pooled connections were resolved without the cache
+
+
+def build_dns_cache(spec):
+    """Builds a DNSCache from True, a TTL in seconds or {"ttl": ..., "pinned": {...}}; None when disabled"""
+    if not spec:
+        return None
+    if isinstance(spec, DNSCache):
+        return spec
+    if spec is True:
+        return DNSCache()
+    if isinstance(spec, (int, float)):
+        return DNSCache(ttl=spec)
+    return DNSCache(ttl=spec.get("ttl", 60), pinned=spec.get("pinned"))
@@ -0,0 +1,167 @@
+import hashlib
+import re
+import threading
+from functools import lru_cache
+import pandas as pd
+
+# Only the start of an error body is normalized; long HTML error pages differ little after it
+MAX_NORMALIZED_LENGTH = 500
+
+# Variable parts of error messages, masked in this order so e.g. a UUID is not read as numbers
+_MASKS = (
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<uuid>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<ts>"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:\.\d+)?\b"), "<ts>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}\b"), "<date>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b"), "<ip>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{8,}\b"), "<hex>"),
+    (re.compile(r"\d+(?:\.\d+)?"), "<n>"),
+    (re.compile(r"\s+"), " "),
+)
+
+
+def normalize_error(message):
+    """Masks ids, timestamps, addresses and numbers so repeats of one failure read the same"""
+    # Truncated before the cache, so it never holds whole error bodies as keys
+    return _normalize(str(message)[:MAX_NORMALIZED_LENGTH])
+
+
+def error_signature(message):
+    """Short stable hash of a normalized error message; equal signatures mean the same kind of failure"""
+    return _signature(str(message)[:MAX_NORMALIZED_LENGTH])
+
+
+@lru_cache(maxsize=4096)
+def _normalize(text):
+    for pattern, replacement in _MASKS:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+@lru_cache(maxsize=4096)
+def _signature(text):
+    return hashlib.blake2b(_normalize(text).encode(), digest_size=6).hexdigest()
+
+
+class ErrorClusters:
+    """
+    Groups failed requests by API and error signature while the test runs.
+
+    Pass an instance to APITester as an observer. Each cluster keeps only counts, the first
+    and last time it was seen and one example message, so memory grows with the number of
+    distinct failures rather than the number of failed requests. Past max_clusters per API,
+    new signatures are folded into a single "other" cluster.
+    """
+
+    OTHER = "other"
+
+    def __init__(self, max_clusters=100, max_example_length=500):
+        self.max_clusters = max_clusters
+        self.max_example_length = max_example_length
+        self._clusters = {}  # (url, signature) -> cluster dict
+        self._per_api = {}
+        self._lock = threading.Lock()
+
+    def add(self, result):
+        message = result.get("error_message")
+        # Warm-up failures are left out, like everywhere else in the metrics
+        if not message or result.get("warmup"):
+            return
+        signature = result.get("error_signature") or error_signature(message)
+        url = result["url"]
+        with self._lock:
+            cluster = self._clusters.get((url, signature))
+            if cluster is None:
+                if self._per_api.get(url, 0) >= self.max_clusters:
+                    signature = self.OTHER
+                    cluster = self._clusters.get((url, signature))
+                if cluster is None:
+                    cluster = self._clusters[(url, signature)] = {
+                        "url": url,
+                        "method": result.get("method", ""),
+                        "name": result.get("name", ""),
+                        "signature": signature,
+                        "pattern": "(other errors)" if signature == self.OTHER else normalize_error(message),
+                        "example": str(message)[:self.max_example_length],
+                        "count": 0,
+                        "first_seen": result["timestamp"],
+                        "last_seen": result["timestamp"],
+                    }
+                    self._per_api[url] = self._per_api.get(url, 0) + 1
+            cluster["count"] += 1
+            cluster["first_seen"] = min(cluster["first_seen"], result["timestamp"])
+            cluster["last_seen"] = max(cluster["last_seen"], result["timestamp"])
+
+    __call__ = add
+
+    def rows(self, limit=None):
+        """Clusters as dicts, most frequent first"""
+        with self._lock:
+            rows = sorted((dict(cluster) for cluster in self._clusters.values()),
+                          key=lambda cluster: cluster["count"], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.rows(), columns=CLUSTER_COLUMNS)
+
+
+# Columns of a cluster table, as returned by cluster_errors and ErrorClusters.to_dataframe
+CLUSTER_COLUMNS = ["url", "signature", "method", "name", "count", "first_seen", "last_seen", "pattern", "example"]
+
+
+def cluster_errors(df):
+    """
+    Clusters the failed requests of finished results by API and error signature in one
+    groupby, using the signatures the engine recorded and hashing only untagged messages.
+    Returns one row per cluster, most frequent first.
+    """
+    if "error_message" not in df.columns:
+        return pd.DataFrame(columns=CLUSTER_COLUMNS)
+    messages = df["error_message"]
+    errors = df[messages.notna() & (messages.astype(str) != "")]
+    if errors.empty:
+        return pd.DataFrame(columns=CLUSTER_COLUMNS)
+    if "name" not in errors.columns:
+        errors = errors.assign(name="")
+    signature = pd.Series(None, index=errors.index, dtype=object)
+    if "error_signature" in errors.columns:
+        signature = errors["error_signature"].astype(object)
+    untagged = signature.isna()
+    if untagged.any():
+        signature[untagged] = errors.loc[untagged, "error_message"].astype(str).map(error_signature)
+    clusters = errors.assign(signature=signature.astype(str)).groupby(
+        ["url", "signature"], observed=True, sort=False).agg(
+        method=("method", "first"),
+        name=("name", "first"),
+        count=("timestamp", "size"),
+        first_seen=("timestamp", "min"),
+        last_seen=("timestamp", "max"),
+        example=("error_message", "first"),
+    ).reset_index()
+    clusters["example"] = clusters["example"].astype(str).str[:500]
+    clusters["pattern"] = clusters["example"].map(normalize_error)
+    return clusters.sort_values("count", ascending=False, kind="stable")[CLUSTER_COLUMNS].reset_index(drop=True)
+
+
+def run_clusters(df, run_info=None, include_warmup=False):
+    """
+    Error clusters of a run: the ones the engine collected while it ran, or, for runs from
+    before that and reports including warm-up (which the engine leaves out), clustered from
+    the results
+    """
+    rows = (run_info or {}).get("error_clusters")
+    if rows is not None and not include_warmup:
+        return pd.DataFrame(rows, columns=CLUSTER_COLUMNS)
+    return cluster_errors(df)
+
+
+def top_signatures(clusters, limit=10):
+    """Most frequent clusters as a display table, with first and last seen as times of day"""
+    if clusters.empty:
+        return pd.DataFrame()
+    df = clusters.head(limit).copy()
+    for column in ("first_seen", "last_seen"):
+        df[column] = pd.to_datetime(df[column], unit="s").dt.strftime("%H:%M:%S")
+    return df[["method", "name", "url", "count", "first_seen", "last_seen", "pattern", "example"]].rename(columns={
+        "count": "Count", "first_seen": "First Seen", "last_seen": "Last Seen", "pattern": "Error Signature",
+        "example": "Example"})
@@ -0,0 +1,182 @@
+import json
+import re
+import time
+
+# Matches Postman style {{variable}} placeholders
+_VARIABLE_PATTERN = re.compile(r"\{\{\s*([\w.\-]+)\s*\}\}")
+
+# Matches one step of a JSONPath expression: .key, [0], [*], ['key'] or ["key"]
+_JSONPATH_STEP = re.compile(r"\.([^.\[\]]+)|\[(\d+|\*)\]|\['([^']*)'\]|\[\"([^\"]*)\"\]")
+
+# Matches pm.environment.set("name", <response json expression>) style statements in Postman test scripts
+_POSTMAN_JSON_SET = re.compile(
+    r"pm\.(?:environment|collectionVariables|globals|variables)\.set\(\s*[\"']([\w.\-]+)[\"']\s*,\s*"
+    r"(?:pm\.response\.json\(\)|jsonData|JSON\.parse\(responseBody\))((?:\.\w+|\[\d+\])*)\s*\)"
+)
+
+# Matches pm.environment.set("name", pm.response.headers.get("Header")) style statements
+_POSTMAN_HEADER_SET = re.compile(
+    r"pm\.(?:environment|collectionVariables|globals|variables)\.set\(\s*[\"']([\w.\-]+)[\"']\s*,\s*"
+    r"pm\.response\.headers\.get\(\s*[\"']([^\"']+)[\"']\s*\)\s*\)"
+)
+
+
+def substitute(value, context):
+    """Replaces {{name}} placeholders in strings, dicts and lists with values from the context"""
+    if not context:
+        return value
+    if isinstance(value, str):
+        if "{{" not in value:
+            return value
+        # A value that is exactly one placeholder keeps the type of the stored value
+        match = _VARIABLE_PATTERN.fullmatch(value.strip())
+        if match and match.group(1) in context:
+            return context[match.group(1)]
+        return _VARIABLE_PATTERN.sub(
+            lambda m: str(context[m.group(1)]) if m.group(1) in context else m.group(0), value)
+    if isinstance(value, dict):
+        return {substitute(k, context): substitute(v, context) for k, v in value.items()}
+    if isinstance(value, list):
+        return [substitute(v, context) for v in value]
+    return value
+
+
+def compile_jsonpath(expression):
+    """Compiles a simple JSONPath expression ($.a.b[0]['c']) into a list of steps"""
+    expression = expression.strip()
+    if expression.startswith("$"):
+        expression = expression[1:]
+    if expression and not expression.startswith((".", "[")):
+        expression = "." + expression
+
+    steps = []
+    position = 0
+    while position < len(expression):
+        match = _JSONPATH_STEP.match(expression, position)
+        if not match:
+            raise ValueError(f"Unsupported JSONPath expression: {expression!r}")
+        key, index, quoted, double_quoted = match.groups()
+        if index is not None:
+            steps.append(index if index == "*" else int(index))
+        else:
+            steps.append(key if key is not None else (quoted if quoted is not None else double_quoted))
+        position = match.end()
+    return steps
+
+
+def resolve_jsonpath(document, steps):
+    """Walks a parsed JSON document along compiled JSONPath steps, returning None when missing"""
+    for step in steps:
+        if step == "*":
+            # Wildcards select the first element, which is what chained requests need
+            if isinstance(document, list) and document:
+                document = document[0]
+            elif isinstance(document, dict) and document:
+                document = next(iter(document.values()))
+            else:
+                return None
+        elif isinstance(step, int):
+            if not isinstance(document, list) or step >= len(document):
+                return None
+            document = document[step]
+        else:
+            if not isinstance(document, dict) or step not in document:
+                return None
+            document = document[step]
+    return document
+
+
+class Extractor:
+    """
+    A single value extractor that stores part of a response in the virtual user context.
+
+    max_bytes limits a regex to the start of the body, so a pattern meant for a header-like
+    prefix cannot match further down. It is a search window only: the whole body has still
+    been downloaded, as it must be for the latency and size metrics and to reuse the
+    connection. JSONPath extractors always parse the whole body.
+    """
+
+    TYPES = ("jsonpath", "regex", "header")
+
+    def __init__(self, name, type, expression, group=1, default=None, max_bytes=None):
+        if type not in self.TYPES:
+            raise ValueError(f"Unknown extractor type {type!r}, expected one of {', '.join(self.TYPES)}")
+        self.name = name
+        self.type = type
+        self.expression = expression
+        self.default = default
+        self.max_bytes = max_bytes
+        self.group = group
+        if type == "jsonpath":
+            self._steps = compile_jsonpath(expression)
+        elif type == "regex":
+            # Regexes run on the raw bytes so the body never has to be decoded
+            self._pattern = re.compile(expression.encode())
+
+    @property
+    def needs_body(self):
+        return self.type != "header"
+
+    def extract(self, response, document=None):
+        """Returns the extracted value, or the default when nothing matched"""
+        if self.type == "header":
+            value = response.headers.get(self.expression)
+        elif self.type == "jsonpath":
+            value = resolve_jsonpath(document, self._steps)
+        else:
+            match = self._pattern.search(response.content, 0, self.max_bytes or len(response.content))
+            value = None
+            if match:
+                value = match.group(self.group if match.re.groups else 0).decode(errors="replace")
+        return self.default if value is None else value
+
+
+def compile_extractors(specs):
+    """Builds Extractor objects from the "extract" list of an API definition"""
+    return [
+        Extractor(
+            name=spec["name"],
+            type=spec.get("type", "jsonpath"),
+            expression=spec["expression"],
+            group=spec.get("group", 1),
+            default=spec.get("default"),
+            max_bytes=spec.get("max_bytes"),
+        )
+        for spec in specs or []
+    ]
+
+
+def run_extractors(extractors, response, context):
+    """
+    Runs extractors against a response and stores the values in the context.
+    Returns the time spent extracting in milliseconds.
+    """
+    start_time = time.perf_counter()
+    document = None
+    # Only parse the body as JSON when a JSONPath extractor actually needs it
+    if any(extractor.type == "jsonpath" for extractor in extractors):
+        try:
+            document = json.loads(response.content)
+        except ValueError:
+            document = None
+    for extractor in extractors:
+        value = extractor.extract(response, document)
+        if value is not None:
+            context[extractor.name] = value
+    return (time.perf_counter() - start_time) * 1000
+
+
+def extractors_from_postman_events(events):
+    """Translates pm.*.set(...) statements in Postman test scripts into extractor definitions"""
+    specs = []
+    for event in events or []:
+        if event.get("listen") != "test":
+            continue
+        script = event.get("script", {}).get("exec", [])
+        if isinstance(script, list):
+            script = "\n".join(script)
+        for name, path in _POSTMAN_JSON_SET.findall(script):
+            specs.append({"name": name, "type": "jsonpath", "expression": "$" + path})
+        for name, header in _POSTMAN_HEADER_SET.findall(script):
+            specs.append({"name": name, "type": "header", "expression": header})
+    return specs
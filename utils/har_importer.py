@@ -0,0 +1,101 @@
+import json
+from urllib.parse import urlparse
+from utils.json_stream import JSONStreamReader
+
+# Headers that describe the browser connection rather than the request itself
+_SKIPPED_HEADERS = {
+    "host", "content-length", "connection", "user-agent", "sec-ch-ua", "sec-ch-ua-mobile",
+    "sec-ch-ua-platform", "sec-fetch-dest", "sec-fetch-mode", "sec-fetch-site", "sec-fetch-user",
+}
+
+# Resources a browser loads on its own; they are skipped unless static assets are wanted
+_STATIC_TYPES = {"image", "stylesheet", "script", "font", "media", "manifest", "texttrack", "other"}
+_STATIC_EXTENSIONS = (".js", ".css", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".ico", ".webp",
+                      ".woff", ".woff2", ".ttf", ".map", ".mp4", ".webm")
+
+
+def _read_entry(reader):
+    """Reads the parts of a HAR entry the importer needs; responses are skipped unread"""
+    entry = {}
+    for key in reader.iter_object():
+        if key in ("request", "_resourceType"):
+            entry[key] = reader.read_value()
+        else:
+            reader.skip_value()
+    return entry
+
+
+def _is_static(entry, url):
+    resource_type = entry.get("_resourceType")
+    if resource_type:
+        return resource_type in _STATIC_TYPES
+    return urlparse(url).path.lower().endswith(_STATIC_EXTENSIONS)
+
+
+def _request_api(request):
+    url = request.get("url", "")
+    headers = {
+        h["name"]: h.get("value", "")
+        for h in request.get("headers", [])
+        if h.get("name") and not h["name"].startswith(":") and h["name"].lower() not in _SKIPPED_HEADERS
+    }
+    body = None
+    text = (request.get("postData") or {}).get("text")
+    if text:
+        try:
+            body = json.loads(text)
+        except json.JSONDecodeError:
+            body = text  # Keep as is if parsing fails
+    return {
+        "name": urlparse(url).path or "/",
+        "method": request.get("method", "GET"),
+        "url": url,
+        "headers": headers,
+        "body": body,
+    }
+
+
+def import_har(fp, skip_static=True, keep_mix=False):
+    """
+    Imports the requests recorded in a HAR file.
+
+    The file is streamed entry by entry, and response bodies (often base64 encoded
+    and most of a HAR's size) are skipped without being decoded. Identical requests
+    (same method, URL and body) are imported once; with keep_mix each API gets a
+    "weight" equal to how often it was recorded, so the engine can replay the
+    captured traffic mix.
+
+    Returns {"apis": [...], "entries": recorded requests, "skipped": static or non-HTTP entries}.
+    """
+    reader = JSONStreamReader(fp)
+    apis = {}
+    entries = skipped = 0
+    for key in reader.iter_object():
+        if key != "log":
+            reader.skip_value()
+            continue
+        for log_key in reader.iter_object():
+            if log_key != "entries":
+                reader.skip_value()
+                continue
+            for _ in reader.iter_array():
+                entry = _read_entry(reader)
+                request = entry.get("request") or {}
+                url = request.get("url", "")
+                entries += 1
+                if not url.startswith(("http://", "https://")) or (skip_static and _is_static(entry, url)):
+                    skipped += 1
+                    continue
+                identity = (request.get("method", "GET"), url, (request.get("postData") or {}).get("text"))
+                if identity in apis:
+                    apis[identity]["weight"] += 1
+                else:
+                    api = _request_api(request)
+                    api["weight"] = 1
+                    apis[identity] = api
+
+    imported = list(apis.values())
+    if not keep_mix:
+        for api in imported:
+            del api["weight"]
+    return {"apis": imported, "entries": entries, "skipped": skipped}
@@ -0,0 +1,83 @@
+import threading
+
+import socket
+
+try:
+    import httpcore
+    import httpx
+except ImportError:  # HTTP/2 mode is optional
+    httpcore = httpx = None
+
+
+def http2_available():
+    """True when httpx and the h2 package needed for HTTP/2 are installed"""
+    if httpx is None:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class Http2Client:
+    """
+    HTTP/2 client that multiplexes many virtual users' requests over a few connections.
+
+    Exposes the same request(...) call the engine makes on a requests session, so the
+    engine can use either one. At most max_concurrent_streams requests are open on each
+    connection; further requests wait for a free stream rather than opening a connection.
+    """
+
+    # Client-side failures the engine turns into outcome codes, like requests' RequestException
+    errors = (httpx.HTTPError, httpx.InvalidURL) if httpx is not None else ()
+
+    def __init__(self, max_connections=1, max_concurrent_streams=100, http1=True):
+        if not http2_available():
+            raise ImportError("HTTP/2 mode needs httpx with HTTP/2 support: pip install 'httpx[http2]'")
+        self.max_connections = max_connections
+        self.max_concurrent_streams = max_concurrent_streams
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        # https:// negotiates HTTP/2 through ALPN, falling back to HTTP/1.1 only if http1 allows it.
+        # Cleartext http:// has no negotiation, so it is spoken to in HTTP/2 directly (h2c with prior
+        # knowledge); an HTTP/1.1 fallback there would silently serialize the load over few connections
+        self._transports = [httpx.HTTPTransport(http2=True, http1=http1, limits=limits),
+                            httpx.HTTPTransport(http2=True, http1=False, limits=limits)]
+        self._client = httpx.Client(transport=self._transports[0])
+        self._cleartext_client = httpx.Client(transport=self._transports[1])
+        self._streams = threading.BoundedSemaphore(max_connections * max_concurrent_streams)
+
+    def request(self, method, url, headers=None, json=None, data=None, timeout=None):
+        """Sends a request; timeout is a (connect, read) tuple like requests takes"""
+        connect_timeout, read_timeout = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        client = self._cleartext_client if url[:7].lower() == "http://" else self._client
+        with self._streams:
+            return client.request(
+                method, url, headers=headers, json=json, content=data,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            )
+
+    def use_dns_cache(self, cache):
+        """Opens new connections to the addresses a DNSCache resolves hosts to"""
+        for transport in self._transports:
+            backend = transport._pool._network_backend
+            if getattr(backend, "cache", None) is not cache:
+                transport._pool._network_backend = _CachedDNSBackend(cache)
+
+    def close(self):
+        self._client.close()
+        self._cleartext_client.close()
+
+
+class _CachedDNSBackend(httpcore.SyncBackend if httpcore is not None else object):
+    """httpcore network backend connecting to cached addresses; TLS still uses the host name"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            address = self.cache.resolve(host, port)
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(str(e)) from e
+        return super().connect_tcp(address, port, timeout, local_address, socket_options)
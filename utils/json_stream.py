@@ -0,0 +1,138 @@
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStreamReader:
+    """
+    Pull reader that walks a large JSON document without loading all of it.
+
+    Containers can be entered one level at a time with iter_object() and iter_array(),
+    while anything the caller wants whole is decoded with read_value(), which runs the
+    C decoder on just that value. Memory is bounded by the largest value read whole,
+    not by the size of the file.
+
+        reader = JSONStreamReader(fp)
+        for key in reader.iter_object():
+            if key == "item":
+                for _ in reader.iter_array():
+                    handle(reader.read_value())
+            else:
+                reader.skip_value()
+    """
+
+    def __init__(self, fp, chunk_size=1 << 16):
+        self._fp = fp
+        # Binary files are decoded incrementally; the file itself is never wrapped or closed
+        self._text_decoder = None
+        if isinstance(fp.read(0), bytes):
+            self._text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        """Appends the next chunk to the buffer; returns False at end of input"""
+        if self._eof:
+            return False
+        # Drop what has been consumed so the buffer only holds the value being read
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        raw = self._fp.read(size or self._chunk_size)
+        # A chunk ending inside a multi-byte character decodes to less text; the rest follows next time
+        chunk = raw if self._text_decoder is None else self._text_decoder.decode(raw, final=not raw)
+        if not raw:
+            self._eof = True
+            self._buffer += chunk
+            return False
+        self._buffer += chunk
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ("" at end of input)"""
+        while True:
+            buffer = self._buffer
+            pos = self._pos = _WHITESPACE.match(buffer, self._pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found or 'end of input'!r} in JSON stream")
+        self._pos += 1
+
+    def read_value(self):
+        """Decodes the next complete value (object, array, string, number, ...)"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                value = end = None
+            # A number running into the end of the buffer may continue in the next chunk
+            if end is not None and (end < len(self._buffer) or self._eof):
+                self._pos = end
+                return value
+            # Grow reads with the value so a large value is not re-decoded once per chunk
+            if not self._fill(max(self._chunk_size, len(self._buffer) - self._pos)):
+                if end is not None:
+                    self._pos = end
+                    return value
+                # Decode again at end of input to surface the real syntax error
+                try:
+                    value, self._pos = self._decoder.raw_decode(self._buffer, self._pos)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON in stream: {e.msg}") from None
+                return value
+
+    def skip_value(self):
+        """Consumes the next value; containers are walked rather than decoded whole"""
+        char = self.peek()
+        if char == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self.read_value()
+
+    def iter_object(self):
+        """Enters an object and yields its keys; the caller must consume each key's value"""
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if self.peek() == ",":
+                self._pos += 1
+            else:
+                self._expect("}")
+                return
+
+    def iter_array(self):
+        """Enters an array and yields its indexes; the caller must consume each element"""
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            if self.peek() == ",":
+                self._pos += 1
+            else:
+                self._expect("]")
+                return
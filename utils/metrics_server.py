@@ -0,0 +1,200 @@
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.outcomes import OUTCOME_LABELS
+
+DEFAULT_PORT = 9464
+# Histogram bucket bounds in seconds, the Prometheus client defaults
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Series:
+    """Live aggregates of one API, only changed under the exporter's lock"""
+
+    def __init__(self, api, buckets):
+        self.labels = _labels(name=api.get("name", ""), method=api["method"], url=api["url"])
+        self.in_flight = 0
+        self.outcomes = {}  # outcome label -> count
+        self.bucket_counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.latency_sum = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def copy(self):
+        series = object.__new__(_Series)
+        series.__dict__.update(self.__dict__)
+        series.outcomes = dict(self.outcomes)
+        series.bucket_counts = list(self.bucket_counts)
+        return series
+
+
+class MetricsServer:
+    """
+    Serves live metrics of a running test on /metrics in the Prometheus text format, so the
+    load generator's view can sit next to the server metrics in existing dashboards.
+
+    Per API it exposes request counters by outcome, the number of requests in flight, a
+    latency histogram and bytes sent and received, plus the number of active virtual users.
+    The engine updates the aggregates under a short lock; a background thread copies them every
+    `interval` seconds and renders an immutable snapshot, which scrapes serve as is, so a scrape
+    never takes the lock or does work on the request path. Values are at most `interval` old.
+    """
+
+    def __init__(self, port=DEFAULT_PORT, host="127.0.0.1", buckets=DEFAULT_BUCKETS, interval=1.0):
+        self.port = port
+        self.host = host
+        self.buckets = tuple(sorted(buckets))
+        self.interval = interval
+        self.active_users = 0
+        self._series = {}  # labels -> _Series
+        self._by_api = {}  # id(api) -> _Series
+        self._lock = threading.Lock()
+        self._snapshot = b""
+        self._server = None
+        self._publisher = None
+        self._stop = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def _get_series(self, api):
+        series = self._by_api.get(id(api))
+        if series is None:
+            # APIs with the same name, method and URL share one series, as label sets must be unique
+            series = _Series(api, self.buckets)
+            series = self._by_api[id(api)] = self._series.setdefault(series.labels, series)
+        return series
+
+    def request_started(self, api):
+        with self._lock:
+            self._get_series(api).in_flight += 1
+
+    def request_finished(self, api):
+        with self._lock:
+            self._get_series(api).in_flight -= 1
+
+    def observe(self, api, result):
+        """Counts a finished request; retried requests count once, like in the report"""
+        outcome = OUTCOME_LABELS.get(result.get("outcome"), "Other Error")
+        seconds = result["response_time"] / 1000
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._get_series(api)
+            series.outcomes[outcome] = series.outcomes.get(outcome, 0) + 1
+            series.bucket_counts[bucket] += 1
+            series.latency_sum += seconds
+            series.request_bytes += result.get("request_bytes") or 0
+            series.response_bytes += result.get("response_bytes") or 0
+
+    def publish(self):
+        """Renders the current aggregates into the snapshot served to scrapers"""
+        with self._lock:
+            series = [series.copy() for series in self._series.values()]
+        self._snapshot = render(series, self.buckets, self.active_users).encode()
+
+    def start(self):
+        """Starts serving in background threads; returns False if already running"""
+        if self._server is not None:
+            return False
+        self.publish()
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]  # Resolves port 0 to the one picked
+        self._stop.clear()
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+        self._publisher = threading.Thread(target=self._publish_loop, name="metrics-publisher", daemon=True)
+        self._publisher.start()
+        return True
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._stop.set()
+        self._publisher.join()
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+
+    def _publish_loop(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = exporter._snapshot
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        return Handler
+
+
+def _labels(**labels):
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for value in labels.values())
+    return ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped))
+
+
+def render(series, buckets, active_users=0):
+    """Prometheus text exposition of a list of API aggregates"""
+    lines = [
+        "# HELP loadtest_active_users Virtual users that have not finished yet.",
+        "# TYPE loadtest_active_users gauge",
+        f"loadtest_active_users {active_users}",
+        "# HELP loadtest_requests_total Finished requests by outcome.",
+        "# TYPE loadtest_requests_total counter",
+    ]
+    for api in series:
+        for outcome, count in api.outcomes.items():
+            lines.append(f'loadtest_requests_total{{{api.labels},outcome="{outcome}"}} {count}')
+    lines += [
+        "# HELP loadtest_requests_in_flight Requests sent and waiting for a response.",
+        "# TYPE loadtest_requests_in_flight gauge",
+    ]
+    lines += [f"loadtest_requests_in_flight{{{api.labels}}} {api.in_flight}" for api in series]
+    lines += [
+        "# HELP loadtest_request_duration_seconds Response time of finished requests.",
+        "# TYPE loadtest_request_duration_seconds histogram",
+    ]
+    for api in series:
+        cumulative = 0
+        for bound, count in zip(buckets + (float("inf"),), api.bucket_counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f'loadtest_request_duration_seconds_bucket{{{api.labels},le="{le}"}} {cumulative}')
+        lines.append(f"loadtest_request_duration_seconds_sum{{{api.labels}}} {api.latency_sum:.6f}")
+        lines.append(f"loadtest_request_duration_seconds_count{{{api.labels}}} {cumulative}")
+    for metric, attribute, help_text in (("loadtest_sent_bytes_total", "request_bytes", "Request body bytes sent."),
+                                         ("loadtest_received_bytes_total", "response_bytes",
+                                          "Response bytes received on the wire.")):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f"{metric}{{{api.labels}}} {getattr(api, attribute)}" for api in series]
+    return "\n".join(lines) + "\n"
+
+
+def build_metrics_server(spec):
+    """Builds a MetricsServer from True, a port or {"port": ..., "host": ...}; None when disabled"""
+    if spec is None or spec is False:
+        return None
+    if isinstance(spec, MetricsServer):
+        return spec
+    if spec is True:
+        return MetricsServer()
+    if isinstance(spec, int):
+        return MetricsServer(port=spec)
+    return MetricsServer(port=spec.get("port", DEFAULT_PORT), host=spec.get("host", "127.0.0.1"),
+                         buckets=spec.get("buckets", DEFAULT_BUCKETS), interval=spec.get("interval", 1.0))
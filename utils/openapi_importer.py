@@ -0,0 +1,165 @@
+import json
+import re
+from urllib.parse import urlencode
+
+try:
+    import yaml
+except ImportError:  # YAML specs are optional; JSON specs always work
+    yaml = None
+
+_METHODS = ("get", "post", "put", "patch", "delete", "head", "options")
+
+# {param} segments in OpenAPI paths and server URLs
+_TEMPLATE_PATTERN = re.compile(r"\{([^{}]+)\}")
+
+
+def _resolve(spec, node, depth=0):
+    """Follows local $ref pointers such as #/components/schemas/User"""
+    while isinstance(node, dict) and "$ref" in node and depth < 20:
+        ref = node["$ref"]
+        if not ref.startswith("#/"):
+            return {}
+        node = spec
+        for part in ref[2:].split("/"):
+            node = node.get(part.replace("~1", "/").replace("~0", "~"), {})
+        depth += 1
+    return node
+
+
+def _example_value(spec, schema, depth=0):
+    """Builds an example value from a schema, preferring the spec's own examples and defaults"""
+    schema = _resolve(spec, schema or {})
+    for key in ("example", "default"):
+        if key in schema:
+            return schema[key]
+    if schema.get("enum"):
+        return schema["enum"][0]
+    if depth > 5:
+        return None
+    for key in ("allOf", "oneOf", "anyOf"):
+        if schema.get(key):
+            if key == "allOf":
+                merged = {}
+                for part in schema["allOf"]:
+                    value = _example_value(spec, part, depth + 1)
+                    if isinstance(value, dict):
+                        merged.update(value)
+                return merged
+            return _example_value(spec, schema[key][0], depth + 1)
+    schema_type = schema.get("type", "object" if "properties" in schema else "string")
+    if schema_type == "object":
+        return {name: _example_value(spec, prop, depth + 1)
+                for name, prop in schema.get("properties", {}).items()}
+    if schema_type == "array":
+        return [_example_value(spec, schema.get("items"), depth + 1)]
+    if schema_type == "integer":
+        return 1
+    if schema_type == "number":
+        return 1.0
+    if schema_type == "boolean":
+        return True
+    return "string"
+
+
+def _parameter_example(spec, parameter):
+    if "example" in parameter:
+        return parameter["example"]
+    if parameter.get("examples"):
+        return _resolve(spec, next(iter(parameter["examples"].values()))).get("value")
+    return _example_value(spec, parameter.get("schema"))
+
+
+def _parameter_text(value):
+    """Formats an example value for a query string or header"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _body_example(spec, request_body):
+    content = _resolve(spec, request_body or {}).get("content", {})
+    media_type = next((t for t in content if "json" in t), None)
+    if media_type is None:
+        return None, None
+    media = content[media_type]
+    if "example" in media:
+        return media_type, media["example"]
+    if media.get("examples"):
+        return media_type, _resolve(spec, next(iter(media["examples"].values()))).get("value")
+    return media_type, _example_value(spec, media.get("schema"))
+
+
+def load_spec(fp):
+    """Reads an OpenAPI document from a JSON or YAML file"""
+    text = fp.read()
+    if isinstance(text, bytes):
+        text = text.decode("utf-8-sig")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        if yaml is None:
+            raise ValueError("YAML OpenAPI specs need PyYAML: pip install pyyaml") from None
+        return yaml.safe_load(text)
+
+
+def import_openapi(spec, server_index=0):
+    """
+    Builds one API per operation of an OpenAPI 3 spec (a dict, see load_spec).
+
+    Path parameters become {{placeholders}} whose example values are returned as
+    variables, so they can be changed or chained from other responses. Required
+    query and header parameters and JSON request bodies are filled from the spec's
+    examples, defaults or schemas.
+
+    Returns {"name": ..., "apis": [...], "variables": {...}}.
+    """
+    if not str(spec.get("openapi", "")).startswith("3"):
+        raise ValueError("Only OpenAPI 3 specs are supported")
+
+    servers = spec.get("servers") or [{"url": ""}]
+    server = servers[min(server_index, len(servers) - 1)]
+    base_url = _TEMPLATE_PATTERN.sub(
+        lambda m: str(server.get("variables", {}).get(m.group(1), {}).get("default", m.group(0))),
+        server.get("url", "")).rstrip("/")
+
+    apis = []
+    variables = {}
+    for path, path_item in spec.get("paths", {}).items():
+        path_item = _resolve(spec, path_item)
+        for method in _METHODS:
+            operation = path_item.get(method)
+            if operation is None:
+                continue
+            parameters = {}
+            # Operation parameters override path-level ones with the same name and location
+            for parameter in path_item.get("parameters", []) + operation.get("parameters", []):
+                parameter = _resolve(spec, parameter)
+                parameters[(parameter.get("name"), parameter.get("in"))] = parameter
+
+            url = base_url + _TEMPLATE_PATTERN.sub(lambda m: "{{" + m.group(1) + "}}", path)
+            headers = {}
+            query = []
+            for (name, location), parameter in parameters.items():
+                if location == "path":
+                    variables.setdefault(name, _parameter_example(spec, parameter))
+                elif parameter.get("required") and location == "query":
+                    query.append((name, _parameter_text(_parameter_example(spec, parameter))))
+                elif parameter.get("required") and location == "header":
+                    headers[name] = _parameter_text(_parameter_example(spec, parameter))
+            if query:
+                url += "?" + urlencode(query)
+
+            media_type, body = _body_example(spec, operation.get("requestBody"))
+            if media_type:
+                headers["Content-Type"] = media_type
+            apis.append({
+                "name": operation.get("operationId") or operation.get("summary") or f"{method.upper()} {path}",
+                "method": method.upper(),
+                "url": url,
+                "headers": headers,
+                "body": body,
+            })
+
+    return {"name": spec.get("info", {}).get("title"), "apis": apis, "variables": variables}
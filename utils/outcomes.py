@@ -0,0 +1,122 @@
+import socket
+import ssl
+import numpy as np
+import pandas as pd
+
+# Compact integer outcome codes stored with every result
+OK = 0
+HTTP_ERROR = 1
+TIMEOUT = 2
+CONNECT_ERROR = 3
+DNS_ERROR = 4
+TLS_ERROR = 5
+CONNECTION_RESET = 6
+OTHER_ERROR = 7
+
+OUTCOME_LABELS = {
+    OK: "OK",
+    HTTP_ERROR: "HTTP Error",
+    TIMEOUT: "Timeout",
+    CONNECT_ERROR: "Connect Error",
+    DNS_ERROR: "DNS Error",
+    TLS_ERROR: "TLS Error",
+    CONNECTION_RESET: "Connection Reset",
+    OTHER_ERROR: "Other Error",
+}
+
+# Exception class names from requests/urllib3/http.client/httpx, matched by name so the
+# classification works for any HTTP client without importing it
+_NAMED_OUTCOMES = {
+    "ConnectTimeout": TIMEOUT,
+    "ReadTimeout": TIMEOUT,
+    "WriteTimeout": TIMEOUT,
+    "PoolTimeout": TIMEOUT,
+    "TimeoutException": TIMEOUT,
+    "NameResolutionError": DNS_ERROR,
+    "SSLError": TLS_ERROR,
+    "RemoteDisconnected": CONNECTION_RESET,
+    "RemoteProtocolError": CONNECTION_RESET,
+    "IncompleteRead": CONNECTION_RESET,
+    "NewConnectionError": CONNECT_ERROR,
+    "ConnectError": CONNECT_ERROR,
+}
+
+
+def _exception_chain(exc):
+    """Yields an exception and every exception wrapped inside it (causes, contexts, reasons, args)"""
+    seen = set()
+    pending = [exc]
+    while pending:
+        current = pending.pop(0)
+        if not isinstance(current, BaseException) or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__, getattr(current, "reason", None)])
+        pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+
+
+def classify_exception(exc):
+    """Maps a client-side failure to an outcome code, looking through wrapped exceptions"""
+    chain = list(_exception_chain(exc))
+    # Specific low-level causes win over the generic wrapper that reached us
+    for error in reversed(chain):
+        if isinstance(error, socket.gaierror):
+            return DNS_ERROR
+        if isinstance(error, ssl.SSLError):
+            return TLS_ERROR
+        if isinstance(error, (ConnectionResetError, BrokenPipeError, ConnectionAbortedError)):
+            return CONNECTION_RESET
+        if isinstance(error, ConnectionRefusedError):
+            return CONNECT_ERROR
+    for error in chain:
+        for cls in type(error).__mro__:
+            if cls.__name__ in _NAMED_OUTCOMES:
+                return _NAMED_OUTCOMES[cls.__name__]
+    if any(isinstance(error, TimeoutError) for error in chain):
+        return TIMEOUT
+    if any(isinstance(error, ConnectionError) or type(error).__name__ == "ConnectionError" for error in chain):
+        return CONNECT_ERROR
+    return OTHER_ERROR
+
+
+def outcome_label(outcome, status_code=None):
+    """Human readable outcome; HTTP errors are split by status class (4xx/5xx)"""
+    if outcome == HTTP_ERROR and pd.notna(status_code):
+        return f"HTTP {int(status_code) // 100}xx"
+    return OUTCOME_LABELS.get(outcome, "Other Error")
+
+
+def is_error(result):
+    """True for HTTP error statuses and for requests that never got a response (e.g. timeouts)"""
+    status_code = result.get("status_code")
+    return status_code is None or status_code >= 400
+
+
+def error_mask(df):
+    """Vectorized is_error() for a results dataframe with a numeric status_code column"""
+    return df["status_code"].isna() | (df["status_code"] >= 400)
+
+
+def outcome_column(df):
+    """
+    Returns the outcome codes of a results dataframe as int8.
+    Results recorded without an outcome get one derived from their status code.
+    """
+    derived = pd.Series(
+        np.where(df["status_code"].isna(), OTHER_ERROR,
+                 np.where(df["status_code"] >= 400, HTTP_ERROR, OK)),
+        index=df.index)
+    if "outcome" in df.columns:
+        derived = pd.to_numeric(df["outcome"], errors="coerce").fillna(derived)
+    return derived.astype("int8")
+
+
+def outcome_breakdown(df, by="url"):
+    """Counts error outcomes per group, with HTTP errors split into 4xx and 5xx columns"""
+    errors = df[df["outcome"] != OK]
+    labels = [outcome_label(outcome, status_code)
+              for outcome, status_code in zip(errors["outcome"], errors["status_code"])]
+    return (errors.assign(outcome_label=labels)
+            .groupby([by, "outcome_label"], observed=True).size()
+            .unstack(fill_value=0))
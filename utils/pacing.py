@@ -0,0 +1,37 @@
+import random
+
+
+def compile_think_time(spec):
+    """
+    Builds a sampler returning think times in seconds from an API's "think_time" setting.
+
+    Accepted forms:
+        2.5                                      constant 2.5 s
+        {"type": "constant", "value": 2.5}
+        {"type": "uniform", "min": 1, "max": 3}
+        {"type": "exponential", "mean": 2}
+    Returns None when no think time is configured.
+    """
+    if spec is None or spec == 0:
+        return None
+    if isinstance(spec, (int, float)):
+        spec = {"type": "constant", "value": spec}
+
+    distribution = spec.get("type", "constant")
+    if distribution == "constant":
+        value = float(spec.get("value", 0))
+        if value < 0:
+            raise ValueError("Think time must not be negative")
+        return (lambda: value) if value > 0 else None
+    if distribution == "uniform":
+        low, high = float(spec.get("min", 0)), float(spec.get("max", 0))
+        if low < 0 or high < low:
+            raise ValueError("Uniform think time needs 0 <= min <= max")
+        return lambda: random.uniform(low, high)
+    if distribution == "exponential":
+        mean = float(spec.get("mean", 0))
+        if mean <= 0:
+            raise ValueError("Exponential think time needs a positive mean")
+        return lambda: random.expovariate(1 / mean)
+    raise ValueError(f"Unknown think time distribution {distribution!r}, "
+                     "expected constant, uniform or exponential")
@@ -0,0 +1,175 @@
+import base64
+import json
+from utils.extractors import extractors_from_postman_events, substitute
+from utils.json_stream import JSONStreamReader
+
+# Item fields the importer needs; everything else (descriptions, saved responses, ...) is skipped unread
+_ITEM_FIELDS = ("name", "request", "event", "auth")
+
+
+def auth_headers(auth):
+    """
+    Translates a Postman auth block into request headers.
+    Returns None when the block is missing, meaning the auth is inherited from the parent.
+    """
+    if not auth:
+        return None
+    auth_type = auth.get("type", "noauth")
+    params = {p.get("key"): p.get("value", "") for p in auth.get(auth_type, []) if isinstance(p, dict)}
+    if auth_type == "bearer":
+        return {"Authorization": f"Bearer {params.get('token', '')}"}
+    if auth_type == "basic":
+        credentials = f"{params.get('username', '')}:{params.get('password', '')}"
+        return {"Authorization": "Basic " + base64.b64encode(credentials.encode()).decode()}
+    if auth_type == "apikey" and params.get("in", "header") == "header":
+        return {params.get("key", "X-API-Key"): params.get("value", "")}
+    return {}
+
+
+def _variables(entries):
+    """Reads Postman variable lists, skipping disabled entries in collections and environments"""
+    return {
+        entry["key"]: entry.get("value", "")
+        for entry in entries or []
+        if entry.get("key") and not entry.get("disabled") and entry.get("enabled", True)
+    }
+
+
+def _request_api(item, folder, index):
+    request = item.get("request") or {}
+    if isinstance(request, str):  # A bare URL
+        request = {"url": request}
+    url = request.get("url", "")
+    if isinstance(url, dict):
+        url = url.get("raw", "")
+    headers = {
+        h["key"]: h.get("value", "")
+        for h in request.get("header", []) or []
+        if isinstance(h, dict) and h.get("key") and not h.get("disabled")
+    }
+
+    body_raw = (request.get("body") or {}).get("raw", "{}")
+    if isinstance(body_raw, str):
+        # Remove outer quotes if they exist
+        body_raw = body_raw.strip('"')
+        try:
+            body = json.loads(body_raw)
+        except json.JSONDecodeError:
+            body = body_raw  # Keep as is if parsing fails
+    else:
+        body = body_raw
+
+    api = {
+        "name": item.get("name") or f"API {index + 1}",
+        "method": request.get("method", "GET"),
+        "url": url,
+        "headers": headers,
+        "body": body,
+    }
+    if folder:
+        api["folder"] = folder
+    # Keep variable chaining from pm.environment.set(...) test scripts
+    extract_list = extractors_from_postman_events(item.get("event", []))
+    if extract_list:
+        api["extract"] = extract_list
+    return api, auth_headers(request.get("auth"))
+
+
+def _read_item(reader, folder, apis, inherited):
+    """Reads one item, descending into folders, and appends its requests to apis"""
+    fields = {}
+    first_child = None
+    for key in reader.iter_object():
+        if key == "item":
+            first_child = len(apis)
+            name = fields.get("name") or "Folder"
+            path = f"{folder}/{name}" if folder else name
+            for _ in reader.iter_array():
+                _read_item(reader, path, apis, inherited)
+        elif key in _ITEM_FIELDS:
+            fields[key] = reader.read_value()
+        else:
+            reader.skip_value()
+
+    if first_child is not None:
+        # Folder auth may come after its items in the file, so it is applied once the folder is done
+        folder_auth = auth_headers(fields.get("auth"))
+        if folder_auth is not None:
+            for position in range(first_child, len(apis)):
+                if position in inherited:
+                    apis[position]["headers"] = {**folder_auth, **apis[position]["headers"]}
+                    inherited.discard(position)
+    elif "request" in fields:
+        api, request_auth = _request_api(fields, folder, len(apis))
+        if request_auth is None:
+            inherited.add(len(apis))
+        else:
+            api["headers"] = {**request_auth, **api["headers"]}
+        apis.append(api)
+
+
+def load_environment(fp):
+    """Reads the enabled variables of a Postman environment file"""
+    reader = JSONStreamReader(fp)
+    variables = {}
+    for key in reader.iter_object():
+        if key == "values":
+            variables = _variables(reader.read_value())
+        else:
+            reader.skip_value()
+    return variables
+
+
+def import_postman(fp, environment=None):
+    """
+    Imports every request of a Postman collection, including those nested in folders.
+
+    The file is streamed, so memory is bounded by the largest single item rather than
+    the file size. Collection variables, overridden by `environment` (a dict, see
+    load_environment), are resolved into URLs, headers and bodies, except for variables
+    that test scripts set at run time; those stay as {{placeholders}}.
+
+    Returns {"name": ..., "apis": [...], "variables": {...}}, where variables seed
+    every virtual user's context.
+    """
+    reader = JSONStreamReader(fp)
+    apis = []
+    inherited = set()  # Positions of requests that inherit auth from their parents
+    name = None
+    collection_auth = None
+    collection_variables = {}
+
+    for key in reader.iter_object():
+        if key == "item":
+            for _ in reader.iter_array():
+                _read_item(reader, "", apis, inherited)
+        elif key == "info":
+            name = reader.read_value().get("name")
+        elif key == "auth":
+            collection_auth = auth_headers(reader.read_value())
+        elif key == "variable":
+            collection_variables = _variables(reader.read_value())
+        else:
+            reader.skip_value()
+
+    if collection_auth:
+        for position in inherited:
+            apis[position]["headers"] = {**collection_auth, **apis[position]["headers"]}
+
+    # Environment values win over collection values, as in Postman
+    variables = {**collection_variables, **(environment or {})}
+    # Resolve variables defined in terms of others, e.g. baseUrl = "{{scheme}}://{{host}}"
+    for _ in range(10):
+        resolved = {key: substitute(value, variables) for key, value in variables.items()}
+        if resolved == variables:
+            break
+        variables = resolved
+
+    set_at_runtime = {spec["name"] for api in apis for spec in api.get("extract", [])}
+    static = {key: value for key, value in variables.items() if key not in set_at_runtime}
+    for api in apis:
+        api["url"] = substitute(api["url"], static)
+        api["headers"] = substitute(api["headers"], static)
+        api["body"] = substitute(api["body"], static)
+
+    return {"name": name, "apis": apis, "variables": variables}
@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter implemented as a generic cell rate algorithm.
+
+    Callers reserve a token and are told when it becomes available instead of
+    polling, so the scheduler can park a virtual user until then without
+    busy-waiting. Times are time.monotonic() seconds.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("Rate limit must be positive")
+        self.rate = float(rate)
+        self.burst = max(int(burst or 1), 1)
+        self._interval = 1 / self.rate
+        # Requests may run this far ahead of the steady rate, which allows `burst` at once
+        self._tolerance = (self.burst - 1) * self._interval
+        self._theoretical_arrival = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, at=None):
+        """Reserves one token and returns the monotonic time at which it may be used"""
+        at = time.monotonic() if at is None else at
+        with self._lock:
+            arrival = max(self._theoretical_arrival, at)
+            self._theoretical_arrival = arrival + self._interval
+            return max(at, arrival - self._tolerance)
+
+
+def build_bucket(spec):
+    """Builds a TokenBucket from a rate (requests/s) or a {"rate": ..., "burst": ...} dict"""
+    if not spec:
+        return None
+    if isinstance(spec, (int, float)):
+        return TokenBucket(spec)
+    return TokenBucket(spec["rate"], spec.get("burst"))
+
+
+class HostConnectionLimiter:
+    """
+    Caps the number of in-flight requests (and therefore connections) per host.
+
+    When a host is at its cap the caller's resume callback is queued and invoked
+    by release() as soon as a slot frees up, so waiting costs no thread.
+    """
+
+    def __init__(self, max_per_host):
+        self.max_per_host = max_per_host
+        self._in_flight = defaultdict(int)
+        self._waiters = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def acquire(self, host, resume):
+        """Takes a slot and returns True, or queues `resume` and returns False"""
+        with self._lock:
+            if self._in_flight[host] < self.max_per_host:
+                self._in_flight[host] += 1
+                return True
+            self._waiters[host].append(resume)
+            return False
+
+    def release(self, host):
+        """Frees a slot, handing it straight to the oldest waiter if there is one"""
+        with self._lock:
+            if self._waiters[host]:
+                # The slot passes to the waiter without ever being counted as free
+                resume = self._waiters[host].popleft()
+            else:
+                self._in_flight[host] -= 1
+                return
+        resume()
@@ -1,23 +1,76 @@
+import html
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
 from jinja2 import Template
 import numpy as np
+from utils.bottleneck import analyze_bottlenecks, per_second_series
+from utils.error_clustering import run_clusters, top_signatures
+from utils.outcomes import error_mask, outcome_breakdown, outcome_column
+from utils.run_metrics import (api_metrics, bandwidth_summary, limiter_delay, retry_summary, scheduling_accuracy,
+                               sli_table, vu_summary)
+from utils.sli import overall_apdex, sli_settings as default_sli_settings
+from utils.thresholds import evaluate_thresholds
 
 class ReportGenerator:
-    def __init__(self, results, virtual_users=None, ramp_up_time=None):
+    def __init__(self, results, virtual_users=None, ramp_up_time=None, include_warmup=False, run_info=None,
+                 thresholds=None, sli_settings=None):
         self.results = results
         self.virtual_users = virtual_users
         self.ramp_up_time = ramp_up_time
-        self.df = pd.DataFrame(results)
+        # Run outcome from APITester.run_info, e.g. {"status": "aborted", "abort_reason": ...}
+        self.run_info = run_info or {}
+        # Results may also be a DataFrame, e.g. loaded back from a Parquet/Arrow file (see utils.result_io)
+        self.df = results.copy(deep=False) if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
         # Convert status_code to numeric type
         self.df['status_code'] = pd.to_numeric(self.df['status_code'], errors='coerce')
+        # Requests without a status code (e.g. timeouts) count as errors alongside HTTP errors
+        self.df['is_error'] = error_mask(self.df)
+        # Compact integer outcome codes (see utils.outcomes) for aggregating failures by kind
+        self.df['outcome'] = outcome_column(self.df)
+        # Payload sizes are kept as compact integer columns; the bodies themselves are never stored
+        for column in ('request_bytes', 'response_bytes', 'decoded_bytes'):
+            if column in self.df.columns:
+                self.df[column] = pd.to_numeric(self.df[column], errors='coerce').fillna(0).astype('int64')
+        # Warm-up samples are kept aside and excluded from the headline metrics by default
+        self.warmup_df = self.df.iloc[0:0]
+        if 'warmup' in self.df.columns:
+            is_warmup = self.df['warmup'].fillna(False).astype(bool)
+            self.warmup_df = self.df[is_warmup]
+            if not include_warmup and not is_warmup.all():
+                self.df = self.df[~is_warmup].reset_index(drop=True)
+        # Categorical columns from loaded files only keep values present, so groupbys skip absent APIs
+        for column in self.df.select_dtypes("category").columns:
+            self.df[column] = self.df[column].cat.remove_unused_categories()
+        # Apdex targets and latency buckets (see utils.sli), by default the ones the run was tested with
+        self.sli_settings = sli_settings or self.run_info.get("sli_settings") or default_sli_settings()
+        self._clusters = None
+        # Threshold verdicts; evaluated here when thresholds are given, otherwise taken from the run
+        self.threshold_verdicts = (evaluate_thresholds(self.df, thresholds, include_warmup=True) if thresholds
+                                   else self.run_info.get("thresholds", []))
         # Add endpoint names for better display if not already present
         if 'name' not in self.df.columns or self.df['name'].isna().all() or (self.df['name'] == '').all():
             self.df['name'] = self.df['url'].apply(self._get_shortened_endpoint)
         
-    def _create_response_time_plot(self):
+    def _create_response_time_plot(self, max_points=100000):
         """Creates a histogram of response times"""
+        if len(self.df) > max_points:
+            # Large runs are binned here so the chart does not embed every sample
+            counts, edges = np.histogram(self.df["response_time"].dropna(), bins=50)
+            fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                                   opacity=0.8))
+            fig.update_layout(
+                title="Response Time Distribution",
+                xaxis_title="Response Time (ms)",
+                yaxis_title="Frequency",
+                showlegend=False,
+                plot_bgcolor="white",
+                paper_bgcolor="white",
+                bargap=0.05,
+                xaxis_tickformat=',.1f'
+            )
+            return fig.to_html(full_html=False, include_plotlyjs=False)
         fig = px.histogram(
             self.df,
             x="response_time",
@@ -33,7 +86,7 @@ class ReportGenerator:
             bargap=0.05,  # Add gap between bars
             xaxis_tickformat=',.1f'  # Format x-axis to 1 decimal place
         )
-        return fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     def _get_shortened_endpoint(self, endpoint):
         """Returns a shortened version of the endpoint for display in charts"""
@@ -55,7 +108,7 @@ class ReportGenerator:
             self.df['name'] = self.df['url'].apply(self._get_shortened_endpoint)
             
         # Group by name directly since it's already shortened
-        error_rates = (self.df[self.df["status_code"] >= 400]
+        error_rates = (self.df[self.df["is_error"]]
                       .groupby("name")
                       .size()
                       .divide(self.df.groupby("name").size())
@@ -82,12 +135,12 @@ class ReportGenerator:
             showlegend=False,
             xaxis_tickangle=0
         )
-        return fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     def _create_slowest_apis_plot(self):
         """Creates a bar chart of slowest APIs (excluding failed APIs)"""
         # Filter out URLs that have any failed requests
-        successful_urls = self.df.groupby("url")["status_code"].apply(lambda x: all(x < 400))
+        successful_urls = self.df.groupby("url")["is_error"].apply(lambda x: not x.any())
         successful_urls = successful_urls[successful_urls].index.tolist()
         
         # Filter dataframe to only include successful APIs
@@ -103,21 +156,19 @@ class ReportGenerator:
                 yaxis_title="Average Response Time (ms)",
                 showlegend=False
             )
-            return fig.to_html(full_html=False)
+            return fig.to_html(full_html=False, include_plotlyjs=False)
             
         # Use name field which is already available
         if 'name' not in df_successful.columns:
             df_successful['name'] = df_successful['url'].apply(self._get_shortened_endpoint)
             
-        # Create a display name that includes method and name
-        df_successful['display_name'] = df_successful.apply(
-            lambda row: f"{row['method']} - {row['name']}", axis=1)
-            
-        avg_times = (df_successful.groupby("display_name")["response_time"]
+        avg_times = (df_successful.groupby(["method", "name"], observed=True)["response_time"]
                     .mean()
                     .round(1)  # Round to 1 decimal place
                     .sort_values(ascending=False)
                     .head(5))  # Show top 5 slowest APIs
+        # Display names include method and name
+        avg_times.index = [f"{method} - {name}" for method, name in avg_times.index]
 
         fig = px.bar(
             x=avg_times.index,
@@ -147,74 +198,31 @@ class ReportGenerator:
             ticktext=avg_times.index,
             tickfont=dict(size=10)
         )
-        return fig.to_html(full_html=False)
+        return fig.to_html(full_html=False, include_plotlyjs=False)
 
     def _calculate_api_metrics(self):
         """Calculates comprehensive metrics for each API"""
-        # First, get the method for each URL (taking the first method if multiple)
-        method_by_url = self.df.groupby("url")["method"].first()
-        
-        # Get name for each URL
-        name_by_url = self.df.groupby("url")["name"].first()
-        
-        metrics = self.df.groupby("url").agg({
-            "response_time": ["mean", "min", "max", "count"],
-            "status_code": lambda x: (x >= 400).mean() * 100
-        }).round(1)  # Round to 1 decimal place instead of 2
-
-        # Calculate percentiles and round to 1 decimal place
-        p90 = self.df.groupby("url")["response_time"].quantile(0.9).round(1)
-        p95 = self.df.groupby("url")["response_time"].quantile(0.95).round(1)
-        p99 = self.df.groupby("url")["response_time"].quantile(0.99).round(1)
-
-        # Combine all metrics
-        metrics = pd.concat([
-            metrics,
-            p90.rename("p90"),
-            p95.rename("p95"),
-            p99.rename("p99")
-        ], axis=1)
-
-        # Calculate throughput
-        metrics["throughput"] = metrics[("response_time", "count")] / (
-            (self.virtual_users or len(set(self.df.index))) * (self.ramp_up_time or 5)
-        )
-
-        # Flatten column names
-        metrics.columns = ["Avg Response Time", "Min Time", "Max Time", "Request Count", 
-                         "Error Rate", "p90%", "p95%", "p99%", "Throughput"]
-        
-        # Add method and name columns and reorder
-        result = metrics.reset_index()
-        result["method"] = result["url"].map(method_by_url)
-        result["name"] = result["url"].map(name_by_url)
-        
-        # Reorder columns to put method first, then name, then URL, then Request Count
-        cols = list(result.columns)
-        cols.remove("method")
-        cols.remove("url")
-        cols.remove("name")
-        cols.remove("Request Count")
-        # Then add all other columns except Request Count
-        remaining_cols = [c for c in cols if c != "Request Count"]
-        cols = ["method", "name", "url", "Request Count"] + remaining_cols
-        
-        return result[cols]
+        return api_metrics(self.df, self.virtual_users, self.ramp_up_time)
 
     def _analyze_errors(self):
         """Analyzes top 5 APIs with highest error rates"""
-        error_df = self.df[self.df["status_code"] >= 400]
+        error_df = self.df[self.df["is_error"]]
         error_analysis = error_df.groupby("url").agg({
-            "status_code": "count",
+            "is_error": "count",
             "response_time": "mean",
-            "error_message": lambda x: x.iloc[0] if len(x) > 0 else "",
             "method": lambda x: x.iloc[0]  # Get the method for each URL
-        }).sort_values("status_code", ascending=False).head()
+        }).sort_values("is_error", ascending=False).head()
 
         # Round response time to 1 decimal place
         error_analysis["response_time"] = error_analysis["response_time"].round(1)
 
-        error_analysis.columns = ["Total Errors", "Avg Response Time", "Error Message", "method"]
+        # An example of each API's most frequent failure, and how many distinct failures it had
+        clusters = self._error_clusters()
+        top_cluster = clusters.drop_duplicates("url").set_index("url")
+        error_analysis["error_message"] = error_analysis.index.map(top_cluster["example"]).fillna("").map(html.escape)
+        error_analysis["signatures"] = error_analysis.index.map(clusters.groupby("url").size()).fillna(0).astype(int)
+
+        error_analysis.columns = ["Total Errors", "Avg Response Time", "method", "Error Message", "Distinct Errors"]
         error_analysis["Error Rate"] = (error_analysis["Total Errors"] / 
                                       self.df.groupby("url").size() * 100).round(1)  # Round error rate to 1 decimal
 
@@ -240,10 +248,107 @@ class ReportGenerator:
         
         return result[cols]
 
+    def _analyze_bottlenecks(self):
+        """APIs ranked by how their latency degrades under load (see utils.bottleneck)"""
+        bottlenecks = analyze_bottlenecks(self.df)
+        if bottlenecks.empty:
+            return bottlenecks
+        # Exponents near 1 decide the verdict, so they keep two decimals
+        bottlenecks["growth_exponent"] = bottlenecks["growth_exponent"].map(
+            lambda x: f"{x:.2f}" if pd.notnull(x) else None)
+        return bottlenecks.rename(columns={
+            "requests": "Request Count", "peak_in_flight": "Peak In-Flight",
+            "saturation_concurrency": "Saturation Concurrency", "knee_load": "Knee (In-Flight)",
+            "growth_exponent": "Latency Growth Exponent", "low_load_latency": "Latency at Low Load",
+            "high_load_latency": "Latency at High Load", "verdict": "Verdict", "recommendation": "Recommendation"
+        }).astype(object).where(bottlenecks.notna().to_numpy(), "-")
+
+    def _create_load_latency_plot(self):
+        """In-flight requests, throughput and p95 latency per second on one time axis"""
+        series = per_second_series(self.df)
+        if len(series) < 2:
+            return ""
+        elapsed = series["second"] - series["second"].iloc[0]
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=elapsed, y=series["in_flight"], name="In-Flight Requests"))
+        fig.add_trace(go.Scatter(x=elapsed, y=series["throughput"], name="Throughput (req/s)"))
+        fig.add_trace(go.Scatter(x=elapsed, y=series["p95_latency"], name="p95 Latency (ms)", yaxis="y2"))
+        fig.update_layout(
+            title="Load vs Latency",
+            xaxis_title="Elapsed Time (s)",
+            yaxis=dict(title="Requests"),
+            yaxis2=dict(title="Latency (ms)", overlaying="y", side="right"),
+            plot_bgcolor="white",
+            paper_bgcolor="white",
+            height=450
+        )
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def _error_clusters(self):
+        """Failed requests grouped by API and normalized error signature (see utils.error_clustering)"""
+        if self._clusters is None:
+            # The engine's clusters leave warm-up out, so they only fit when the report does too
+            has_warmup = "warmup" in self.df.columns and self.df["warmup"].fillna(False).astype(bool).any()
+            self._clusters = run_clusters(self.df, self.run_info, include_warmup=has_warmup)
+        return self._clusters
+
+    def _analyze_outcomes(self):
+        """Breaks failures down by outcome (HTTP 4xx/5xx, timeout, connect, DNS, TLS, reset) per API"""
+        breakdown = outcome_breakdown(self.df).reset_index()
+        name_by_url = self.df.groupby("url")["name"].first()
+        method_by_url = self.df.groupby("url")["method"].first()
+        breakdown.insert(0, "name", breakdown["url"].map(name_by_url))
+        breakdown.insert(0, "method", breakdown["url"].map(method_by_url))
+        breakdown.columns.name = None
+        return breakdown
+
+    def _create_outcome_plot(self):
+        """Creates a stacked bar chart of failures by outcome for each API"""
+        breakdown = outcome_breakdown(self.df, by="name")
+        plot_df = breakdown.reset_index().melt(id_vars="name", var_name="Outcome", value_name="Count")
+        fig = px.bar(
+            plot_df[plot_df["Count"] > 0],
+            x="name",
+            y="Count",
+            color="Outcome",
+            title="Failures by Outcome",
+            labels={"name": "API Endpoint", "Count": "Failed Requests"}
+        )
+        fig.update_layout(
+            barmode="stack",
+            xaxis_title="API Endpoint",
+            yaxis_title="Failed Requests",
+            xaxis_tickangle=0
+        )
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def _create_size_latency_plot(self, max_points=5000):
+        """Creates a scatter of response time against response size on the wire"""
+        plot_df = self.df[self.df["response_bytes"] > 0]
+        # A sample keeps the embedded chart small on long runs
+        if len(plot_df) > max_points:
+            plot_df = plot_df.sample(max_points, random_state=0)
+        fig = px.scatter(
+            plot_df,
+            x="response_bytes",
+            y="response_time",
+            color="name",
+            opacity=0.6,
+            title="Response Time vs Response Size",
+            labels={"response_bytes": "Response Size on the Wire (bytes)",
+                    "response_time": "Response Time (ms)", "name": "API"}
+        )
+        fig.update_layout(plot_bgcolor="white", paper_bgcolor="white")
+        return fig.to_html(full_html=False, include_plotlyjs=False)
+
+    def _calculate_bandwidth(self):
+        """Summarizes bytes sent and received and how much compression saved"""
+        return bandwidth_summary(self.df)
+
     def _analyze_slowest_apis(self):
         """Analyzes top 5 slowest APIs with details (excluding failed APIs)"""
         # Filter out URLs that have any failed requests
-        successful_urls = self.df.groupby("url")["status_code"].apply(lambda x: all(x < 400))
+        successful_urls = self.df.groupby("url")["is_error"].apply(lambda x: not x.any())
         successful_urls = successful_urls[successful_urls].index.tolist()
         
         # Filter dataframe to only include successful APIs
@@ -294,23 +399,65 @@ class ReportGenerator:
                 columns.insert(1, 'name')
             return pd.DataFrame(columns=columns)
 
+    def _calculate_scheduling_accuracy(self, late_threshold=10):
+        """Summarizes how closely think time, pacing and ramp-up schedules were honored"""
+        return scheduling_accuracy(self.df, late_threshold)
+
+    def _calculate_limiter_delay(self):
+        """Summarizes time requests spent queued behind the rate and connection limiters"""
+        return limiter_delay(self.df)
+
+    def _calculate_retry_summary(self):
+        """Compares first-attempt latency with the user-perceived latency across retries"""
+        return retry_summary(self.df)
+
+    def _calculate_sli(self):
+        """Apdex and share of requests within each latency bucket, per API"""
+        return sli_table(self.df, self.sli_settings)
+
+    def _analyze_traffic_mix(self):
+        """Requested against achieved share of each API in a weighted traffic mix"""
+        mix = pd.DataFrame(self.run_info["traffic_mix"])
+        mix["within_tolerance"] = mix["within_tolerance"].map({True: "Yes", False: "No"})
+        return mix[["method", "name", "url", "requested", "achieved", "requests", "within_tolerance"]].rename(
+            columns={"requested": "Requested %", "achieved": "Achieved %", "requests": "Requests",
+                     "within_tolerance": "Within Tolerance"})
+
+    def _calculate_vu_summary(self):
+        """How evenly the work was spread over virtual users; a low fairness index means some users were starved"""
+        return vu_summary(self.df)
+
+    def _calculate_warmup_summary(self):
+        """Summarizes warm-up samples next to the measured ones so their cost stays visible"""
+        if self.warmup_df.empty:
+            return None
+        warmup_times = self.warmup_df["response_time"]
+        return {
+            "requests": len(self.warmup_df),
+            "avg_response_time": round(warmup_times.mean(), 1),
+            "p95": round(warmup_times.quantile(0.95), 1),
+            "max_response_time": round(warmup_times.max(), 1),
+            "error_rate": round(self.warmup_df["is_error"].mean() * 100, 1)
+        }
+
     def generate_html_report(self):
         # Calculate metrics
         metrics = self._calculate_api_metrics()
         slowest_apis = self._analyze_slowest_apis()
 
         # Calculate overall metrics
-        total_requests = len(self.results)
+        total_requests = len(self.df)
         avg_response_time = self.df["response_time"].mean()
-        error_rate = (self.df["status_code"] >= 400).mean() * 100
+        error_rate = self.df["is_error"].mean() * 100
         total_apis = len(self.df["url"].unique())
         
         # Check if there are any errors
-        has_errors = (self.df["status_code"] >= 400).any()
+        has_errors = self.df["is_error"].any()
         
         # Generate plots - error plot only if errors exist
         response_time_plot = self._create_response_time_plot()
         error_rate_plot = self._create_error_rate_plot() if has_errors else ""
+        outcome_plot = self._create_outcome_plot() if has_errors else ""
         slowest_apis_plot = self._create_slowest_apis_plot()
         
         # Round avg_response_time to 1 decimal place for metrics display
@@ -361,6 +508,11 @@ class ReportGenerator:
                 # Skip the already formatted columns
                 if col in ['Avg Response Time', 'Error Message']:
                     continue
+
+                # Apdex scores lie between 0 and 1, so one decimal would hide most of the signal
+                if col == 'Apdex':
+                    formatted_df[col] = formatted_df[col].map(lambda x: f"{x:.3f}" if pd.notnull(x) else x)
+                    continue
                 
                 # Skip non-numeric columns
                 if formatted_df[col].dtype.kind not in 'ifc':
@@ -377,16 +529,35 @@ class ReportGenerator:
             result_html = formatted_df.to_html(classes="dataframe", escape=False)
             return result_html
             
+        bandwidth = self._calculate_bandwidth()
+        traffic_mix_html = ""
+        traffic_mix_ok = True
+        if self.run_info.get("traffic_mix"):
+            traffic_mix_ok = all(row["within_tolerance"] for row in self.run_info["traffic_mix"])
+            traffic_mix_html = format_df_for_html(self._analyze_traffic_mix())
+
         # Format dataframes before rendering
         metrics_html = format_df_for_html(metrics)
         error_analysis_html = format_df_for_html(error_analysis) if has_errors else ""
+        outcome_html = format_df_for_html(self._analyze_outcomes()) if has_errors else ""
+        error_signatures_html = ""
+        if has_errors:
+            # Error bodies are often HTML pages and signatures contain <n>-style masks, so both are escaped
+            signatures = top_signatures(self._error_clusters())
+            for column in ("Error Signature", "Example"):
+                if column in signatures.columns:
+                    signatures[column] = signatures[column].map(html.escape)
+            error_signatures_html = format_df_for_html(signatures)
         slowest_apis_html = format_df_for_html(slowest_apis)
+        bottlenecks = self._analyze_bottlenecks()
+        sli_html = format_df_for_html(self._calculate_sli()).replace(">NaN<", "><")
 
         # Load template from file and render
         with open("templates/report_template.html", "r") as f:
             template = Template(f.read())
             
         return template.render(
+            plotly_js=get_plotlyjs(),  # Embedded once; every chart is rendered without its own copy
             virtual_users=self.virtual_users or len(set(self.df.index)),
             ramp_up_time=self.ramp_up_time or 5,
             total_apis=total_apis,
@@ -395,9 +566,29 @@ class ReportGenerator:
             error_rate=error_rate,
             response_time_plot=response_time_plot,
             error_rate_plot=error_rate_plot,
+            outcome_plot=outcome_plot,
+            outcome_breakdown=outcome_html,
             slowest_apis_plot=slowest_apis_plot,
             api_metrics=metrics_html,
             error_analysis=error_analysis_html,
+            error_signatures=error_signatures_html,
+            bottlenecks=format_df_for_html(bottlenecks) if not bottlenecks.empty else "",
+            load_latency_plot=self._create_load_latency_plot(),
             slowest_apis=slowest_apis_html,
-            has_errors=has_errors  # Pass flag to template
+            has_errors=has_errors,  # Pass flag to template
+            scheduling=self._calculate_scheduling_accuracy(),
+            limiter=self._calculate_limiter_delay(),
+            retries=self._calculate_retry_summary(),
+            bandwidth=bandwidth,
+            traffic_mix=traffic_mix_html,
+            traffic_mix_ok=traffic_mix_ok,
+            size_latency_plot=self._create_size_latency_plot() if bandwidth else "",
+            warmup=self._calculate_warmup_summary(),
+            vu_summary=self._calculate_vu_summary(),
+            sli=sli_html,
+            apdex=overall_apdex(self.df, self.sli_settings),
+            apdex_t=self.sli_settings["apdex_t"],
+            thresholds=self.threshold_verdicts,
+            thresholds_passed=all(verdict["passed"] for verdict in self.threshold_verdicts),
+            run_info=self.run_info
         )
\ No newline at end of file
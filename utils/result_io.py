@@ -0,0 +1,178 @@
+import json
+import pandas as pd
+from utils.report_generator import ReportGenerator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.ipc as ipc
+    import pyarrow.compute as pc
+except ImportError:  # Only needed for Parquet/Arrow export and import
+    pa = None
+
+FORMATS = ("parquet", "arrow")
+
+# Columns whose few distinct values are stored once and referenced by index
+_DICTIONARY_COLUMNS = ("name", "url", "method", "protocol", "error_message", "error_signature")
+
+# Compact types for the numeric columns the engine records
+_COLUMN_TYPES = {
+    "status_code": "int16",
+    "response_time": "float32",
+    "timestamp": "float64",
+    "outcome": "int8",
+    "attempts": "int8",
+    "vu": "int32",
+    "iteration": "int32",
+    "seq": "int32",
+    "schedule_lag": "float32",
+    "queue_time": "float32",
+    "extraction_time": "float32",
+    "first_attempt_time": "float32",
+    "attempt_time": "float32",
+    "backoff_time": "float32",
+    "request_bytes": "int64",
+    "response_bytes": "int64",
+    "decoded_bytes": "int64",
+}
+
+
+def pyarrow_available():
+    return pa is not None
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet/Arrow files need pyarrow: pip install pyarrow")
+
+
+def results_table(results):
+    """Converts engine results (a list of dicts or a DataFrame) to an Arrow table with compact columns"""
+    _require_pyarrow()
+    df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if column in _DICTIONARY_COLUMNS:
+            columns[column] = pa.array(values.astype(object).where(values.notna(), None),
+                                       type=pa.string()).dictionary_encode()
+        elif column in _COLUMN_TYPES:
+            # Nullable so requests without a status code or attempt count stay missing
+            columns[column] = pa.array(pd.to_numeric(values, errors="coerce"), from_pandas=True).cast(
+                _COLUMN_TYPES[column], safe=False)
+        else:
+            columns[column] = pa.array(values, from_pandas=True)
+    return pa.table(columns)
+
+
+def write_results(results, path, format=None, virtual_users=None, ramp_up_time=None, run_info=None):
+    """
+    Writes raw results to a Parquet or Arrow IPC file, chosen by `format` or the file extension.
+    The test configuration needed to re-report the run travels in the file's metadata.
+    """
+    table = results_table(results)
+    metadata = {
+        b"preftestpro": json.dumps({
+            "virtual_users": virtual_users,
+            "ramp_up_time": ramp_up_time,
+            "run_info": run_info or {},
+        }, default=str).encode()
+    }
+    table = table.replace_schema_metadata(metadata)
+    format = format or ("arrow" if str(path).endswith((".arrow", ".feather", ".ipc")) else "parquet")
+    if format not in FORMATS:
+        raise ValueError(f"Unknown results format {format!r}, expected one of {', '.join(FORMATS)}")
+    if format == "parquet":
+        pq.write_table(table, path, compression="zstd")
+    else:
+        with pa.OSFile(str(path), "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=1 << 20)
+    return path
+
+
+def read_results(path, columns=None, filters=None):
+    """
+    Reads a results file back as (DataFrame, metadata).
+
+    Files are memory-mapped; Arrow IPC files are not copied at all while being read, and
+    dictionary columns come back as pandas categoricals. Only the selected `columns` and the
+    rows matching `filters` are materialized, e.g. columns=["url", "response_time"] and
+    filters=[("warmup", "==", False)] (pyarrow filter tuples or an Expression). Columns the
+    file does not have are skipped. For runs too large to hold at all, see iter_results().
+    """
+    _require_pyarrow()
+    if str(path).endswith(".parquet") or _is_parquet(path):
+        table = pq.read_table(path, columns=_present_columns(pq.read_schema(path), columns),
+                              filters=filters, memory_map=True)
+    else:
+        with pa.memory_map(str(path), "r") as source:
+            table = ipc.open_file(source).read_all()
+        if filters is not None:
+            table = table.filter(_filter_expression(filters))
+        if columns is not None:
+            table = table.select(_present_columns(table.schema, columns))
+    metadata = json.loads((table.schema.metadata or {}).get(b"preftestpro", b"{}"))
+    # Nullable integer columns become floats so missing status codes stay NaN as in engine results
+    return table.to_pandas(integer_object_nulls=False, self_destruct=True), metadata
+
+
+def iter_results(path, columns=None, filters=None, batch_size=1 << 20):
+    """
+    Yields a results file as DataFrames of at most batch_size rows, so aggregates over runs of
+    any size can be computed in bounded memory. Takes the same columns and filters as read_results.
+    """
+    _require_pyarrow()
+    expression = _filter_expression(filters) if filters is not None else None
+    if str(path).endswith(".parquet") or _is_parquet(path):
+        parquet = pq.ParquetFile(path, memory_map=True)
+        # The columns filtered on are read too, and dropped once the filter is applied
+        read_columns = columns
+        if columns is not None and filters is not None:
+            read_columns = None if expression is filters else list(columns) + _filter_columns(filters)
+        batches = parquet.iter_batches(batch_size, columns=_present_columns(parquet.schema_arrow, read_columns))
+    else:
+        source = pa.memory_map(str(path), "r")
+        reader = ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    for batch in batches:
+        table = pa.Table.from_batches([batch])
+        if expression is not None:
+            table = table.filter(expression)
+        if columns is not None:
+            table = table.select(_present_columns(table.schema, columns))
+        # IPC batches are written in chunks of about a million rows; split any larger ones
+        for offset in range(0, table.num_rows, batch_size):
+            yield table.slice(offset, batch_size).to_pandas(integer_object_nulls=False)
+
+
+def _present_columns(schema, columns):
+    if columns is None:
+        return None
+    return [column for column in columns if column in schema.names]
+
+
+def _filter_columns(filters):
+    """Columns named in pyarrow filter tuples, a list of (column, op, value) or a list of such lists"""
+    names = []
+    for item in filters:
+        for column, _, _ in (item if isinstance(item, list) else [item]):
+            if column not in names:
+                names.append(column)
+    return names
+
+
+def _filter_expression(filters):
+    return filters if isinstance(filters, pc.Expression) else pq.filters_to_expression(filters)
+
+
+def _is_parquet(path):
+    with open(path, "rb") as f:
+        return f.read(4) == b"PAR1"
+
+
+def load_report(path):
+    """Rebuilds a ReportGenerator from a results file without re-running the test"""
+    df, metadata = read_results(path)
+    return ReportGenerator(df, virtual_users=metadata.get("virtual_users"),
+                           ramp_up_time=metadata.get("ramp_up_time"),
+                           run_info=metadata.get("run_info"))
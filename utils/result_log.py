@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+
+
+class ResultLog:
+    """
+    Append-only JSON Lines log of results, written while the test runs.
+
+    Results are queued by append() and written in batches by a background thread,
+    so workers never wait on disk. The file is flushed every flush_interval seconds
+    and fsynced every fsync_interval seconds, bounding what a crash can lose. The
+    first line records the run configuration and a final line the run outcome, so
+    read_log() can tell a finished run from an interrupted one.
+
+    At most max_pending results wait in memory. When the disk falls that far behind,
+    append() blocks until the writer catches up, slowing the workers down, or with
+    block=False drops the result and counts it in `dropped`.
+    """
+
+    def __init__(self, path, metadata=None, batch_size=500, flush_interval=1.0, fsync_interval=5.0,
+                 max_pending=100000, block=True):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.block = block
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab")
+        self._pending = []
+        self._condition = threading.Condition()
+        self._closed = False
+        self._last_fsync = time.monotonic()
+        self.appended = 0
+        self.written = 0
+        self.dropped = 0
+        self._write_lines([{"_event": "start", "started_at": time.time(), **(metadata or {})}])
+        self._thread = threading.Thread(target=self._run, name="result-log", daemon=True)
+        self._thread.start()
+
+    def append(self, result):
+        """Queues a result for writing; safe to call from any worker thread"""
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                if not self.block:
+                    self.dropped += 1
+                    return
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: len(self._pending) < self.max_pending or self._closed)
+            self._pending.append(result)
+            self.appended += 1
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify_all()
+
+    __call__ = append  # So the log can be passed directly as an engine observer
+
+    def _write_lines(self, records):
+        data = b"".join(json.dumps(record, default=str).encode() + b"\n" for record in records)
+        self._file.write(data)
+        self._file.flush()
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = time.monotonic()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._closed and len(self._pending) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            if batch:
+                self._write_lines(batch)
+                with self._condition:
+                    self.written += len(batch)
+                    # Wakes appenders held back by a full queue and callers of flush()
+                    self._condition.notify_all()
+            if closed:
+                return
+
+    def flush(self):
+        """Waits until every result appended so far is written to the file"""
+        with self._condition:
+            self._condition.notify_all()
+            self._condition.wait_for(lambda: self.written >= self.appended or self._closed)
+
+    def close(self, run_info=None):
+        """Writes everything still queued and the end marker, then fsyncs and closes the file"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        self._write_lines([{"_event": "end", "finished_at": time.time(), "written": self.written,
+                            "dropped": self.dropped, "run_info": run_info or {}}])
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def _parse_line(line):
+    """Returns the decoded record, or None for a torn or corrupt line"""
+    if not line.endswith(b"\n"):
+        return None  # The last write of a crashed process may be cut short
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def read_log(path):
+    """
+    Reads a result log, recovering whatever was written before an interruption.
+    Returns {"results", "metadata", "run_info", "complete", "skipped", "dropped"}; dropped counts
+    results the log let go of while the disk was behind.
+    """
+    results = []
+    metadata = {}
+    end = None
+    skipped = 0
+    with open(path, "rb") as f:
+        for line in f:
+            record = _parse_line(line)
+            if record is None:
+                skipped += 1
+            elif record.get("_event") == "start":
+                metadata = {k: v for k, v in record.items() if k != "_event"}
+            elif record.get("_event") == "end":
+                end = record
+            else:
+                results.append(record)
+    return {
+        "results": results,
+        "metadata": metadata,
+        "run_info": end["run_info"] if end else {"status": "interrupted"},
+        "complete": end is not None,
+        "skipped": skipped,
+        "dropped": end.get("dropped", 0) if end else 0,
+    }
+
+
+def follow(path, poll_interval=0.5, stop=None):
+    """
+    Yields results as they are appended to a log, like tail -f, until the run's end
+    marker is read or stop() returns True.
+    """
+    with open(path, "rb") as f:
+        partial = b""
+        while True:
+            line = f.readline()
+            if not line:
+                if stop is not None and stop():
+                    return
+                time.sleep(poll_interval)
+                continue
+            line = partial + line
+            if not line.endswith(b"\n"):
+                partial = line  # Rest of the line is still being written
+                continue
+            partial = b""
+            record = _parse_line(line)
+            if record is None or record.get("_event") == "start":
+                continue
+            if record.get("_event") == "end":
+                return
+            yield record
@@ -0,0 +1,60 @@
+import random
+from utils.outcomes import CONNECT_ERROR, CONNECTION_RESET, DNS_ERROR, OTHER_ERROR, TIMEOUT, TLS_ERROR
+
+# Names accepted in a retry policy's "retry_on" list
+RETRYABLE_OUTCOMES = {
+    "timeout": TIMEOUT,
+    "connect_error": CONNECT_ERROR,
+    "dns_error": DNS_ERROR,
+    "tls_error": TLS_ERROR,
+    "reset": CONNECTION_RESET,
+    "other_error": OTHER_ERROR,
+}
+
+
+class RetryPolicy:
+    """
+    Per-API retry policy with exponential backoff and full jitter.
+
+    Configured through an API's "retry" setting, e.g.
+        {"max_attempts": 3, "retry_on_status": [502, 503, 504],
+         "retry_on": ["timeout", "connect_error", "reset"], "backoff": 0.1, "max_backoff": 5}
+    """
+
+    def __init__(self, max_attempts=3, retry_on_status=(502, 503, 504),
+                 retry_on=("timeout", "connect_error", "reset"), backoff=0.1, max_backoff=5.0, jitter=True):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        unknown = set(retry_on) - set(RETRYABLE_OUTCOMES)
+        if unknown:
+            raise ValueError(f"Unknown retry_on outcomes {sorted(unknown)}, "
+                             f"expected any of {', '.join(RETRYABLE_OUTCOMES)}")
+        self.max_attempts = max_attempts
+        self.retry_on_status = set(retry_on_status)
+        self.retry_on = {RETRYABLE_OUTCOMES[name] for name in retry_on}
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Builds a policy from an API's "retry" setting; returns None when retries are off"""
+        if not spec:
+            return None
+        if isinstance(spec, int):
+            return cls(max_attempts=spec)
+        return cls(**spec)
+
+    def should_retry(self, result, attempt):
+        """True when `result` of the given 1-based attempt should be retried"""
+        if attempt >= self.max_attempts:
+            return False
+        if result["status_code"] is not None:
+            return result["status_code"] in self.retry_on_status
+        return result["outcome"] in self.retry_on
+
+    def backoff_delay(self, attempt):
+        """Seconds to wait after the given 1-based attempt failed"""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        # Full jitter spreads retries out so virtual users do not retry in lockstep
+        return random.uniform(0, delay) if self.jitter else delay
@@ -0,0 +1,310 @@
+import json
+import os
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+from utils.outcomes import error_mask, outcome_column
+from utils.sketch import LatencySketch
+from utils.sli import DEFAULT_APDEX_T, DEFAULT_BUCKETS, calculate_sli, sli_from_sketch, sli_settings
+
+# Header, body field and query parameter names whose values are credentials; they are never
+# written to the history database
+_SECRET_NAME = re.compile(r"authorization|cookie|api[-_]?key|token|secret|passw(?:or)?d|pwd|credential",
+                          re.IGNORECASE)
+_QUERY_PARAMETER = re.compile(r"([?&])([^=&#]+)=([^&#]*)")
+REDACTED = "<redacted>"
+
+# Per-API columns a trend can be drawn for
+TREND_METRICS = ("requests", "error_rate", "mean", "p50", "p90", "p95", "p99", "max", "throughput", "apdex")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    duration REAL,
+    status TEXT,
+    virtual_users INTEGER,
+    ramp_up_time REAL,
+    total_requests INTEGER,
+    error_rate REAL,
+    mean REAL,
+    p95 REAL,
+    apis TEXT,
+    config TEXT,
+    sidecar TEXT
+);
+CREATE TABLE IF NOT EXISTS run_tags (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, run_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS api_aggregates (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    api TEXT NOT NULL,
+    name TEXT,
+    method TEXT,
+    started_at REAL NOT NULL,
+    requests INTEGER,
+    errors INTEGER,
+    error_rate REAL,
+    mean REAL,
+    p50 REAL,
+    p90 REAL,
+    p95 REAL,
+    p99 REAL,
+    max REAL,
+    throughput REAL,
+    sketch TEXT,
+    apdex REAL,
+    sli TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+CREATE INDEX IF NOT EXISTS api_aggregates_api_time ON api_aggregates (api, started_at);
+CREATE INDEX IF NOT EXISTS api_aggregates_run ON api_aggregates (run_id);
+"""
+
+
+class RunHistory:
+    """
+    Local SQLite store of past runs.
+
+    Each run keeps its configuration and one aggregate row per API with a latency
+    sketch, so percentiles can be recomputed or merged across runs without the raw
+    samples. Raw samples can optionally be kept in a compressed columnar .npz sidecar
+    next to the database. Aggregates are indexed by (api, started_at), so a trend over
+    the last few hundred runs of one API is a single index range scan.
+    """
+
+    def __init__(self, path="run_history.db"):
+        self.path = path
+        self.sidecar_dir = os.path.join(os.path.dirname(os.path.abspath(path)), "run_samples")
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """Adds columns introduced after a database was created"""
+        columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(api_aggregates)")}
+        with self._connection:
+            for column, kind in (("apdex", "REAL"), ("sli", "TEXT")):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE api_aggregates ADD COLUMN {column} {kind}")
+
+    def close(self):
+        self._connection.close()
+
+    def save_run(self, results, virtual_users, ramp_up_time, apis, config=None, run_info=None,
+                 tags=(), keep_samples=False, started_at=None):
+        """Stores a finished run and returns its id; warm-up samples are left out of the aggregates"""
+        df = pd.DataFrame(results)
+        if df.empty:
+            raise ValueError("A run without results cannot be saved")
+        if "warmup" in df.columns:
+            is_warmup = df["warmup"].fillna(False).astype(bool)
+            if not is_warmup.all():
+                df = df[~is_warmup]
+        df = df.assign(is_error=error_mask(df))
+        # API URLs key the aggregates and samples, so query-string credentials are masked there too
+        urls = df["url"].astype(str)
+        df = df.assign(url=urls.map({url: redact_url(url) for url in urls.unique()}))
+        started = df["timestamp"].min()
+        duration = max((df["timestamp"] + df["response_time"] / 1000).max() - started, 0.001)
+        overall = LatencySketch.from_values(df["response_time"].to_numpy())
+        sli = calculate_sli(df, (run_info or {}).get("sli_settings") or sli_settings(apis))
+
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO runs (started_at, duration, status, virtual_users, ramp_up_time, total_requests, "
+                "error_rate, mean, p95, apis, config) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started_at or started, duration, (run_info or {}).get("status", "completed"), virtual_users,
+                 ramp_up_time, len(df), float(df["is_error"].mean() * 100), overall.mean,
+                 overall.quantile(0.95), json.dumps(redact_apis(apis), default=str), json.dumps(config or {}, default=str)))
+            run_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO run_tags (run_id, tag) VALUES (?, ?)",
+                [(run_id, tag) for tag in tags if tag])
+
+            rows = []
+            for api, group in df.groupby("url", sort=False):
+                sketch = LatencySketch.from_values(group["response_time"].to_numpy())
+                errors = int(group["is_error"].sum())
+                api_sli = sli.loc[str(api)]
+                buckets = {column: value for column, value in api_sli.items()
+                           if column.startswith("%") and pd.notna(value)}
+                rows.append((
+                    run_id, api, group["name"].iloc[0] if "name" in group else "", group["method"].iloc[0],
+                    started_at or started, len(group), errors, errors / len(group) * 100, sketch.mean,
+                    sketch.quantile(0.5), sketch.quantile(0.9), sketch.quantile(0.95), sketch.quantile(0.99),
+                    sketch.max, len(group) / duration, json.dumps(sketch.to_dict()), float(api_sli["Apdex"]),
+                    json.dumps({"apdex_t": float(api_sli["Apdex T"]), "buckets": buckets})))
+            self._connection.executemany(
+                "INSERT INTO api_aggregates (run_id, api, name, method, started_at, requests, errors, error_rate, "
+                "mean, p50, p90, p95, p99, max, throughput, sketch, apdex, sli) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+            if keep_samples:
+                sidecar = self._write_samples(run_id, df)
+                self._connection.execute("UPDATE runs SET sidecar = ? WHERE id = ?", (sidecar, run_id))
+        return run_id
+
+    def _write_samples(self, run_id, df):
+        """Writes raw samples as compressed typed columns; APIs are stored once and referenced by code"""
+        os.makedirs(self.sidecar_dir, exist_ok=True)
+        path = os.path.join(self.sidecar_dir, f"run_{run_id}.npz")
+        api_codes, api_names = pd.factorize(df["url"])
+        np.savez_compressed(
+            path,
+            api=api_codes.astype(np.int32),
+            api_names=np.asarray(api_names, dtype=str),
+            timestamp=df["timestamp"].to_numpy(dtype=np.float64),
+            response_time=df["response_time"].to_numpy(dtype=np.float32),
+            # -1 stands for requests that never got a status code
+            status_code=pd.to_numeric(df["status_code"], errors="coerce").fillna(-1).to_numpy(dtype=np.int16),
+            outcome=outcome_column(df).to_numpy(dtype=np.int8),
+            # Which virtual user, iteration and journey position produced each sample
+            **{column: df[column].to_numpy(dtype=np.int32) for column in ("vu", "iteration", "seq")
+               if column in df.columns and df[column].notna().all()},
+        )
+        return path
+
+    def load_samples(self, run_id):
+        """Returns the raw samples of a run saved with keep_samples, or None"""
+        row = self._connection.execute("SELECT sidecar FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None or not row["sidecar"] or not os.path.exists(row["sidecar"]):
+            return None
+        with np.load(row["sidecar"]) as data:
+            status_code = data["status_code"].astype(float)
+            status_code[status_code < 0] = np.nan
+            return pd.DataFrame({
+                "url": pd.Categorical.from_codes(data["api"], data["api_names"]),
+                "timestamp": data["timestamp"],
+                "response_time": data["response_time"],
+                "status_code": status_code,
+                "outcome": data["outcome"],
+                **{column: data[column] for column in ("vu", "iteration", "seq") if column in data.files},
+            })
+
+    def list_runs(self, limit=50, tag=None):
+        """Most recent runs first, optionally only those with a tag"""
+        if tag:
+            rows = self._connection.execute(
+                "SELECT runs.* FROM run_tags JOIN runs ON runs.id = run_tags.run_id "
+                "WHERE run_tags.tag = ? ORDER BY runs.started_at DESC LIMIT ?", (tag, limit))
+        else:
+            rows = self._connection.execute("SELECT * FROM runs ORDER BY started_at DESC LIMIT ?", (limit,))
+        runs = [dict(row) for row in rows]
+        for run in runs:
+            run["tags"] = self.tags(run["id"])
+        return runs
+
+    def tags(self, run_id=None):
+        """Tags of one run, or every tag in use"""
+        if run_id is None:
+            rows = self._connection.execute("SELECT DISTINCT tag FROM run_tags ORDER BY tag")
+        else:
+            rows = self._connection.execute("SELECT tag FROM run_tags WHERE run_id = ? ORDER BY tag", (run_id,))
+        return [row["tag"] for row in rows]
+
+    def apis(self):
+        """Every API with stored aggregates"""
+        return [row["api"] for row in self._connection.execute("SELECT DISTINCT api FROM api_aggregates")]
+
+    def api_aggregates(self, run_id):
+        rows = self._connection.execute("SELECT * FROM api_aggregates WHERE run_id = ?", (run_id,))
+        return [dict(row) for row in rows]
+
+    def trend(self, api, metric="p95", limit=200, tag=None):
+        """Values of a metric for one API over its most recent runs, oldest first"""
+        if metric not in TREND_METRICS:
+            raise ValueError(f"Unknown trend metric {metric!r}, expected one of {', '.join(TREND_METRICS)}")
+        query = f"SELECT run_id, started_at, {metric} AS value FROM api_aggregates WHERE api = ?"
+        params = [api]
+        if tag:
+            query += " AND run_id IN (SELECT run_id FROM run_tags WHERE tag = ?)"
+            params.append(tag)
+        query += " ORDER BY started_at DESC LIMIT ?"
+        params.append(limit)
+        rows = [dict(row) for row in self._connection.execute(query, params)]
+        return rows[::-1]
+
+    def merged_sketch(self, api, limit=200, tag=None):
+        """One latency sketch covering an API's most recent runs, for percentiles across runs"""
+        run_ids = [row["run_id"] for row in self.trend(api, "requests", limit, tag)]
+        merged = LatencySketch()
+        for run_id in run_ids:
+            row = self._connection.execute(
+                "SELECT sketch FROM api_aggregates WHERE run_id = ? AND api = ?", (run_id, api)).fetchone()
+            merged.merge(LatencySketch.from_dict(json.loads(row["sketch"])))
+        return merged
+
+    def sli(self, api, apdex_t=DEFAULT_APDEX_T, buckets=DEFAULT_BUCKETS, limit=200, tag=None):
+        """
+        Apdex and latency bucket SLIs for an API across its most recent runs, from the merged
+        sketches, so any target can be checked after the fact without the raw samples
+        """
+        run_ids = [row["run_id"] for row in self.trend(api, "requests", limit, tag)]
+        if not run_ids:
+            return None
+        merged = LatencySketch()
+        errors = 0
+        for run_id in run_ids:
+            row = self._connection.execute(
+                "SELECT sketch, errors FROM api_aggregates WHERE run_id = ? AND api = ?", (run_id, api)).fetchone()
+            merged.merge(LatencySketch.from_dict(json.loads(row["sketch"])))
+            errors += row["errors"] or 0
+        return sli_from_sketch(merged, apdex_t, buckets, errors)
+
+    def delete_run(self, run_id):
+        row = self._connection.execute("SELECT sidecar FROM runs WHERE id = ?", (run_id,)).fetchone()
+        with self._connection:
+            self._connection.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        if row is not None and row["sidecar"] and os.path.exists(row["sidecar"]):
+            os.remove(row["sidecar"])
+
+
+def redact_apis(apis):
+    """
+    Copies of the API dicts with credentials masked: values of secret-looking headers (Authorization,
+    Cookie, API keys), JSON body fields (passwords, tokens) and URL query parameters (?api_key=)
+    """
+    redacted = []
+    for api in apis:
+        api = dict(api)
+        if isinstance(api.get("headers"), dict):
+            api["headers"] = _redact_fields(api["headers"])
+        if "body" in api:
+            api["body"] = _redact_body(api["body"])
+        if isinstance(api.get("url"), str):
+            api["url"] = redact_url(api["url"])
+        redacted.append(api)
+    return redacted
+
+
+def redact_url(url):
+    """URL with the values of secret-looking query parameters (?api_key=, ?access_token=) masked"""
+    return _QUERY_PARAMETER.sub(
+        lambda m: f"{m.group(1)}{m.group(2)}={REDACTED}" if _SECRET_NAME.search(m.group(2)) else m.group(0), url)
+
+
+def _redact_fields(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if _SECRET_NAME.search(str(key)) else _redact_fields(item)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_fields(item) for item in value]
+    return value
+
+
+def _redact_body(body):
+    # Bodies may also be given as JSON text
+    if isinstance(body, str):
+        try:
+            parsed = json.loads(body)
+        except ValueError:
+            return body
+        return json.dumps(_redact_fields(parsed)) if isinstance(parsed, (dict, list)) else body
+    return _redact_fields(body)
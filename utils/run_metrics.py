@@ -0,0 +1,145 @@
+import pandas as pd
+from utils.outcomes import TIMEOUT
+from utils.sli import calculate_sli
+
+# Summaries of a run shared by the dashboard and the HTML report, so both show the same numbers.
+# They expect the results DataFrame with "is_error" and "outcome" columns (see utils.outcomes).
+
+
+def api_metrics(df, virtual_users=None, ramp_up_time=None):
+    """Per-API latency, error and volume metrics with method, name and URL first"""
+    by_url = df.groupby("url")
+    metrics = by_url.agg({
+        "response_time": ["mean", "min", "max", "count"],
+        "is_error": lambda x: x.mean() * 100
+    }).round(1)
+    metrics.columns = ["Avg Response Time", "Min Time", "Max Time", "Request Count", "Error Rate"]
+    metrics["p90%"] = by_url["response_time"].quantile(0.9).round(1)
+    metrics["p95%"] = by_url["response_time"].quantile(0.95).round(1)
+    metrics["p99%"] = by_url["response_time"].quantile(0.99).round(1)
+    metrics["Throughput"] = metrics["Request Count"] / ((virtual_users or len(df.index)) * (ramp_up_time or 5))
+
+    # Response value extraction cost, kept apart from request latency
+    if "extraction_time" in df.columns and df["extraction_time"].notna().any():
+        metrics["Avg Extraction Time"] = by_url["extraction_time"].mean().round(2)
+    # Timeouts are their own outcome, so count them apart from HTTP errors
+    if (df["outcome"] == TIMEOUT).any():
+        metrics["Timeouts"] = df["outcome"].eq(TIMEOUT).groupby(df["url"]).sum()
+    # Time queued behind rate and connection limiters, shown apart from server latency
+    if "queue_time" in df.columns and (df["queue_time"] > 1).any():
+        metrics["Avg Queue Time"] = by_url["queue_time"].mean().round(1)
+    # Average response size on the wire, next to latency so size-driven slowness stands out
+    if "response_bytes" in df.columns and (df["response_bytes"] > 0).any():
+        metrics["Avg Response KB"] = (by_url["response_bytes"].mean() / 1000).round(2)
+    if "protocol" in df.columns and df["protocol"].notna().any():
+        metrics["Protocol"] = by_url["protocol"].agg(lambda x: ", ".join(sorted(x.dropna().unique())))
+    # Attempts sent per logical request for APIs with a retry policy
+    if "attempts" in df.columns and (df["attempts"] > 1).any():
+        metrics["Retry Amplification"] = by_url["attempts"].mean().round(2)
+
+    result = metrics.reset_index()
+    result.insert(0, "method", result["url"].map(by_url["method"].first()))
+    if "name" in df.columns:
+        result.insert(1, "name", result["url"].map(by_url["name"].first()))
+    leading = [column for column in ("method", "name", "url", "Request Count") if column in result.columns]
+    return result[leading + [column for column in result.columns if column not in leading]]
+
+
+def vu_summary(df):
+    """How evenly the work was spread over virtual users; a low fairness index means some users were starved"""
+    if "vu" not in df.columns or df["vu"].isna().all():
+        return None
+    per_user = df.groupby("vu").agg(requests=("vu", "size"), iterations=("iteration", "nunique"))
+    requests = per_user["requests"].to_numpy(dtype=float)
+    return {
+        "users": len(per_user),
+        "min_requests": int(requests.min()),
+        "avg_requests": round(requests.mean(), 1),
+        "max_requests": int(requests.max()),
+        "min_iterations": int(per_user["iterations"].min()),
+        "max_iterations": int(per_user["iterations"].max()),
+        # Jain's fairness index: 1 when every user made the same number of requests
+        "fairness": round(requests.sum() ** 2 / (len(requests) * (requests ** 2).sum()), 3)
+    }
+
+
+def scheduling_accuracy(df, late_threshold=10):
+    """How closely think time, pacing and ramp-up schedules were honored"""
+    if "schedule_lag" not in df.columns or df["schedule_lag"].isna().all():
+        return None
+    lag = df["schedule_lag"].dropna()
+    return {
+        "avg_lag": round(lag.mean(), 1),
+        "p95_lag": round(lag.quantile(0.95), 1),
+        "max_lag": round(lag.max(), 1),
+        # Share of requests dispatched more than late_threshold ms after their due time
+        "late_pct": round((lag > late_threshold).mean() * 100, 1),
+        "late_threshold": late_threshold
+    }
+
+
+def limiter_delay(df):
+    """Time requests spent queued behind the rate and connection limiters"""
+    if "queue_time" not in df.columns or not (df["queue_time"] > 1).any():
+        return None
+    queue_time = df["queue_time"].fillna(0)
+    return {
+        "avg_queue_time": round(queue_time.mean(), 1),
+        "p95_queue_time": round(queue_time.quantile(0.95), 1),
+        "total_queue_time": round(queue_time.sum() / 1000, 1),  # Seconds
+        "queued_pct": round((queue_time > 1).mean() * 100, 1)
+    }
+
+
+def retry_summary(df):
+    """First-attempt latency against the user-perceived latency across retries"""
+    if "attempts" not in df.columns or not (df["attempts"] > 1).any():
+        return None
+    retried = df[df["attempts"].notna()]
+    attempts = retried["attempts"]
+    return {
+        # Requests actually sent per logical request
+        "amplification": round(attempts.mean(), 2),
+        "retried_pct": round((attempts > 1).mean() * 100, 1),
+        "recovered": int(((attempts > 1) & ~retried["is_error"]).sum()),
+        "exhausted": int(((attempts > 1) & retried["is_error"]).sum()),
+        "avg_first_attempt_time": round(retried["first_attempt_time"].mean(), 1),
+        "p95_first_attempt_time": round(retried["first_attempt_time"].quantile(0.95), 1),
+        "avg_response_time": round(retried["response_time"].mean(), 1),
+        "p95_response_time": round(retried["response_time"].quantile(0.95), 1)
+    }
+
+
+def bandwidth_summary(df):
+    """Bytes sent and received and how much compression saved"""
+    if "response_bytes" not in df.columns or not (df["response_bytes"] > 0).any():
+        return None
+    sent = df["request_bytes"].sum()
+    received = df["response_bytes"].sum()
+    decoded = df["decoded_bytes"].sum()
+    ends = df["timestamp"] + df["response_time"] / 1000
+    duration = max(ends.max() - df["timestamp"].min(), 0.001)
+    return {
+        "sent_mb": round(sent / 1e6, 2),
+        "received_mb": round(received / 1e6, 2),
+        "decoded_mb": round(decoded / 1e6, 2),
+        # Decoded size over wire size; 1.0 means nothing was compressed
+        "compression_ratio": round(decoded / received, 2) if received else 1.0,
+        "avg_response_kb": round(df["response_bytes"].mean() / 1000, 2),
+        "receive_rate": round(received / 1e6 / duration, 2),  # MB/s
+        "send_rate": round(sent / 1e6 / duration, 2)
+    }
+
+
+def sli_table(df, settings):
+    """Apdex and share of requests within each latency bucket per API, with method and name first"""
+    sli = calculate_sli(df, settings)
+    if sli.empty:
+        return sli.reset_index()
+    leading = ["method"]
+    sli.insert(0, "method", sli.index.map(df.groupby("url", observed=True)["method"].first()))
+    if "name" in df.columns:
+        sli.insert(1, "name", sli.index.map(df.groupby("url", observed=True)["name"].first()))
+        leading.append("name")
+    sli = sli.reset_index()
+    return sli[leading + ["url"] + [column for column in sli.columns if column not in leading + ["url"]]]
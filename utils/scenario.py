@@ -0,0 +1,66 @@
+import math
+import random
+
+
+class AliasSampler:
+    """
+    Samples indexes with given weights in O(1) per draw (Vose's alias method).
+
+    Building the tables is O(n); each draw then costs one random number, one
+    table lookup and one comparison, however many APIs are in the mix.
+    """
+
+    def __init__(self, weights):
+        if not weights or any(weight < 0 for weight in weights):
+            raise ValueError("Weights must be a non-empty list of non-negative numbers")
+        total = float(sum(weights))
+        if total <= 0:
+            raise ValueError("At least one weight must be positive")
+        n = self._n = len(weights)
+        self.probabilities = [weight / total for weight in weights]
+        scaled = [p * n for p in self.probabilities]
+        self._accept = [1.0] * n
+        self._alias = list(range(n))
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            self._accept[low] = scaled[low]
+            self._alias[low] = high
+            scaled[high] -= 1.0 - scaled[low]
+            (small if scaled[high] < 1.0 else large).append(high)
+        # Whatever is left is 1.0 up to rounding error and always accepts itself
+
+    def sample(self, random=random.random):
+        draw = random() * self._n
+        column = int(draw)
+        return column if draw - column < self._accept[column] else self._alias[column]
+
+
+def api_weights(apis):
+    """Weights of the APIs in a traffic mix, from their "weight" or "probability" settings (default 1)"""
+    return [float(api.get("weight", api.get("probability", 1))) for api in apis]
+
+
+def mix_summary(apis, probabilities, counts):
+    """
+    Compares the achieved request mix with the requested one.
+
+    An API is flagged when its achieved share is more than three binomial standard
+    errors away from the requested share, which chance alone rarely produces.
+    """
+    total = sum(counts)
+    rows = []
+    for api, probability, count in zip(apis, probabilities, counts):
+        achieved = count / total if total else 0.0
+        tolerance = 3 * math.sqrt(probability * (1 - probability) / total) if total else 0.0
+        rows.append({
+            "name": api.get("name", ""),
+            "method": api["method"],
+            "url": api["url"],
+            "requested": round(probability * 100, 2),
+            "achieved": round(achieved * 100, 2),
+            "requests": count,
+            "within_tolerance": abs(achieved - probability) <= tolerance + 1e-9,
+        })
+    return rows
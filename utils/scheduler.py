@@ -0,0 +1,61 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class TimerScheduler:
+    """
+    Dispatches callbacks to an executor once their due time has arrived.
+
+    A single timer thread keeps every pending callback in a heap, so virtual users
+    that are sleeping (think time, pacing, ramp-up) do not hold a worker thread.
+    Due times use time.monotonic() and are passed to the callback as its first
+    argument so it can measure how late it was dispatched.
+    """
+
+    def __init__(self, executor):
+        self._executor = executor
+        self._heap = []
+        self._counter = itertools.count()  # Tie-breaker so callbacks are never compared
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="timer-scheduler", daemon=True)
+        self._thread.start()
+
+    def call_at(self, due, callback, *args):
+        """Runs callback(due, *args) on the executor at the monotonic time `due`"""
+        with self._condition:
+            entry = (due, next(self._counter), callback, args)
+            heapq.heappush(self._heap, entry)
+            # Only wake the timer thread when the new entry is the next one due
+            if self._heap[0] is entry:
+                self._condition.notify()
+
+    def call_later(self, delay, callback, *args):
+        """Runs callback(due, *args) on the executor after `delay` seconds"""
+        self.call_at(time.monotonic() + max(delay, 0), callback, *args)
+
+    def _run(self):
+        with self._condition:
+            while True:
+                while not self._closed:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    timeout = self._heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return
+                due, _, callback, args = heapq.heappop(self._heap)
+                self._executor.submit(callback, due, *args)
+
+    def close(self):
+        """Stops the timer thread and discards callbacks that are not yet due"""
+        with self._condition:
+            self._closed = True
+            self._heap.clear()
+            self._condition.notify()
+        self._thread.join()
@@ -0,0 +1,130 @@
+import math
+from collections import defaultdict
+import numpy as np
+
+
+class LatencySketch:
+    """
+    Mergeable latency sketch with bounded relative error (DDSketch style).
+
+    Values are counted in logarithmically sized buckets, so quantiles are accurate
+    to within `relative_accuracy` of the true value while memory stays proportional
+    to the spread of the data rather than the number of samples.
+    """
+
+    # Values at or below this many milliseconds are counted in a single zero bucket
+    MIN_VALUE = 1e-3
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, count=1):
+        if value <= self.MIN_VALUE:
+            self.zero_count += count
+        else:
+            self.bins[math.ceil(math.log(value) / self._log_gamma)] += count
+        self.count += count
+        self.sum += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Adds another sketch with the same accuracy into this one"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged")
+        for index, count in other.bins.items():
+            self.bins[index] += count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _bucket_value(self, index):
+        # Midpoint of the bucket in relative terms, which bounds the error on both sides
+        return 2 * self._gamma ** index / (self._gamma + 1)
+
+    def quantile(self, q):
+        """Returns the approximate q-quantile (0 <= q <= 1), or None for an empty sketch"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Clamp to the observed range so extreme quantiles are exact
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def fraction_below(self, value):
+        """Approximate fraction of values at or below `value`, to within the bucket resolution"""
+        if self.count == 0:
+            return None
+        if value < self.min:
+            return 0.0
+        if value >= self.max:
+            return 1.0
+        below = self.zero_count
+        if value > self.MIN_VALUE:
+            limit = math.ceil(math.log(value) / self._log_gamma)
+            below += sum(count for index, count in self.bins.items() if index <= limit)
+        return below / self.count
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    @classmethod
+    def from_values(cls, values, relative_accuracy=0.01):
+        """Builds a sketch from an array of values in one vectorized pass"""
+        sketch = cls(relative_accuracy)
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return sketch
+        positive = values[values > cls.MIN_VALUE]
+        indexes, counts = np.unique(np.ceil(np.log(positive) / sketch._log_gamma).astype(np.int64),
+                                    return_counts=True)
+        sketch.bins.update(zip(indexes.tolist(), counts.tolist()))
+        sketch.zero_count = int(len(values) - len(positive))
+        sketch.count = int(len(values))
+        sketch.sum = float(values.sum())
+        sketch.min = float(values.min())
+        sketch.max = float(values.max())
+        return sketch
+
+    def to_dict(self):
+        """Compact JSON-serializable form, e.g. for storing with a run"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": sorted(self.bins.items()),
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins.update((int(index), count) for index, count in data["bins"])
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        if data["count"]:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from utils.outcomes import error_mask
+
+# Apdex target in milliseconds: requests up to T are satisfied, up to 4T tolerated
+DEFAULT_APDEX_T = 500
+# Latency SLI thresholds in milliseconds, reported as the share of requests within each
+DEFAULT_BUCKETS = (100, 200, 500, 1000)
+
+# Lower bounds of the standard Apdex rating bands
+_RATINGS = ((0.94, "Excellent"), (0.85, "Good"), (0.7, "Fair"), (0.5, "Poor"), (0.0, "Unacceptable"))
+
+
+def apdex_rating(score):
+    if score is None or pd.isna(score):
+        return ""
+    return next(label for bound, label in _RATINGS if score >= bound)
+
+
+def bucket_label(bucket):
+    return f"% ≤ {bucket:g}ms"
+
+
+def sli_settings(apis=(), apdex_t=DEFAULT_APDEX_T, buckets=DEFAULT_BUCKETS):
+    """
+    Collects the run-wide Apdex target and buckets plus the per-API overrides set on API
+    dicts under "apdex_t" and "latency_buckets", keyed by URL. The result is plain JSON so
+    it can travel with the run in run_info.
+    """
+    settings = {"apdex_t": float(apdex_t), "buckets": sorted(float(b) for b in buckets), "apis": {}}
+    for api in apis:
+        override = {}
+        if api.get("apdex_t"):
+            override["apdex_t"] = float(api["apdex_t"])
+        if api.get("latency_buckets"):
+            override["buckets"] = sorted(float(b) for b in api["latency_buckets"])
+        if override:
+            settings["apis"][api["url"]] = override
+    return settings
+
+
+def calculate_sli(df, settings=None):
+    """
+    Apdex and latency bucket SLIs per API in one vectorized pass.
+
+    Failed requests are never good: they count as frustrated for Apdex and as outside every
+    latency bucket, so an API cannot meet its SLI by failing fast. Returns a DataFrame indexed
+    by URL with an Apdex column and one "% ≤ Xms" column per bucket; buckets an API does not
+    use are left empty.
+    """
+    settings = settings or sli_settings()
+    if df.empty:
+        return pd.DataFrame()
+    codes, urls = pd.factorize(df["url"], sort=True)
+    urls = [str(url) for url in urls]
+    overrides = settings.get("apis", {})
+    default_t = settings["apdex_t"]
+    api_t = np.array([overrides.get(url, {}).get("apdex_t", default_t) for url in urls])
+    api_buckets = [overrides.get(url, {}).get("buckets", settings["buckets"]) for url in urls]
+
+    response_time = df["response_time"].to_numpy(dtype=float)
+    ok = ~(df["is_error"] if "is_error" in df.columns else error_mask(df)).to_numpy(dtype=bool)
+    threshold = api_t[codes]
+    satisfied = ok & (response_time <= threshold)
+    tolerating = ok & (response_time > threshold) & (response_time <= 4 * threshold)
+    requests = np.bincount(codes, minlength=len(urls))
+    apdex = (np.bincount(codes, weights=satisfied, minlength=len(urls))
+             + np.bincount(codes, weights=tolerating, minlength=len(urls)) / 2) / requests
+
+    sli = pd.DataFrame({"Apdex T": api_t, "Apdex": apdex.round(3)}, index=pd.Index(urls, name="url"))
+    sli["Rating"] = sli["Apdex"].map(apdex_rating)
+    for bucket in sorted({bucket for buckets in api_buckets for bucket in buckets}):
+        within = np.bincount(codes, weights=ok & (response_time <= bucket), minlength=len(urls)) / requests * 100
+        used = np.array([bucket in buckets for buckets in api_buckets])
+        sli[bucket_label(bucket)] = np.where(used, within.round(2), np.nan)
+    return sli
+
+
+def overall_apdex(df, settings=None):
+    """Apdex over all requests, each judged against its own API's target"""
+    sli = calculate_sli(df, settings)
+    if sli.empty:
+        return None
+    requests = df["url"].astype(str).value_counts().reindex(sli.index)
+    return round(float((sli["Apdex"] * requests).sum() / requests.sum()), 3)
+
+
+def sli_from_sketch(sketch, apdex_t=DEFAULT_APDEX_T, buckets=DEFAULT_BUCKETS, errors=0):
+    """
+    Apdex and bucket SLIs from a LatencySketch, e.g. one merged over many stored runs, to
+    within the sketch's bucket resolution. Sketches hold latencies only, so `errors` (the
+    number of failed requests among them) are treated as the slowest samples.
+    """
+    if not sketch.count:
+        return None
+    good = max(sketch.count - errors, 0) / sketch.count
+    satisfied = min(sketch.fraction_below(apdex_t), good)
+    tolerating = min(sketch.fraction_below(4 * apdex_t), good) - satisfied
+    return {
+        "apdex": round(satisfied + tolerating / 2, 3),
+        "buckets": {bucket_label(bucket): round(min(sketch.fraction_below(bucket), good) * 100, 2)
+                    for bucket in buckets},
+    }
@@ -0,0 +1,219 @@
+import argparse
+import json
+import re
+import sys
+import xml.etree.ElementTree as ET
+import pandas as pd
+from utils.abort_monitor import OPERATORS
+from utils.outcomes import error_mask
+
+# The only columns evaluating thresholds reads from a results file
+THRESHOLD_COLUMNS = ["url", "name", "status_code", "response_time", "timestamp", "warmup"]
+
+# Metrics a threshold can be set on, with the unit their values are given in
+METRICS = {
+    "error_rate": "%",
+    "avg": "ms",
+    "p50": "ms",
+    "p90": "ms",
+    "p95": "ms",
+    "p99": "ms",
+    "max": "ms",
+    "rps": " req/s",
+    "requests": "",
+}
+
+# e.g. "p95 < 300ms", "error_rate < 1%", "rps > 500", "Login: p95 < 300" or "/users: avg <= 200ms"
+_THRESHOLD_PATTERN = re.compile(
+    r"^\s*(?:(.+?):\s+)?(" + "|".join(METRICS) + r")\s*(>=|<=|>|<)\s*([\d.]+)\s*(?:%|ms|req/s|rps)?\s*$"
+)
+
+
+class Threshold:
+    """
+    A service level objective that must hold for the run to pass, e.g. p95 < 300ms.
+
+    Without an api it applies to all requests together; otherwise to the requests of the
+    API with that name or URL.
+    """
+
+    def __init__(self, metric, op, value, api=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown threshold metric {metric!r}, expected one of {', '.join(METRICS)}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown operator {op!r}, expected one of {', '.join(OPERATORS)}")
+        self.metric = metric
+        self.op = op
+        self.value = float(value)
+        self.api = api or None
+
+    @classmethod
+    def parse(cls, threshold, api=None):
+        """Builds a threshold from a string like "Login: p95 < 300ms" or a dict with the same fields"""
+        if isinstance(threshold, cls):
+            return threshold
+        if isinstance(threshold, dict):
+            return cls(threshold["metric"], threshold.get("op", "<"), threshold["value"],
+                       threshold.get("api", api))
+        match = _THRESHOLD_PATTERN.match(threshold)
+        if not match:
+            raise ValueError(f"Invalid threshold {threshold!r}, expected e.g. 'p95 < 300ms' or "
+                             f"'Login: error_rate < 1%'")
+        scope, metric, op, value = match.groups()
+        return cls(metric, op, value, scope or api)
+
+    def __str__(self):
+        scope = f"{self.api}: " if self.api else ""
+        return f"{scope}{self.metric} {self.op} {self.value:g}{METRICS[self.metric]}"
+
+
+def collect_thresholds(thresholds=(), apis=()):
+    """Global thresholds plus the ones set on each API dict under "thresholds", scoped to that API"""
+    collected = [Threshold.parse(threshold) for threshold in thresholds]
+    for api in apis:
+        collected.extend(Threshold.parse(threshold, api=api["url"]) for threshold in api.get("thresholds", ()))
+    return collected
+
+
+def _aggregate(df, duration):
+    errors = error_mask(df)
+    response_time = df["response_time"]
+    return {
+        "requests": len(df),
+        "error_rate": errors.mean() * 100,
+        "avg": response_time.mean(),
+        "p50": response_time.quantile(0.5),
+        "p90": response_time.quantile(0.9),
+        "p95": response_time.quantile(0.95),
+        "p99": response_time.quantile(0.99),
+        "max": response_time.max(),
+        "rps": len(df) / duration,
+    }
+
+
+def evaluate_thresholds(results, thresholds, include_warmup=False):
+    """
+    Evaluates thresholds against a run's results (a list of dicts or a DataFrame) and returns
+    one verdict dict per threshold. Percentiles match the ones in the report; a threshold on an
+    API without results fails, so a renamed or missing API cannot pass unnoticed.
+    """
+    thresholds = [Threshold.parse(threshold) for threshold in thresholds]
+    if not thresholds:
+        return []
+    df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    if not df.empty and not include_warmup and "warmup" in df.columns:
+        is_warmup = df["warmup"].fillna(False).astype(bool)
+        if not is_warmup.all():
+            df = df[~is_warmup]
+    duration = 0.001
+    if not df.empty:
+        duration = max((df["timestamp"] + df["response_time"] / 1000).max() - df["timestamp"].min(), 0.001)
+
+    aggregates = {}
+    verdicts = []
+    for threshold in thresholds:
+        if threshold.api not in aggregates:
+            scoped = df
+            if threshold.api and not df.empty:
+                matches = df["url"].astype(str) == threshold.api
+                if "name" in df.columns:
+                    matches |= df["name"].astype(str) == threshold.api
+                scoped = df[matches]
+            aggregates[threshold.api] = _aggregate(scoped, duration) if not scoped.empty else None
+        aggregate = aggregates[threshold.api]
+        observed = float(aggregate[threshold.metric]) if aggregate else None
+        verdicts.append({
+            "threshold": str(threshold),
+            "api": threshold.api,
+            "metric": threshold.metric,
+            "op": threshold.op,
+            "value": threshold.value,
+            "observed": observed,
+            "requests": aggregate["requests"] if aggregate else 0,
+            "passed": observed is not None and OPERATORS[threshold.op](observed, threshold.value),
+        })
+    return verdicts
+
+
+def thresholds_passed(verdicts):
+    return all(verdict["passed"] for verdict in verdicts)
+
+
+def to_json(verdicts):
+    return json.dumps({
+        "passed": thresholds_passed(verdicts),
+        "failures": sum(not verdict["passed"] for verdict in verdicts),
+        "thresholds": verdicts,
+    }, indent=2)
+
+
+def to_junit_xml(verdicts, suite_name="thresholds"):
+    """One JUnit test case per threshold, so CI systems show each SLO as a passing or failing test"""
+    suite = ET.Element("testsuite", name=suite_name, tests=str(len(verdicts)),
+                       failures=str(sum(not verdict["passed"] for verdict in verdicts)), errors="0")
+    for verdict in verdicts:
+        case = ET.SubElement(suite, "testcase", classname=verdict["api"] or "all requests",
+                             name=verdict["threshold"])
+        if not verdict["passed"]:
+            unit = METRICS[verdict["metric"]]
+            observed = ("no requests" if verdict["observed"] is None
+                        else f"observed {verdict['observed']:.1f}{unit} across {verdict['requests']} requests")
+            ET.SubElement(case, "failure", message=f"{verdict['threshold']} not met: {observed}",
+                          type="ThresholdFailure")
+    suites = ET.Element("testsuites", tests=suite.get("tests"), failures=suite.get("failures"))
+    suites.append(suite)
+    return ET.tostring(suites, encoding="unicode", xml_declaration=True)
+
+
+def load_thresholds(path):
+    """Reads thresholds from a JSON list (strings or dicts) or a text file with one per line"""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return [Threshold.parse(threshold) for threshold in json.loads(text)]
+    return [Threshold.parse(line) for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.thresholds",
+        description="Check a run's results against thresholds; exits 1 when any threshold fails.")
+    parser.add_argument("results", help="Results file: .parquet/.arrow (utils.result_io) or a .jsonl result log")
+    parser.add_argument("-t", "--threshold", action="append", default=[],
+                        help="Threshold such as 'p95 < 300ms' or 'Login: error_rate < 1%%'; may be repeated")
+    parser.add_argument("-f", "--file", help="File of thresholds, one per line or a JSON list")
+    parser.add_argument("--json", help="Write the verdicts as JSON to this file")
+    parser.add_argument("--junit", help="Write the verdicts as JUnit XML to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        thresholds = [Threshold.parse(threshold) for threshold in args.threshold]
+        if args.file:
+            thresholds += load_thresholds(args.file)
+    except ValueError as e:
+        parser.error(str(e))
+    if not thresholds:
+        parser.error("no thresholds given, use --threshold or --file")
+
+    if args.results.endswith(".jsonl"):
+        from utils.result_log import read_log
+        results = read_log(args.results)["results"]
+    else:
+        from utils.result_io import read_results
+        results, _ = read_results(args.results, columns=THRESHOLD_COLUMNS)
+
+    verdicts = evaluate_thresholds(results, thresholds)
+    if args.json:
+        with open(args.json, "w") as f:
+            f.write(to_json(verdicts))
+    if args.junit:
+        with open(args.junit, "w") as f:
+            f.write(to_junit_xml(verdicts))
+    for verdict in verdicts:
+        observed = "-" if verdict["observed"] is None else f"{verdict['observed']:.1f}"
+        print(f"{'PASS' if verdict['passed'] else 'FAIL'}  {verdict['threshold']}  (observed {observed})")
+    return 0 if thresholds_passed(verdicts) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
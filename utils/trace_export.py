@@ -0,0 +1,99 @@
+import json
+import numpy as np
+import pandas as pd
+from utils.outcomes import error_mask
+
+# Above this many requests a trace is thinned to a sample of virtual users by default;
+# trace viewers become sluggish with millions of events
+DEFAULT_MAX_EVENTS = 500000
+
+
+def sample_users(df, fraction=None, max_events=DEFAULT_MAX_EVENTS, seed=0):
+    """
+    Keeps a random subset of virtual users with all of their requests, so sampled journeys
+    stay complete. Without a fraction, just enough users are kept to stay under max_events.
+    """
+    if "vu" not in df.columns:
+        return df
+    if fraction is None:
+        if not max_events or len(df) <= max_events:
+            return df
+        fraction = max_events / len(df)
+    users = df["vu"].dropna().unique()
+    keep = max(1, int(round(len(users) * fraction)))
+    if keep >= len(users):
+        return df
+    kept = np.random.default_rng(seed).choice(users, keep, replace=False)
+    return df[df["vu"].isin(kept)]
+
+
+def trace_events(results, sample=None, max_events=DEFAULT_MAX_EVENTS):
+    """
+    Yields Chrome trace events for a run: one thread per virtual user, one slice per request
+    nested in one slice per iteration, with the request details as arguments. Timestamps are
+    microseconds from the start of the run.
+    """
+    df = results if isinstance(results, pd.DataFrame) else pd.DataFrame(results)
+    if df.empty:
+        return
+    df = sample_users(df, sample, max_events)
+    if "vu" not in df.columns:
+        df = df.assign(vu=0)  # Results from before per-user tagging share one track
+    origin = df["timestamp"].min()
+    df = df.assign(
+        ts=((df["timestamp"] - origin) * 1e6).round().astype("int64"),
+        dur=(df["response_time"] * 1000).clip(lower=1).round().astype("int64"),
+        failed=error_mask(df),
+    ).sort_values(["vu", "ts"], kind="stable")
+
+    yield {"name": "process_name", "ph": "M", "pid": 1, "tid": 0, "args": {"name": "Load Test"}}
+    for vu in df["vu"].unique():
+        yield {"name": "thread_name", "ph": "M", "pid": 1, "tid": int(vu), "args": {"name": f"VU {int(vu)}"}}
+        yield {"name": "thread_sort_index", "ph": "M", "pid": 1, "tid": int(vu), "args": {"sort_index": int(vu)}}
+
+    # Iterations as enclosing slices, so a user's journey reads as nested steps
+    if "iteration" in df.columns:
+        end = df["ts"] + df["dur"]
+        spans = df.assign(end=end).groupby(["vu", "iteration"], sort=False).agg(
+            ts=("ts", "min"), end=("end", "max"), requests=("ts", "size"))
+        for (vu, iteration), ts, span_end, requests in zip(
+                spans.index, spans["ts"].tolist(), spans["end"].tolist(), spans["requests"].tolist()):
+            yield {"name": f"Iteration {int(iteration)}", "cat": "iteration", "ph": "X", "pid": 1, "tid": int(vu),
+                   "ts": ts, "dur": span_end - ts, "args": {"requests": requests}}
+
+    detail_columns = [c for c in ("url", "status_code", "outcome", "iteration", "seq", "attempts", "queue_time",
+                                  "schedule_lag", "warmup", "error_message") if c in df.columns]
+    names = df["name"] if "name" in df.columns else df["url"]
+    for vu, ts, dur, name, method, failed, details in zip(
+            df["vu"].tolist(), df["ts"].tolist(), df["dur"].tolist(), names.tolist(), df["method"].tolist(),
+            df["failed"].tolist(), df[detail_columns].to_dict("records")):
+        args = {key: value for key, value in details.items() if pd.notna(value) and value != ""}
+        if "error_message" in args:
+            args["error_message"] = str(args["error_message"])[:200]
+        yield {"name": f"{method} {name}", "cat": "error" if failed else "request", "ph": "X", "pid": 1,
+               "tid": int(vu), "ts": int(ts), "dur": int(dur), "args": args}
+
+
+def write_trace(results, path, sample=None, max_events=DEFAULT_MAX_EVENTS):
+    """
+    Writes a run as a Chrome trace-event JSON file, openable in chrome://tracing or Perfetto.
+    Events are streamed to the file one at a time. `sample` keeps that fraction of virtual
+    users; by default users are sampled only when the run has more than max_events requests.
+    """
+    with open(path, "w") as f:
+        f.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        first = True
+        for event in trace_events(results, sample, max_events):
+            if not first:
+                f.write(",\n")
+            f.write(json.dumps(event, default=_json_default))
+            first = False
+        f.write("\n]}\n")
+    return path
+
+
+def _json_default(value):
+    # numpy scalars from the results DataFrame
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)